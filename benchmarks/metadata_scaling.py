@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Metadata pipeline scaling benchmark.
+
+Generates a synthetic corpus of TEXT-only fcs files (HEADER and TEXT segments,
+empty DATA segment) and times each stage of xfcs metadata: locate, keyword
+scan into the metadata table, time sort, rolling stat keywords and csv write.
+Files cycle through three instruments with their own keywords and every
+SPARSE_EVERY file adds a unique keyword, so the keyword union grows with the
+corpus.
+
+    table: in memory pipeline (no file I/O) for increasing file counts. Exits
+        with status 1 if time per file at the largest count exceeds the
+        smallest count by more than --max-ratio, i.e. a stage became
+        super-linear.
+    generate: write a synthetic corpus to disk.
+    scan: end to end `xfcs metadata -r` stages over a generated corpus.
+
+Usage:
+    python benchmarks/metadata_scaling.py table --files 1000000
+    python benchmarks/metadata_scaling.py generate /tmp/fcs_corpus --files 1000000
+    python benchmarks/metadata_scaling.py scan /tmp/fcs_corpus --jobs 8
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xfcs import get_metadata
+from xfcs.FCSFile.FCSFile import filter_numeric
+from xfcs.utils import metadata_csv, metadata_time
+from xfcs.utils.metadata_stats import add_param_stats
+from xfcs.utils.metadata_table import MetadataTable
+# ------------------------------------------------------------------------------
+CHANNELS = ('FSC', 'SSC', 'FL1', 'FL2', 'FL3', 'FL4', 'TIME')
+INSTRUMENTS = (
+    ('Cyt-A', (('CYT-A LASER', '488'), ('CYT-A FLOWRATE', '12.5'))),
+    ('Cyt-B', (('CYT-B OPERATOR', 'core'), ('CYT-B PLATE', 'P1'), ('CYT-B WELL', 'A1'))),
+    ('Cyt-C', ()),
+)
+SPARSE_EVERY = 10000
+FILES_PER_DIR = 1000
+START_DATE = datetime.datetime(2020, 1, 1, 8, 0, 0)
+STAT_KEYS = ('$TOT_MEAN_10', '$TOT_STD_10', '$TOT_MEDIAN_25', '$TOT_EWMA_10', '$PXV_FL1_MEAN_5',
+             '$PXV_FL1_MAX_50')
+HEADER_LEN = 58
+
+
+def synthetic_text(ix):
+    """TEXT segment keyword, value pairs of synthetic file ix.
+
+    Arg:
+        ix: file number, sets acquisition time, event count and instrument.
+
+    Returns:
+        list of (keyword, str value)
+    """
+
+    btim = START_DATE + datetime.timedelta(minutes=7 * ix)
+    etim = btim + datetime.timedelta(seconds=90 + ix % 300)
+    cyt, cyt_keys = INSTRUMENTS[ix % len(INSTRUMENTS)]
+
+    pairs = [
+        ('$BEGINANALYSIS', '0'), ('$ENDANALYSIS', '0'), ('$BEGINSTEXT', '0'),
+        ('$ENDSTEXT', '0'), ('$BEGINDATA', '0'), ('$ENDDATA', '0'),
+        ('$BYTEORD', '1,2,3,4'), ('$DATATYPE', 'F'), ('$MODE', 'L'), ('$NEXTDATA', '0'),
+        ('$PAR', str(len(CHANNELS))), ('$TOT', str(1000 + (ix * 7919) % 50000)),
+        ('$DATE', btim.strftime('%d-%b-%Y').upper()), ('$BTIM', btim.strftime('%H:%M:%S')),
+        ('$ETIM', etim.strftime('%H:%M:%S')), ('$CYT', cyt), ('$FIL', 'sample_{}.fcs'.format(ix)),
+    ]
+
+    for n, channel in enumerate(CHANNELS, 1):
+        pairs.extend((
+            ('$P{}N'.format(n), channel), ('$P{}B'.format(n), '32'),
+            ('$P{}R'.format(n), '262144'), ('$P{}E'.format(n), '0,0'),
+            ('$P{}V'.format(n), str(400 + (ix + n) % 100))))
+
+    pairs.extend(cyt_keys)
+    if ix % SPARSE_EVERY == 0:
+        pairs.append(('USER_FIELD_{}'.format(ix // SPARSE_EVERY), 'note'))
+    return pairs
+
+
+def fcs_bytes(pairs, delimiter='/'):
+    """FCS 3.1 HEADER and TEXT segment for keyword, value pairs."""
+
+    text = delimiter + delimiter.join(
+        '{0}{1}{2}'.format(key, delimiter, value) for key, value in pairs) + delimiter
+    text = text.encode('utf-8')
+    offsets = (HEADER_LEN, HEADER_LEN + len(text) - 1, 0, 0, 0, 0)
+    header = 'FCS3.1    ' + ''.join('{:>8}'.format(offset) for offset in offsets)
+    return header.encode('ascii') + text
+
+
+def generate_corpus(root, n_files, quiet=False):
+    """Write n_files TEXT-only fcs files below root, FILES_PER_DIR per sub
+    directory. Existing files are kept.
+
+    Returns:
+        number of files written
+    """
+
+    n_written = 0
+    for ix in range(n_files):
+        dirpath = os.path.join(root, 'batch_{:05d}'.format(ix // FILES_PER_DIR))
+        if ix % FILES_PER_DIR == 0:
+            os.makedirs(dirpath, exist_ok=True)
+            if not quiet:
+                print('>>> generating: {} / {}'.format(ix, n_files), end='\r')
+
+        filepath = os.path.join(dirpath, 'sample_{:07d}.fcs'.format(ix))
+        if os.path.exists(filepath):
+            continue
+        with open(filepath, 'wb') as fcs_file:
+            fcs_file.write(fcs_bytes(synthetic_text(ix)))
+        n_written += 1
+
+    if not quiet:
+        print('>>> generated: {} files in {}'.format(n_written, root))
+    return n_written
+
+
+# ------------------------------------------------------------------------------
+def peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class StageTimer(object):
+    """Collects wall time per named pipeline stage."""
+
+    def __init__(self):
+        self.stages = []
+
+    def __call__(self, name, func, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.stages.append((name, time.perf_counter() - t0))
+        return result
+
+    @property
+    def total(self):
+        return sum(elapsed for _, elapsed in self.stages)
+
+    def report(self, n_files):
+        for name, elapsed in self.stages:
+            print('    {:<12} {:>9.3f} s {:>9.2f} us/file'.format(
+                name, elapsed, 1e6 * elapsed / max(n_files, 1)))
+        print('    {:<12} {:>9.3f} s {:>9.2f} us/file   peak rss {:.0f} MB'.format(
+            'total', self.total, 1e6 * self.total / max(n_files, 1), peak_rss_mb()))
+
+
+def build_table(n_files):
+    """In memory equivalent of load_metadata: parsed keyword values of each
+    synthetic file are added to a MetadataTable.
+    """
+
+    table = MetadataTable(get_metadata.FORCED_SRC_KEYS)
+    src_dir = os.path.abspath(os.curdir)
+    for ix in range(n_files):
+        items = [(key, filter_numeric(value)) for key, value in synthetic_text(ix)]
+        items.extend((('CSV_CREATED', '01/01/20 00:00:00'), ('SRC_DIR', src_dir),
+                      ('SRC_FILE', 'sample_{:07d}.fcs'.format(ix))))
+        table.add_row(items)
+    return table.rows(), table.keys
+
+
+def run_pipeline(timer, fcs_objs, meta_keys):
+    """Time sort, rolling stats and tidy csv write stages."""
+
+    fcs_objs = timer('time sort', metadata_time.sort_by_time_params, fcs_objs)
+    user_keys = list(meta_keys)
+    user_keys.extend(STAT_KEYS)
+    user_keys = timer('stat keys', add_param_stats, fcs_objs, user_keys)
+    timer('csv write', metadata_csv.write_file, fcs_objs, user_keys, os.devnull, True)
+
+
+def bench_table(n_files, steps, max_ratio):
+    """Run in memory pipeline for n_files / 10**k files.
+
+    Returns:
+        True if time per file scales within max_ratio
+    """
+
+    sizes = sorted({max(n_files // 10**k, 1) for k in range(steps)})
+    per_file = []
+    for size in sizes:
+        timer = StageTimer()
+        fcs_objs, meta_keys = timer('scan', build_table, size)
+        run_pipeline(timer, fcs_objs, meta_keys)
+        print('>>> {} files, {} keywords'.format(size, len(meta_keys)))
+        timer.report(size)
+        per_file.append(timer.total / size)
+        del fcs_objs
+
+    ratio = per_file[-1] / per_file[0]
+    print('>>> time per file ratio {} -> {} files: {:.2f}'.format(sizes[0], sizes[-1], ratio))
+    return len(sizes) == 1 or ratio <= max_ratio
+
+
+def bench_scan(root, jobs):
+    """Time xfcs metadata stages over the fcs files below root."""
+
+    os.chdir(root)
+    timer = StageTimer()
+    paths, _ = timer('locate', get_metadata.get_fcs_paths, (), True)
+    fcs_objs, meta_keys = timer(
+        'scan', get_metadata.load_metadata, paths, quiet=True, jobs=jobs)
+    run_pipeline(timer, fcs_objs, meta_keys)
+    print('>>> {} files, {} keywords, jobs {}'.format(len(paths), len(meta_keys), jobs))
+    timer.report(len(paths))
+
+
+# ------------------------------------------------------------------------------
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='xfcs metadata scaling benchmark.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    table = subparsers.add_parser('table', help='In memory pipeline scaling check.')
+    table.add_argument('--files', type=int, default=1000000, metavar='n')
+    table.add_argument(
+        '--steps', type=int, default=3, metavar='n',
+        help='Number of file counts, each 10x smaller than the previous (default: 3).')
+    table.add_argument(
+        '--max-ratio', type=float, default=2.0, dest='max_ratio', metavar='x',
+        help='Maximum time per file ratio of largest to smallest count (default: 2).')
+
+    generate = subparsers.add_parser('generate', help='Write synthetic TEXT-only corpus.')
+    generate.add_argument('root', metavar='<dir>')
+    generate.add_argument('--files', type=int, default=1000000, metavar='n')
+
+    scan = subparsers.add_parser('scan', help='Time metadata stages over a corpus.')
+    scan.add_argument('root', metavar='<dir>')
+    scan.add_argument('--jobs', '-j', type=int, default=1, metavar='n')
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        sys.exit(2)
+    return args
+
+
+def main():
+    args = parse_arguments()
+    if args.command == 'table':
+        if not bench_table(args.files, args.steps, args.max_ratio):
+            print('>>> FAIL: metadata pipeline time per file grows with corpus size')
+            sys.exit(1)
+    elif args.command == 'generate':
+        generate_corpus(args.root, args.files)
+    elif args.command == 'scan':
+        bench_scan(args.root, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
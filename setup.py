@@ -57,7 +57,7 @@ setup(
     packages=find_packages(exclude=['docs']),
     python_requires='>3.5',
     install_requires=['numpy', 'pandas'],
-    extras_require={},
+    extras_require={'parquet': ['pyarrow']},
     package_data={'':['LICENSE.txt', 'MANIFEST.in', 'docs/*']},
     data_files=[],
     entry_points={
@@ -4,6 +4,7 @@ from itertools import islice
 import numpy as np
 
 from xfcs.FCSFile.ParameterData import ParameterData
+from xfcs.gating.gates import GateMasks
 # ------------------------------------------------------------------------------
 class DataSection(object):
     """Instantiates a DataSection object.
@@ -12,13 +13,28 @@ class DataSection(object):
     fluorescence compensation matrix and prepare comp factors, ids for use.
     """
 
-    def __init__(self, raw_data, spec, norm_count, norm_time):
+    data_sets = ('raw', 'channel', 'scale', 'channel_scale', 'compensated', 'scale_compensated')
+
+    def __init__(self, raw_data, spec, norm_count, norm_time, ref_state=None, ref_values=None):
         """Initialize DataSection.
 
+        Args:
+            raw_data: fcs data section values - flat sequence in event order or
+                2D np.array with one row per event.
+            spec: namedtuple of all prepared metadata
+            norm_count: bool - enable count normalization
+            norm_time: bool - enable time normalization
+            ref_state: optional dict shared by consecutive chunks of one data
+                section (see DataStream).
+            ref_values: optional dict of reference id (0: time, -1: event
+                count) -> values for the events in raw_data, e.g. resolved
+                over all events for a sample (see DataStream.sample).
+
         Attributes:
             spec: namedtuple of all prepared metadata
             raw, channel, scale, channel_scale, compensated, scale_compensated:
                 access points to retrieve data sets from ParameterData
+            data_sets: names of all data set access points
         """
 
         self.spec = spec
@@ -29,8 +45,9 @@ class DataSection(object):
         self.__scale = None
         self.__compensated = None
         self.__scale_compensated = None
+        self._gate_masks = {}
         self._parameter_data = ParameterData(spec)
-        self._load_parameter_channels(raw_data, norm_count, norm_time)
+        self._load_parameter_channels(raw_data, norm_count, norm_time, ref_state, ref_values)
 
 
     def __dir__(self):
@@ -38,7 +55,8 @@ class DataSection(object):
         return self.keys()
 
 
-    def _load_parameter_channels(self, raw_data, norm_count, norm_time):
+    def _load_parameter_channels(self, raw_data, norm_count, norm_time, ref_state=None,
+                                 ref_values=None):
         """Separates numeric raw data into individual parameter channels.
         Initializes ParameterData values, settings to prepare raw and channel
         values.
@@ -47,6 +65,9 @@ class DataSection(object):
             raw_data: fcs data section read from bytes to int or float
             norm_count: bool - enable count normalization
             norm_time: bool - enable time normalization
+            ref_state: optional dict shared by consecutive data chunks
+            ref_values: optional dict of reference id -> values replacing
+                reference values derived from raw_data
         """
 
         par = self.spec.par
@@ -54,16 +75,25 @@ class DataSection(object):
 
         # slice all event data into separate channels
         raw_values = []
-        for param_n in range(par):
-            raw_ch = np.array(tuple(islice(raw_data, param_n, None, par)), dtype=mode_dtype)
-            raw_values.append(raw_ch)
+        if isinstance(raw_data, np.ndarray) and raw_data.ndim == 2:
+            for param_n in range(par):
+                raw_values.append(raw_data[:, param_n].astype(mode_dtype))
+        else:
+            for param_n in range(par):
+                raw_ch = np.array(tuple(islice(raw_data, param_n, None, par)), dtype=mode_dtype)
+                raw_values.append(raw_ch)
 
         # set_ reference and channel values, load spillover matrix
         self._parameter_data.set_raw_values(raw_values)
-        self._parameter_data.load_reference_channels(norm_count, norm_time)
+        self._parameter_data.load_reference_channels(norm_count, norm_time, ref_state, ref_values)
         self._parameter_data.set_channel_values()
         if self.spec.spillover:
-            comp_matrix_map, comp_ids = self.__load_spillover_matrix()
+            if ref_state is not None and 'spillover' in ref_state:
+                comp_matrix_map, comp_ids, self._comp_matrix = ref_state['spillover']
+            else:
+                comp_matrix_map, comp_ids = self.__load_spillover_matrix()
+                if ref_state is not None:
+                    ref_state['spillover'] = (comp_matrix_map, comp_ids, self._comp_matrix)
             self._parameter_data.set_compensation_matrix(comp_matrix_map, comp_ids)
 
 
@@ -92,6 +122,55 @@ class DataSection(object):
     def scale_compensated(self):
         return self._parameter_data.get_scale_compensated()
 
+    @property
+    def time(self):
+        """Reference time values (np.array) or None if time is not located."""
+        return self._parameter_data._reference_channels.get(0)
+
+    # --------------------------------------------------------------------------
+    def extend(self, others):
+        """Appends events from other DataSection instances of the same file,
+        e.g. consecutive chunks from DataStream.
+
+        Arg:
+            others: iterable of DataSection instances
+        """
+
+        self._parameter_data.extend(other._parameter_data for other in others)
+        self._gate_masks = {}
+
+
+    # --------------------------------------------------------------------------
+    def gate_masks(self, data_set='channel'):
+        """Returns cached GateMasks instance for the selected data set.
+
+        Arg:
+            data_set: name of data set access point e.g. channel, compensated
+
+        Returns:
+            GateMasks instance or None if data set is unavailable
+        """
+
+        if data_set not in self.data_sets:
+            raise ValueError('Unknown data set: {}'.format(data_set))
+
+        if data_set not in self._gate_masks:
+            _, data = getattr(self, data_set)
+            self._gate_masks[data_set] = GateMasks(data) if data is not None else None
+        return self._gate_masks[data_set]
+
+
+    def gate(self, gate, data_set='channel'):
+        """Boolean event mask for gate applied to selected data set. Masks are
+        cached per gate per data set.
+        """
+
+        masks = self.gate_masks(data_set)
+        if masks is None:
+            return None
+        return masks.mask(gate)
+
+
     # --------------------------------------------------------------------------
     def __load_spillover_matrix(self):
         """Calculates compensation matrix values based on spillover matrix.
@@ -0,0 +1,332 @@
+"""
+Chunked access to the fcs DATA segment.
+
+The DATA segment ($MODE L) is a 2D array of $TOT events x $PAR parameters with
+one fixed word length. It is memory mapped and read in fixed size event chunks
+so memory use is governed by chunk size rather than $TOT.
+
+Each chunk can be transformed into any DataSection data set. Event count, time
+crossover and normalization continue across chunks through a shared ref_state,
+so concatenating all chunks of a data set matches the full DataSection output.
+"""
+
+import numpy as np
+
+from xfcs.FCSFile.DataSection import DataSection
+from xfcs.FCSFile.ParameterData import ParameterData
+# ------------------------------------------------------------------------------
+CHUNK_EVENTS = 2**18
+SAMPLE_METHODS = ('uniform', 'stratified')
+
+
+def raw_data_dtype(spec):
+    """Numpy dtype including byte order for one DATA segment word."""
+
+    byteord = spec.byteord
+    if spec.type_i:
+        byteord = '<' if byteord == 'little' else '>'
+    return np.dtype(spec.txt_dtype).newbyteorder(byteord)
+
+
+# ------------------------------------------------------------------------------
+class DataStream(object):
+    """Instantiates a DataStream object.
+
+    Public Attributes:
+        filepath: source fcs filepath
+        spec: namedtuple of all prepared metadata
+        n_events: number of events in DATA segment
+        chunk_size: number of events per chunk
+
+    Public Methods:
+        raw_chunks: Iterate raw event chunks as 2D np.array (native byte order)
+        read_events: Read raw values for selected event indices.
+        sample_events: Select random event indices (uniform or stratified).
+        sample: Load DataSection for a random sample of events.
+        sample_reference_values: Time and event count values of sampled events.
+        select_chunks: Iterate raw event chunks within event and time ranges.
+        time_chunks: Iterate time values per chunk without reading other parameters.
+        raw_channel: Read all raw values for one parameter.
+        chunks: Iterate (names, DataFrame) chunks for any data set.
+    """
+
+    def __init__(self, filepath, spec, data_start, norm_count=True, norm_time=True,
+                 chunk_size=CHUNK_EVENTS):
+        """Initialize DataStream.
+
+        Args:
+            filepath: fcs filepath
+            spec: namedtuple of all prepared metadata
+            data_start: byte offset of DATA segment
+            norm_count: bool - force event count to start at 1.
+            norm_time: bool - force time to start at 0.
+            chunk_size: number of events per chunk
+        """
+
+        self.filepath = filepath
+        self.spec = spec
+        self.data_start = data_start
+        self.norm_count = norm_count
+        self.norm_time = norm_time
+        self.chunk_size = max(1, int(chunk_size))
+        self.n_events = spec.tot
+        self.dtype = raw_data_dtype(spec)
+        self.__memmap = None
+        self.__parameter_data = None
+
+
+    def __len__(self):
+        return self.n_events
+
+
+    @property
+    def _memmap(self):
+        if self.__memmap is None:
+            self.__memmap = np.memmap(
+                self.filepath, dtype=self.dtype, mode='r', offset=self.data_start,
+                shape=(self.n_events, self.spec.par))
+        return self.__memmap
+
+
+    @property
+    def parameter_data(self):
+        """ParameterData instance with channel config, names and ids loaded."""
+
+        if not self.__parameter_data:
+            _, data = next(self.__data_sections(0, 1), (None, None))
+            self.__parameter_data = data._parameter_data if data else ParameterData(self.spec)
+        return self.__parameter_data
+
+
+    def close(self):
+        self.__memmap = None
+
+
+    # --------------------------------------------------------------------------
+    def chunk_bounds(self, start=0, stop=None):
+        """Yields (start, stop) event index pairs for each chunk."""
+
+        stop = self.n_events if stop is None else min(stop, self.n_events)
+        for chunk_start in range(start, stop, self.chunk_size):
+            yield chunk_start, min(chunk_start + self.chunk_size, stop)
+
+
+    def raw_chunks(self, start=0, stop=None):
+        """Yields raw event chunks as 2D np.array, one row per event, in native
+        byte order.
+        """
+
+        if not self.n_events:
+            return
+
+        native = self.dtype.newbyteorder('=')
+        for chunk_start, chunk_stop in self.chunk_bounds(start, stop):
+            yield self._memmap[chunk_start:chunk_stop].astype(native)
+
+
+    def read_events(self, event_ids):
+        """Read raw values for sorted event indices. Only pages containing the
+        selected events are read from disk.
+
+        Returns:
+            2D np.array, one row per selected event
+        """
+
+        native = self.dtype.newbyteorder('=')
+        return self._memmap[np.asarray(event_ids)].astype(native)
+
+
+    def raw_channel(self, param_n):
+        """Read raw values for one parameter (1 based id) across all events."""
+
+        native = self.dtype.newbyteorder('=')
+        ch_values = np.empty(self.n_events, dtype=native)
+        for chunk_start, chunk_stop in self.chunk_bounds():
+            ch_values[chunk_start:chunk_stop] = self._memmap[chunk_start:chunk_stop, param_n - 1]
+        return ch_values
+
+
+    def sample_events(self, n_sample, seed=None, method='uniform'):
+        """Select a random sample of event indices without replacement.
+
+        $TOT is known from the TEXT segment, so the sample is drawn directly
+        instead of filling a reservoir event by event - the distribution is
+        identical to reservoir sampling.
+
+        Args:
+            n_sample: number of events to select
+            seed: optional seed for reproducible samples
+            method: uniform - every event is equally likely
+                    stratified - events are split into n_sample consecutive
+                    strata in acquisition (time) order, one event per stratum
+
+        Returns:
+            sorted np.array of event indices
+        """
+
+        if method not in SAMPLE_METHODS:
+            raise ValueError('Unknown sample method: {}'.format(method))
+
+        if n_sample >= self.n_events:
+            return np.arange(self.n_events)
+
+        rng = np.random.default_rng(seed)
+        if method == 'stratified':
+            strata = np.linspace(0, self.n_events, n_sample + 1).astype(np.int64)
+            offsets = rng.random(n_sample) * np.diff(strata)
+            return strata[:-1] + offsets.astype(np.int64)
+
+        event_ids = rng.choice(self.n_events, size=n_sample, replace=False)
+        event_ids.sort()
+        return event_ids
+
+
+    def sample(self, n_sample, seed=None, method='uniform'):
+        """Loads a DataSection containing only a random sample of events. Only
+        the reference parameters (time, event count) are decoded for every
+        event, so crossover and normalization match the full data section.
+        All other parameters are read and transformed for sampled events only.
+
+        Args:
+            n_sample: number of events to select
+            seed: optional seed for reproducible samples
+            method: uniform or stratified, see sample_events
+
+        Returns:
+            DataSection instance
+        """
+
+        event_ids = self.sample_events(n_sample, seed, method)
+        native = self.dtype.newbyteorder('=')
+        if not event_ids.size:
+            empty = np.empty((0, self.spec.par), dtype=native)
+            return DataSection(empty, self.spec, self.norm_count, self.norm_time)
+
+        ref_values = self.sample_reference_values(event_ids)
+        return DataSection(
+            self.read_events(event_ids), self.spec, self.norm_count, self.norm_time,
+            ref_values=ref_values)
+
+
+    def sample_reference_values(self, event_ids):
+        """Time and event count values of sorted event indices. Reference
+        parameters are read chunk by chunk for all events.
+
+        Returns:
+            dict mapping reference id (0: time, -1: event count) -> np.array
+        """
+
+        time_ids, count_id = ParameterData(self.spec).reference_ids()
+        ref_cols = [param_n for param_n in time_ids + (count_id,) if param_n]
+        mode_dtype = np.dtype(self.spec.txt_dtype)
+
+        ref_state, sampled = {}, {}
+        for chunk_start, chunk_stop in self.chunk_bounds():
+            id_lo, id_hi = np.searchsorted(event_ids, (chunk_start, chunk_stop))
+            raw_chunk = self._memmap[chunk_start:chunk_stop]
+            raw_refs = {param_n: raw_chunk[:, param_n - 1].astype(mode_dtype)
+                        for param_n in ref_cols}
+            # reference ids are resolved per instance, one ParameterData per chunk
+            ref_vals = ParameterData(self.spec).reference_values(
+                raw_refs, chunk_stop - chunk_start, self.norm_count, self.norm_time, ref_state)
+            chunk_ids = event_ids[id_lo:id_hi] - chunk_start
+            for ref_id, values in ref_vals.items():
+                sampled.setdefault(ref_id, []).append(values[chunk_ids])
+
+        return {ref_id: np.concatenate(values) for ref_id, values in sampled.items()}
+
+
+    def select_chunks(self, start=0, stop=None, time_range=None):
+        """Yields raw event chunks (native byte order) limited to an event index
+        range and an optional time range. Time values are relative to the
+        first event (normalized) unless the stream was created with
+        norm_time=False.
+
+        Args:
+            start, stop: event index range, stop is exclusive
+            time_range: optional (min, max) time, max is exclusive. Use None
+                for an open bound.
+
+        Raises:
+            ValueError: if time_range is set and no time parameter is located
+        """
+
+        if time_range is None:
+            yield from self.raw_chunks(start, stop)
+            return
+
+        t_min, t_max = time_range
+        native = self.dtype.newbyteorder('=')
+        for (chunk_start, chunk_stop), data in self.__data_sections(0, stop):
+            if chunk_stop <= start:
+                continue
+
+            time_vals = data.time
+            if time_vals is None:
+                raise ValueError('Time parameter not located in {}'.format(self.filepath))
+
+            keep = np.ones(time_vals.size, dtype=bool)
+            if t_min is not None:
+                keep &= time_vals >= t_min
+            if t_max is not None:
+                keep &= time_vals < t_max
+            if chunk_start < start:
+                keep[:start - chunk_start] = False
+
+            if keep.any():
+                yield self._memmap[chunk_start:chunk_stop][keep].astype(native)
+
+
+    def time_chunks(self):
+        """Yields ((start, stop), time values) for each chunk of events. Only
+        the time parameter(s) are read, crossover and normalization continue
+        across chunks. Stops immediately if time is not located.
+        """
+
+        param_data = ParameterData(self.spec)
+        time_ids, _ = param_data.reference_ids()
+        if not time_ids:
+            return
+
+        mode_dtype = np.dtype(self.spec.txt_dtype)
+        ref_state = {}
+        for chunk_start, chunk_stop in self.chunk_bounds():
+            raw_chunk = self._memmap[chunk_start:chunk_stop]
+            raw_time = {param_n: raw_chunk[:, param_n - 1].astype(mode_dtype) for param_n in time_ids}
+            time_vals = param_data.time_values(raw_time, self.norm_time, ref_state)
+            yield (chunk_start, chunk_stop), time_vals
+
+
+    # --------------------------------------------------------------------------
+    def __data_sections(self, start=0, stop=None):
+        ref_state = {}
+        for chunk_start, chunk_stop in self.chunk_bounds(start, stop):
+            raw_chunk = self._memmap[chunk_start:chunk_stop]
+            data = DataSection(raw_chunk, self.spec, self.norm_count, self.norm_time, ref_state)
+            yield (chunk_start, chunk_stop), data
+
+
+    def data_sections(self):
+        """Yields ((start, stop), DataSection) for each chunk of events."""
+        return self.__data_sections()
+
+
+    def chunks(self, data_set='channel'):
+        """Yields (parameter names, DataFrame) for each chunk of the data set.
+        Stops immediately if the data set is unavailable for the file.
+
+        Arg:
+            data_set: DataSection data set name e.g. raw, channel, compensated
+        """
+
+        if data_set not in DataSection.data_sets:
+            raise ValueError('Unknown data set: {}'.format(data_set))
+
+        for _, data in self.__data_sections():
+            par_names, data_chunk = getattr(data, data_set)
+            if not par_names:
+                return
+            yield par_names, data_chunk
+
+
+# ------------------------------------------------------------------------------
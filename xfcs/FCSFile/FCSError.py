@@ -84,3 +84,22 @@ class RequiredKeywordsError(FCSError):
 
     def __str__(self):
         return 'FCS parameter keywords are missing: {}'.format(self.missing_keywords)
+
+
+class ChannelNotFoundError(FCSError):
+    """Error to be raised when a requested parameter channel is not located
+
+    Attributes:
+
+    channel
+        The requested channel name
+    available
+        Channel names located in the data set
+    """
+
+    def __init__(self, channel, available=()):
+        self.channel = channel
+        self.available = tuple(available)
+
+    def __str__(self):
+        return 'Channel <{}> not located in data set: {}'.format(self.channel, self.available)
@@ -26,6 +26,9 @@ import re
 import struct
 
 from xfcs.FCSFile.DataSection import DataSection
+from xfcs.FCSFile.DataStream import CHUNK_EVENTS, DataStream
+from xfcs.FCSFile.FCSError import ChannelNotFoundError
+from xfcs.FCSFile.FCSWriter import FCSWriter, subset_keywords
 from xfcs.FCSFile.Metadata import Metadata
 from xfcs.FCSFile import validate
 # ------------------------------------------------------------------------------
@@ -53,6 +56,19 @@ def filter_ascii32(hex_str):
         return int(hex_str, 16)
 
 
+def split_escaped_text(raw_text, delimiter):
+    """Splits TEXT segment where delimiters within keywords or values are
+    escaped by doubling them.
+
+    Returns:
+        list of keyword, value tokens
+    """
+
+    placeholder = '\x00'
+    tokens = raw_text.replace(delimiter * 2, placeholder).split(delimiter)
+    return [token.replace(placeholder, delimiter) for token in tokens]
+
+
 def channel_name_keywords(meta_keys):
     """Finds any channel name keyword in the form: $PxN.
 
@@ -81,7 +97,9 @@ class FCSFile(object):
     Public Methods:
         load: Load an FCS file for reading and confirm version id is supported.
         load_data: Load Data Section for reading
+        stream_data: Chunked access to Data Section without loading all events.
         load_from_csv: Init FCSFile object from csv containing Parameter key, value pairs.
+        write: Write FCS 3.1 file with selected channels and events.
 
         check_file_format: Confirms metadata format.
         load_file_spec: Loads all header, text contents into namedtuple.
@@ -109,6 +127,8 @@ class FCSFile(object):
             spec: namedtuple instance containing all necessary header, text values
                 to extract and scale parameter data.
             data: Data class instance to access extracted data sets.
+            epoch: acquisition timestamp cached by metadata_time.fcs_timestamp,
+                None until resolved.
 
         """
 
@@ -132,6 +152,7 @@ class FCSFile(object):
         self.__supp_text = None
         self.__analysis = None
         self.quiet = quiet
+        self.epoch = None
 
 
     def load(self, fcs_file):
@@ -183,7 +204,10 @@ class FCSFile(object):
         fcs_obj.seek(self.__header['text_start'])
         text_delimiter = fcs_obj.read(1).decode('utf-8')
         _read_len = self.__header['text_end'] - self.__header['text_start'] - 1
-        tokens = fcs_obj.read(_read_len).decode('utf-8').split(text_delimiter)
+        raw_text = fcs_obj.read(_read_len).decode('utf-8')
+        tokens = raw_text.split(text_delimiter)
+        if text_delimiter * 2 in raw_text and (len(tokens) % 2 or not all(tokens[::2])):
+            tokens = split_escaped_text(raw_text, text_delimiter)
 
         # Collect Parameter keys and values for text map
         all_keys = tuple(key.strip().upper() for key in tokens[::2])
@@ -196,8 +220,24 @@ class FCSFile(object):
         self.check_file_format()
 
 
+    def __getstate__(self):
+        """Pickle support for process pools. Open file object is dropped and
+        hashkey is recomputed since str hash values differ between processes.
+        """
+
+        state = self.__dict__.copy()
+        state['_fcs'] = None
+        state['_FCSFile__hashkey'] = ''
+        return state
+
+
+    @property
+    def filepath(self):
+        return os.path.join(self.parentdir, self.name)
+
+
     def close(self):
-        if not self._fcs.closed:
+        if self._fcs and not self._fcs.closed:
             self._fcs.close()
 
 
@@ -214,12 +254,17 @@ class FCSFile(object):
 
 
     # --------------------------------------------------------------------------
-    def load_data(self, norm_count=False, norm_time=False):
+    def load_data(self, norm_count=False, norm_time=False, sample=0, seed=None,
+                  sample_method='uniform'):
         """Public access point to load and read the data section.
 
         Args:
             norm_count: bool - force event count to start at 1.
             norm_time: bool - force time to start at 0.
+            sample: optional number of events to randomly select. Only sampled
+                events are decoded and transformed.
+            seed: optional seed for reproducible samples.
+            sample_method: uniform or stratified (evenly spread over acquisition).
         """
 
         if not self.spec:
@@ -231,6 +276,12 @@ class FCSFile(object):
 
         validate.file_format(self.text, self.spec)
 
+        if sample:
+            stream = self.stream_data(norm_count, norm_time)
+            self.data = stream.sample(sample, seed, sample_method)
+            stream.close()
+            return
+
         if self.spec.datatype == 'I':
             self.__read_int_data()
         else:
@@ -240,6 +291,27 @@ class FCSFile(object):
         self.data = DataSection(self.__raw_data, self.spec, norm_count, norm_time)
 
 
+    def stream_data(self, norm_count=True, norm_time=True, chunk_size=CHUNK_EVENTS):
+        """Public access point to read the data section in chunks of events.
+
+        Args:
+            norm_count: bool - force event count to start at 1.
+            norm_time: bool - force time to start at 0.
+            chunk_size: number of events per chunk.
+
+        Returns:
+            DataStream instance
+        """
+
+        if not self.spec:
+            self.load_file_spec()
+
+        validate.file_format(self.text, self.spec)
+        data_start, _ = self.__get_data_seek()
+        self.close()
+        return DataStream(self.filepath, self.spec, data_start, norm_count, norm_time, chunk_size)
+
+
     def __read_float_data(self):
         """Reads fcs $DATATYPE (F|D) - floats (32|64) bit word length"""
 
@@ -303,6 +375,28 @@ class FCSFile(object):
         self.name = self.text.get('SRC_FILE', '')
 
 
+    def load_from_index(self, filepath, version, param_keys, param_values):
+        """Initialize an FCSFile text attribute instance from a metadata index
+            entry without opening the fcs file. Loads data for:
+                self.text, self.param_keys, self.__key_set
+
+        Args:
+            filepath: fcs filepath
+            version: version ID for FCS file
+            param_keys: Parameter keys in order of location in text section
+            param_values: the keys respective values
+        """
+
+        self.parentdir, self.name = os.path.split(os.path.abspath(filepath))
+        self.version = version
+        self.param_keys = tuple(param_keys)
+        self._param_values = tuple(param_values)
+        self.text = dict(zip(self.param_keys, self._param_values))
+        self.__update_key_set()
+        self.valid = validate.required_keywords(self.text)
+        self.supported_format = validate.file_mode_type(self.text)
+
+
     def __update_key_set(self):
         self.__key_set = set(self.text.keys())
         self.__n_keys = len(self.__key_set)
@@ -392,9 +486,58 @@ class FCSFile(object):
         self.text[param] = value
 
 
-    def __write(self):
-        """Write an FCS file (not implemented)"""
-        raise NotImplementedError("Can't write FCS files yet")
+    def write(self, filepath, channels=None, start=0, stop=None, time_range=None,
+              chunk_size=CHUNK_EVENTS):
+        """Write FCS 3.1 file containing selected channels and events. Raw DATA
+        values are streamed in chunks and written without conversion, TEXT is
+        copied with parameter keywords renumbered and offsets recalculated.
+
+        Args:
+            filepath: output fcs filepath
+            channels: optional $PnN channel names in output order
+            start, stop: event index range, stop is exclusive
+            time_range: optional (min, max) time relative to first event
+            chunk_size: number of events per chunk.
+
+        Returns:
+            number of events written
+
+        Raises:
+            ChannelNotFoundError: if a channel name is not located
+            ValueError: if time_range is set and no time channel is located,
+                the partial output file is removed
+        """
+
+        if not self.spec:
+            self.load_file_spec()
+
+        param_ids = None
+        if channels:
+            names = [self.text['$P{}N'.format(param_n)] for param_n in range(1, self.spec.par + 1)]
+            for channel in channels:
+                if channel not in names:
+                    raise ChannelNotFoundError(channel, names)
+            param_ids = [names.index(channel) + 1 for channel in channels]
+
+        stream = self.stream_data(norm_count=True, norm_time=True, chunk_size=chunk_size)
+        keywords = subset_keywords(self.param_keys, self.text, param_ids)
+        columns = [param_n - 1 for param_n in param_ids] if param_ids else None
+
+        writer = None
+        try:
+            writer = FCSWriter(filepath, keywords, stream.dtype)
+            with writer:
+                for raw_chunk in stream.select_chunks(start, stop, time_range):
+                    writer.write_events(raw_chunk[:, columns] if columns else raw_chunk)
+        except Exception:
+            # remove partial output file
+            if writer is not None:
+                os.remove(filepath)
+            raise
+        finally:
+            stream.close()
+
+        return writer.n_events
 
 
 # ------------------------------------------------------------------------------
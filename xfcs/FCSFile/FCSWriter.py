@@ -0,0 +1,289 @@
+"""
+FCS 3.1 writer - $MODE L, $DATATYPE I, F, D.
+
+HEADER, TEXT and DATA segments are written in that order. Segment offsets are
+stored in TEXT with a fixed width, so the TEXT length is known before any event
+is written and events can be streamed in chunks of unknown total. Offsets and
+$TOT are updated in place once the DATA segment is complete.
+
+TEXT delimiter is the first candidate not found in any keyword or value. If all
+candidates are in use, delimiters within keywords and values are escaped by
+doubling them (FCS 3.1 section 3.2.9).
+"""
+
+from collections import OrderedDict
+from itertools import chain
+import re
+
+import numpy as np
+# ------------------------------------------------------------------------------
+VERSION_ID = 'FCS3.1'
+TEXT_START = 58
+HEADER_MAX_OFFSET = 99999999
+OFFSET_WIDTH = 20
+DELIMITERS = ('/', '|', '\\', '!', '~', '^', '\x0c')
+
+SEGMENT_KEYWORDS = (
+    '$BEGINANALYSIS', '$ENDANALYSIS', '$BEGINSTEXT', '$ENDSTEXT',
+    '$BEGINDATA', '$ENDDATA', '$NEXTDATA', '$TOT')
+
+SPILLOVER_KEYWORDS = ('$SPILLOVER', 'SPILL', '$COMP', 'SPILLOVER')
+
+
+def select_delimiter(tokens):
+    """First delimiter candidate not contained in any token or None."""
+
+    for delimiter in DELIMITERS:
+        if not any(delimiter in token for token in tokens):
+            return delimiter
+    return None
+
+
+def escape_delimiter(token, delimiter):
+    """Doubles every delimiter within a keyword or value."""
+    return token.replace(delimiter, delimiter * 2)
+
+
+def format_value(value):
+    """Converts keyword value to str. Empty values are not allowed."""
+
+    value = str(value)
+    return value if value else ' '
+
+
+def subset_spillover(spillover, param_ids, names):
+    """Reduces $SPILLOVER matrix to selected parameters. Numeric parameter
+    references are renumbered to match output parameter order.
+
+    Args:
+        spillover: $SPILLOVER value - n, [n params], [n**2 values]
+        param_ids: selected source parameter ids (1 based) in output order
+        names: dict mapping source parameter id -> $PnN
+
+    Returns:
+        reduced $SPILLOVER str or None if no spillover parameters remain
+    """
+
+    spill_sep = [val.strip() for val in str(spillover).split(',')]
+    n_channels = int(spill_sep[0])
+    spill_params = spill_sep[1:n_channels + 1]
+    matrix = np.array(spill_sep[n_channels + 1:], dtype=object).reshape(n_channels, n_channels)
+
+    numeric_refs = all(param.isdigit() for param in spill_params)
+    new_ids = {param_n: ix for ix, param_n in enumerate(param_ids, 1)}
+    name_ids = {names[param_n]: param_n for param_n in param_ids}
+
+    keep_ix, keep_params = [], []
+    for ix, param in enumerate(spill_params):
+        if numeric_refs and int(param) in new_ids:
+            keep_ix.append(ix)
+            keep_params.append(str(new_ids[int(param)]))
+        elif not numeric_refs and param in name_ids:
+            keep_ix.append(ix)
+            keep_params.append(param)
+
+    if not keep_ix:
+        return None
+
+    sub_matrix = matrix[np.ix_(keep_ix, keep_ix)]
+    spill_vals = [str(len(keep_ix))] + keep_params + list(sub_matrix.ravel())
+    return ','.join(spill_vals)
+
+
+def subset_keywords(param_keys, text, param_ids=None):
+    """Creates output TEXT keywords for selected parameters. Parameter keywords
+    ($PnX and non standard PnX) are renumbered, $PAR and $SPILLOVER are
+    updated, segment offsets are removed to be recalculated by FCSWriter.
+
+    Args:
+        param_keys: keywords in order of location in source TEXT segment
+        text: dict mapping keyword -> value
+        param_ids: selected source parameter ids (1 based) in output order,
+            defaults to all parameters
+
+    Returns:
+        OrderedDict keyword -> value
+    """
+
+    n_params = int(text['$PAR'])
+    if param_ids is None:
+        param_ids = list(range(1, n_params + 1))
+
+    new_ids = {param_n: ix for ix, param_n in enumerate(param_ids, 1)}
+    names = {param_n: text.get('$P{}N'.format(param_n), '') for param_n in param_ids}
+    spx_key = re.compile(r'^(\$?P)(\d+)([A-Z]+)$')
+
+    keywords = OrderedDict()
+    param_keywords = {}
+    for key in param_keys:
+        if key in SEGMENT_KEYWORDS:
+            continue
+
+        spx_match = spx_key.match(key)
+        if spx_match:
+            prefix, param_n, attr = spx_match.groups()
+            param_n = int(param_n)
+            if param_n <= n_params:
+                if param_n in new_ids:
+                    param_keywords[(new_ids[param_n], prefix, attr)] = text[key]
+                continue
+
+        if key in SPILLOVER_KEYWORDS and len(param_ids) != n_params:
+            spillover = subset_spillover(text[key], param_ids, names)
+            if spillover:
+                keywords[key] = spillover
+            continue
+
+        keywords[key] = text[key]
+
+    keywords['$PAR'] = len(param_ids)
+    for (param_n, prefix, attr), value in sorted(param_keywords.items()):
+        keywords['{}{}{}'.format(prefix, param_n, attr)] = value
+
+    return keywords
+
+
+# ------------------------------------------------------------------------------
+class FCSWriter(object):
+    """Instantiates an FCSWriter object.
+
+    Public Attributes:
+        filepath: output fcs filepath
+        dtype: np.dtype including byte order for one DATA segment word
+        n_events: number of events written
+
+    Public Methods:
+        write_events: Append 2D np.array of events, one row per event.
+        close: Finalize HEADER, TEXT offsets and $TOT.
+        reopen: Reopen closed file to append further events.
+
+    Usage:
+        with FCSWriter(filepath, keywords, dtype) as writer:
+            for chunk in chunks:
+                writer.write_events(chunk)
+    """
+
+    def __init__(self, filepath, keywords, dtype):
+        """Initialize FCSWriter and write HEADER, TEXT placeholders.
+
+        Args:
+            filepath: output fcs filepath
+            keywords: dict of TEXT keyword -> value, e.g. from subset_keywords.
+                Segment offsets and $TOT are set by FCSWriter.
+            dtype: np.dtype including byte order for one DATA segment word
+        """
+
+        self.filepath = filepath
+        self.dtype = np.dtype(dtype)
+        self.n_params = int(keywords['$PAR'])
+        self.n_events = 0
+        self._keywords = OrderedDict(
+            (key, value) for key, value in keywords.items() if key not in SEGMENT_KEYWORDS)
+
+        tokens = list(self._keywords.keys()) + [format_value(val) for val in self._keywords.values()]
+        self.delimiter = select_delimiter(tokens) or DELIMITERS[0]
+
+        self.__fcs = open(filepath, 'wb')
+        text_segment = self.__text_segment(0, 0)
+        self.data_start = TEXT_START + len(text_segment)
+        self.__fcs.write(self.__header(0, 0))
+        self.__fcs.write(text_segment)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __offset(self, value):
+        return str(value).zfill(OFFSET_WIDTH)
+
+
+    def __text_segment(self, data_start, data_end):
+        """Encoded TEXT segment including first and last delimiter."""
+
+        segment_vals = OrderedDict((
+            ('$BEGINANALYSIS', '0'), ('$ENDANALYSIS', '0'),
+            ('$BEGINSTEXT', '0'), ('$ENDSTEXT', '0'),
+            ('$BEGINDATA', self.__offset(data_start)),
+            ('$ENDDATA', self.__offset(data_end)),
+            ('$NEXTDATA', '0'),
+            ('$TOT', self.__offset(self.n_events))))
+
+        delim = self.delimiter
+        tokens = []
+        for key, value in chain(segment_vals.items(), self._keywords.items()):
+            tokens.append(escape_delimiter(key, delim))
+            tokens.append(escape_delimiter(format_value(value), delim))
+
+        text = delim + delim.join(tokens) + delim
+        return text.encode('utf-8')
+
+
+    def __header(self, data_start, data_end):
+        text_end = self.data_start - 1
+        if data_end > HEADER_MAX_OFFSET:
+            data_start, data_end = 0, 0
+
+        offsets = (TEXT_START, text_end, data_start, data_end, 0, 0)
+        header = VERSION_ID + ' ' * 4 + ''.join(str(val).rjust(8) for val in offsets)
+        return header.encode('ascii')
+
+
+    # --------------------------------------------------------------------------
+    def write_events(self, events):
+        """Append events to DATA segment.
+
+        Arg:
+            events: 2D np.array with one row per event, one column per parameter
+        """
+
+        events = np.asarray(events)
+        if events.ndim != 2 or events.shape[1] != self.n_params:
+            raise ValueError('Events must have shape (n, {}).'.format(self.n_params))
+
+        if not events.size:
+            return
+
+        self.__fcs.write(events.astype(self.dtype, copy=False).tobytes())
+        self.n_events += events.shape[0]
+
+
+    def close(self):
+        """Finalize segment offsets and $TOT, close output file."""
+
+        if self.__fcs.closed:
+            return
+
+        data_len = self.n_events * self.n_params * self.dtype.itemsize
+        if data_len:
+            data_start, data_end = self.data_start, self.data_start + data_len - 1
+        else:
+            data_start, data_end = 0, 0
+
+        self.__fcs.seek(0)
+        self.__fcs.write(self.__header(data_start, data_end))
+        self.__fcs.write(self.__text_segment(data_start, data_end))
+        self.__fcs.close()
+
+
+    @property
+    def closed(self):
+        return self.__fcs.closed
+
+
+    def reopen(self):
+        """Reopen a closed file, events are appended after the DATA segment.
+        Offsets and $TOT are fixed width so close rewrites them in place.
+        """
+
+        if not self.__fcs.closed:
+            return
+
+        self.__fcs = open(self.filepath, 'r+b')
+        self.__fcs.seek(self.data_start + self.n_events * self.n_params * self.dtype.itemsize)
+
+
+# ------------------------------------------------------------------------------
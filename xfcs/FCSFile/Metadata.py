@@ -86,7 +86,7 @@ class Metadata(object):
         spec_key = keyword.strip('$').lower()
         if val_format:
             val = val_format(self._text.get(keyword, def_val))
-        elif set_val:
+        elif set_val is not None:
             val = set_val
         else:
             val = self._text.get(keyword, def_val)
@@ -23,22 +23,38 @@ def get_log_decade_min(f1, f2):
         return f2
 
 
-def fix_crossover(vals, max_val):
+def fix_crossover(vals, max_val, ref_state=None):
     """Conforms time, event count values to cumulative if actual value exceeds
     numeric maximum value for the file's word length.
 
     Args:
         vals: parameter's values as np.array
         max_val: int - maximum possible value based on word length
+        ref_state: optional dict carrying last value and crossover count
+            between consecutive chunks of the same parameter.
 
     Returns:
         vals: np.array - ascending, cumulative values
     """
 
-    crossover_ix = np.where(vals[:-1] > vals[1:])[0]
-    for ix in crossover_ix:
-        vals = np.append(vals[:ix + 1], vals[ix + 1:] + max_val)
-    return vals
+    if ref_state is not None and 'last' in ref_state:
+        prev_crossovers = ref_state['crossovers']
+        crossovers = np.cumsum(np.concatenate(([ref_state['last']], vals[:-1])) > vals)
+    else:
+        prev_crossovers = 0
+        crossovers = np.concatenate(([0], np.cumsum(vals[:-1] > vals[1:])))
+
+    if ref_state is not None and vals.size:
+        ref_state['last'] = vals[-1]
+        ref_state['crossovers'] = prev_crossovers + int(crossovers[-1])
+
+    crossovers = crossovers + prev_crossovers
+    if not np.any(crossovers):
+        return vals
+
+    if vals.dtype.kind in 'ui':
+        vals = vals.astype(np.int64)
+    return vals + crossovers * max_val
 
 
 # ------------------------------------------------------------------------------
@@ -208,10 +224,9 @@ class ParameterData(object):
         return count_id
 
 
-    def __normalize_count(self, event_count):
+    def __normalize_count(self, event_count, start_val):
         """Starts event count parameter at 1"""
 
-        start_val = event_count.item(0)
         diff = start_val - 1
         if start_val < 0:
             print('>>> event count warning:', start_val)
@@ -219,12 +234,13 @@ class ParameterData(object):
         return event_count - diff
 
 
-    def __scale_count(self, count_id, norm):
+    def __scale_count(self, count_id, norm, ref_state):
         """Applies bit mask and/or normalization to event count parameter.
 
         Args:
             count_id: numeric parameter id for event count
             norm: bool - user enabled option to enforce count starting at 1
+            ref_state: optional dict carrying values between data chunks
 
         Returns:
             np.array event count values
@@ -235,32 +251,52 @@ class ParameterData(object):
         if event_spec.bit_mask:
             event_count = self.__bit_mask_data(count_id)
 
-        if norm and event_count.item(0) != 1:
-            event_count = self.__normalize_count(event_count)
+        if ref_state is not None:
+            event_count = fix_crossover(event_count.astype(np.int64), self.spec.max_val, ref_state)
+        elif np.any(event_count[:-1] > event_count[1:]):
+            event_count = fix_crossover(event_count, self.spec.max_val)
+
+        if not event_count.size:
+            return event_count
+
+        if ref_state is not None:
+            start_val = ref_state.setdefault('start', event_count.item(0))
+        else:
+            start_val = event_count.item(0)
+
+        if norm and start_val != 1:
+            event_count = self.__normalize_count(event_count, start_val)
 
         return event_count
 
 
-    def __load_ref_count(self, norm):
+    def __load_ref_count(self, norm, ref_state=None, n_events=None):
         """Locates or creates event count parameter. Checks for values exceeding
         maximum possible based on word length. Count is assigned to id -1 and
         stored in _reference_channels.
 
-        Arg:
+        Args:
             norm: bool - user enabled option to enforce count starting at 1
+            ref_state: optional dict carrying values between data chunks
+            n_events: number of events, defaults to length of first raw channel
 
         Returns:
             numeric parameter id (-1)
         """
 
         count_id = self.__locate_count_param()
+        if n_events is None:
+            n_events = len(self.raw[self.par_ids[0]])
         if count_id:
-            event_count = self.__scale_count(count_id, norm)
+            event_count = self.__scale_count(count_id, norm, ref_state)
+        elif ref_state is not None:
+            first_event = ref_state.get('n_events', 0) + 1
+            event_count = np.arange(first_event, first_event + n_events)
         else:
-            event_count = np.arange(1, len(self.raw[1]) + 1)
+            event_count = np.arange(1, n_events + 1)
 
-        if np.any(event_count[:-1] > event_count[1:]):
-            event_count = fix_crossover(event_count, self.spec.max_val)
+        if ref_state is not None:
+            ref_state['n_events'] = ref_state.get('n_events', 0) + n_events
 
         self.__update_id_maps('Event Count', -1)
         self._reference_channels[-1] = event_count
@@ -295,6 +331,65 @@ class ParameterData(object):
         return time_lsw, time_msw, time_id
 
 
+    def __resolve_time_params(self):
+        """Resolves located time params into either one time parameter or a
+        lsw, msw pair.
+
+        Returns:
+            time_lsw, time_msw, time_id - numeric id or 0 if not used
+        """
+
+        time_lsw, time_msw, time_id = self.__locate_time_params()
+        if time_id and (time_lsw or time_msw) and not(time_lsw and time_msw):
+            if time_lsw:
+                time_msw = time_id
+            else:
+                time_lsw = time_id
+            time_id = 0
+
+        elif all((time_lsw, time_msw, time_id)):
+            time_id = 0
+
+        return time_lsw, time_msw, time_id
+
+
+    def reference_ids(self):
+        """Locates time and event count parameters without loading data.
+
+        Returns:
+            time_ids: tuple of time parameter id or (lsw, msw) ids, empty if
+                time is not located
+            count_id: event count parameter id or 0
+        """
+
+        time_lsw, time_msw, time_id = self.__resolve_time_params()
+        if time_id:
+            time_ids = (time_id,)
+        elif time_lsw and time_msw:
+            time_ids = (time_lsw, time_msw)
+        else:
+            time_ids = ()
+        return time_ids, self.__locate_count_param()
+
+
+    def time_values(self, raw_channels, norm=True, ref_state=None):
+        """Loads time values from raw time parameter values only, no other
+        parameter is required.
+
+        Args:
+            raw_channels: dict mapping time parameter id(s) -> raw values
+            norm: bool - enforce time starting at 0.0
+            ref_state: optional dict carrying values between data chunks
+
+        Returns:
+            np.array time values or None if time is not located
+        """
+
+        self.raw = raw_channels
+        self.__load_ref_time(norm, ref_state)
+        return self._reference_channels.get(0)
+
+
     def __encode_time(self, time_lsw, time_msw):
         """Converts 2 single word length time parameters into actual, double word
         length time measurement.
@@ -314,29 +409,21 @@ class ParameterData(object):
         return double_word
 
 
-    def __load_ref_time(self, norm):
+    def __load_ref_time(self, norm, ref_state=None):
         """Loads time parameter and determines if it exists, or it is split
         between lsw and msw. Applies $TIMESTEP (and gain) factor.
         Stored in _reference_channels as id 0.
 
-        Arg:
+        Args:
             norm: bool - user enabled option to enforce time starting at 0.0
+            ref_state: optional dict carrying values between data chunks
 
         Returns:
             list of non-zero time ids
         """
 
-        time_lsw, time_msw, time_id = self.__locate_time_params()
-        if time_id and (time_lsw or time_msw) and not(time_lsw and time_msw):
-            if time_lsw:
-                time_msw = time_id
-            else:
-                time_lsw = time_id
-            time_id = 0
-
-        elif all((time_lsw, time_msw, time_id)):
-            time_id = 0
-        elif not any((time_lsw, time_msw, time_id)):
+        time_lsw, time_msw, time_id = self.__resolve_time_params()
+        if not any((time_lsw, time_msw, time_id)):
             return 0, 0, 0
 
         if time_id or (time_lsw and time_msw):
@@ -351,12 +438,19 @@ class ParameterData(object):
                     gain_factor = time_spec.gain
 
             # check for time roll over
-            if np.any(time_channel[:-1] > time_channel[1:]):
+            if ref_state is not None:
+                time_channel = fix_crossover(time_channel, self.spec.max_val, ref_state)
+            elif np.any(time_channel[:-1] > time_channel[1:]):
                 time_channel = fix_crossover(time_channel, self.spec.max_val)
 
             time_channel = time_channel * self.spec.timestep / gain_factor
-            if norm and time_channel[0] != 0:
-                time_channel = time_channel - time_channel[0]
+            if ref_state is not None and time_channel.size:
+                start_time = ref_state.setdefault('start', time_channel.item(0))
+            else:
+                start_time = time_channel[0] if time_channel.size else 0
+
+            if norm and start_time != 0:
+                time_channel = time_channel - start_time
 
             self.__update_id_maps('TIME', 0)
             self._reference_channels[0] = time_channel
@@ -364,7 +458,35 @@ class ParameterData(object):
         return [t_id for t_id in (time_lsw, time_msw, time_id) if t_id]
 
 
-    def load_reference_channels(self, norm_count, norm_time):
+    def reference_values(self, raw_channels, n_events, norm_count=True, norm_time=True,
+                         ref_state=None):
+        """Loads time and event count values from raw reference parameter
+        values only, no other parameter is required.
+
+        Args:
+            raw_channels: dict mapping reference parameter ids (reference_ids)
+                -> raw values
+            n_events: number of events
+            norm_count: bool - enforce count starting at 1
+            norm_time: bool - enforce time starting at 0.0
+            ref_state: optional dict shared by consecutive data chunks
+
+        Returns:
+            dict mapping reference id (0: time, -1: event count) -> np.array
+        """
+
+        time_state = count_state = None
+        if ref_state is not None:
+            time_state = ref_state.setdefault('time', {})
+            count_state = ref_state.setdefault('count', {})
+
+        self.raw = raw_channels
+        self.__load_ref_time(norm_time, time_state)
+        self.__load_ref_count(norm_count, count_state, n_events)
+        return dict(self._reference_channels)
+
+
+    def load_reference_channels(self, norm_count, norm_time, ref_state=None, ref_values=None):
         """Initializes time and event count parameters to be stored in
         _reference_channels under ids 0, -1. Filters any time, event count ids
         from par_ids.
@@ -372,16 +494,29 @@ class ParameterData(object):
         Args:
             norm_count: bool - user enabled option to enforce count starting at 1
             norm_time: bool - user enabled option to enforce time starting at 0.0
+            ref_state: optional dict shared by consecutive data chunks so count,
+                time crossover and normalization continue across chunks.
+            ref_values: optional dict of reference id -> values, replaces values
+                derived from raw data, e.g. for a sample of events whose time
+                and count were resolved over all events.
         """
 
-        time_ids = self.__load_ref_time(norm_time)
+        time_state = count_state = None
+        if ref_state is not None:
+            time_state = ref_state.setdefault('time', {})
+            count_state = ref_state.setdefault('count', {})
+
+        time_ids = self.__load_ref_time(norm_time, time_state)
         if time_ids:
             self.ref_ids.extend(time_ids)
 
-        count_id = self.__load_ref_count(norm_count)
+        count_id = self.__load_ref_count(norm_count, count_state)
         self.ref_ids.append(count_id)
         self.par_ids = tuple(id_ for id_ in self.par_ids if id_ not in self.ref_ids)
 
+        if ref_values:
+            self._reference_channels.update(ref_values)
+
 
     # --------------------------------------------------------------------------
     def get_raw(self):
@@ -415,6 +550,33 @@ class ParameterData(object):
         self.raw = dict(zip(self.par_ids, raw_channels))
 
 
+    def extend(self, others):
+        """Appends events from other ParameterData instances of the same data
+        section, in order. Derived data sets are reset and recalculated on access.
+
+        Arg:
+            others: iterable of ParameterData instances
+        """
+
+        others = list(others)
+        if not others:
+            return
+
+        self.raw = {
+            param_n: np.concatenate([values] + [other.raw[param_n] for other in others])
+            for param_n, values in self.raw.items()}
+        self._reference_channels = {
+            ref_id: np.concatenate([values] + [other._reference_channels[ref_id] for other in others])
+            for ref_id, values in self._reference_channels.items()}
+
+        self.channel = {}
+        self.scale = {}
+        self.xcxs = {}
+        self.compensated = {}
+        self.logscale_compensated = {}
+        self.set_channel_values()
+
+
     def __bit_mask_data(self, param_n):
         data = self.raw.get(param_n)
         spec_n = self._config.get(param_n)
@@ -504,6 +666,52 @@ class ParameterData(object):
                 self.scale[param_n] = gain_data
 
 
+    # --------------------------------------------------------------------------
+    def value_range(self, param_n, data_set='channel'):
+        """Determines the possible value range for a parameter within a data set
+        based on $PnB, $PnR, $PnE, $PnG and compensation factors.
+
+        Args:
+            param_n: parameter id (-1 event count, 0 time)
+            data_set: DataSection data set name
+
+        Returns:
+            (min value, max value, bool log scaled) or None if range is unknown
+        """
+
+        if param_n == -1:
+            return (1, self.spec.tot + 1, False)
+        elif param_n not in self._config:
+            return None
+
+        spec_ = self._config[param_n]
+        if data_set == 'raw':
+            if self.spec.type_i:
+                return (0, 2**spec_.word_len, False)
+            return (0, self.spec.channels[param_n]['R'], False)
+
+        if self.spec.type_i:
+            ch_max = spec_.max_range + 1
+        else:
+            ch_max = self.spec.channels[param_n]['R']
+
+        is_log = bool(spec_.log_max)
+        comp_factor = 1
+        if data_set in ('compensated', 'scale_compensated'):
+            comp_factor = (self._comp_matrix or {}).get(param_n, 1)
+
+        if data_set == 'scale_compensated' or (is_log and data_set in ('scale', 'channel_scale')):
+            log_max = spec_.log_max * ch_max / spec_.max_range
+            log_lo, log_hi = sorted((0, log_max * comp_factor))
+            return (spec_.log_min * 10**log_lo, spec_.log_min * 10**log_hi, True)
+
+        if data_set == 'scale' and param_n in getattr(self, 'gain_ids', ()):
+            return (0, ch_max / spec_.gain, False)
+
+        lo, hi = sorted((0, ch_max * comp_factor))
+        return (lo, hi, False)
+
+
     # --------------------------------------------------------------------------
     def _has_compensation(self, xch=''):
         if not self.spec.spillover:
@@ -0,0 +1,205 @@
+"""
+Concatenate and split fcs files without transforming parameter data.
+
+Raw DATA values are copied chunk by chunk into FCSWriter. Only the reference
+parameters are touched:
+    concat: time and event count continue from the previous file
+    split: time values select the output file for each event
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xfcs.FCSFile.DataStream import CHUNK_EVENTS
+from xfcs.FCSFile.FCSWriter import FCSWriter, subset_keywords
+from xfcs.FCSFile.ParameterData import ParameterData, fix_crossover
+# ------------------------------------------------------------------------------
+MAX_OPEN_SPLITS = 16
+
+
+class ReferenceRebase(object):
+    """Shifts raw values of a cumulative reference parameter (time, event
+    count) so each file continues from the end of the previous file. The first
+    file keeps its original values.
+    """
+
+    def __init__(self, max_val, type_i):
+        """Initialize ReferenceRebase.
+
+        Args:
+            max_val: maximum value + 1 for $DATATYPE I word length
+            type_i: bool - integer data, values wrap at max_val
+        """
+
+        self.max_val = max_val
+        self.type_i = type_i
+        self.next_start = None
+        self.start_file()
+
+
+    def start_file(self):
+        self._ref_state = {}
+        self._offset = None
+        self._first = None
+        self._last = None
+        self._n_values = 0
+
+
+    def rebase(self, raw_vals):
+        """Returns rebased raw values with the original dtype."""
+
+        if not raw_vals.size:
+            return raw_vals
+
+        if self.type_i:
+            vals = fix_crossover(raw_vals.astype(np.int64), self.max_val, self._ref_state)
+        else:
+            vals = raw_vals.astype(np.float64)
+
+        if self._offset is None:
+            if self.next_start is None:
+                self.next_start = vals.item(0)
+            self._offset = self.next_start - vals.item(0)
+            self._first = self.next_start
+
+        vals = vals + self._offset
+        self._last = vals.item(-1)
+        self._n_values += vals.size
+
+        if self.type_i:
+            vals %= self.max_val
+        return vals.astype(raw_vals.dtype)
+
+
+    def end_file(self):
+        """Next file starts one average step after the last value."""
+
+        if self._last is None:
+            return
+
+        step = (self._last - self._first) / (self._n_values - 1) if self._n_values > 1 else 1
+        if self.type_i:
+            step = max(int(round(step)), 1)
+        self.next_start = self._last + step
+        self.start_file()
+
+
+def concat_fcs(fcs_files, filepath, chunk_size=CHUNK_EVENTS):
+    """Concatenate fcs files sharing the same channel layout (hashkey) into
+    one FCS 3.1 file. TEXT is copied from the first file with $ETIM from the
+    last file. Time and event count continue across files.
+
+    Args:
+        fcs_files: list of loaded FCSFile instances in output order
+        filepath: output fcs filepath
+        chunk_size: number of events per chunk
+
+    Returns:
+        number of events written
+
+    Raises:
+        ValueError: if channel layouts do not match
+    """
+
+    first = fcs_files[0]
+    for fcs in fcs_files[1:]:
+        if fcs.hashkey != first.hashkey:
+            raise ValueError('{} does not share channel layout with {}'.format(fcs.name, first.name))
+
+    keywords = subset_keywords(first.param_keys, first.text)
+    if '$ETIM' in fcs_files[-1].text:
+        keywords['$ETIM'] = fcs_files[-1].text['$ETIM']
+
+    streams = [fcs.stream_data(chunk_size=chunk_size) for fcs in fcs_files]
+    spec = streams[0].spec
+    time_ids, count_id = ParameterData(spec).reference_ids()
+    if len(time_ids) > 1:
+        print('>>> Time is split into lsw, msw parameters and will not be rebased.')
+        time_ids = ()
+
+    rebase = {param_n: ReferenceRebase(spec.max_val, spec.type_i)
+              for param_n in time_ids + ((count_id,) if count_id else ())}
+
+    with FCSWriter(filepath, keywords, streams[0].dtype) as writer:
+        for stream in streams:
+            for raw_chunk in stream.raw_chunks():
+                for param_n, ref_rebase in rebase.items():
+                    raw_chunk[:, param_n - 1] = ref_rebase.rebase(raw_chunk[:, param_n - 1])
+                writer.write_events(raw_chunk)
+
+            for ref_rebase in rebase.values():
+                ref_rebase.end_file()
+            stream.close()
+
+    return writer.n_events
+
+
+def split_fcs(fcs, every, suffix='split', chunk_size=CHUNK_EVENTS):
+    """Split fcs file into consecutive time windows. Only time parameter values
+    are decoded, events are copied unchanged into one FCS 3.1 file per window
+    containing events. Output files are named <source>_<suffix><window>.fcs
+
+    Args:
+        fcs: loaded FCSFile instance
+        every: window length in time units ($TIMESTEP applied, e.g. seconds)
+        suffix: appended to source filename before window number
+        chunk_size: number of events per chunk
+
+    Returns:
+        list of (filepath, number of events)
+
+    Raises:
+        ValueError: if time parameter is not located or every <= 0
+    """
+
+    if every <= 0:
+        raise ValueError('Split window must be greater than 0.')
+
+    stream = fcs.stream_data(norm_time=True, chunk_size=chunk_size)
+    keywords = subset_keywords(fcs.param_keys, fcs.text)
+    base_path = fcs.filepath.rsplit('.', 1)[0]
+    writers = {}
+    open_windows = OrderedDict()
+
+    def window_writer(window):
+        """Writer for window, at most MAX_OPEN_SPLITS files are open. Least
+        recently used writers are closed and reopened if time goes back.
+        """
+
+        if window not in writers:
+            split_path = '{}_{}{:03d}.fcs'.format(base_path, suffix, window)
+            writers[window] = FCSWriter(split_path, keywords, stream.dtype)
+        elif writers[window].closed:
+            writers[window].reopen()
+
+        open_windows[window] = None
+        open_windows.move_to_end(window)
+        while len(open_windows) > MAX_OPEN_SPLITS:
+            lru_window, _ = open_windows.popitem(last=False)
+            writers[lru_window].close()
+        return writers[window]
+
+    try:
+        for (chunk_start, chunk_stop), time_vals in stream.time_chunks():
+            windows = np.floor(time_vals / every).astype(np.int64)
+            raw_chunk = next(stream.raw_chunks(chunk_start, chunk_stop))
+
+            cuts = np.flatnonzero(np.diff(windows)) + 1
+            seg_starts = np.concatenate(([0], cuts))
+            seg_stops = np.concatenate((cuts, [windows.size]))
+            for seg_start, seg_stop in zip(seg_starts, seg_stops):
+                window = int(windows[seg_start])
+                window_writer(window).write_events(raw_chunk[seg_start:seg_stop])
+    finally:
+        for writer in writers.values():
+            writer.close()
+        stream.close()
+
+    if not writers and stream.n_events:
+        raise ValueError('Time parameter not located in {}'.format(fcs.name))
+
+    return [(writers[window].filepath, writers[window].n_events) for window in sorted(writers)]
+
+
+# ------------------------------------------------------------------------------
@@ -1,2 +1,3 @@
 from xfcs.FCS import FCS
+from xfcs.get_metadata import query_metadata, query_paths
 from xfcs.utils.locator import locate_fcs_files
@@ -1,6 +1,9 @@
 import argparse
 
-from xfcs import get_data, get_metadata
+from xfcs import (
+    get_concat, get_data, get_histograms, get_metadata, get_populations, get_split, get_stats,
+    get_subset)
+from xfcs.utils import manifest, metadata_columnar, metadata_index, metadata_query
 from xfcs.version import VERSION
 # ------------------------------------------------------------------------------
 
@@ -14,25 +17,26 @@ def add_global_options(cmd_parser):
         '--recursive', '-r', action='store_true', dest='recursive',
         help='Enable recursive search of current directory.')
 
+    fcs_in.add_argument(
+        '--include', nargs='+', metavar='<pattern>',
+        help='Only search fcs files matching any pattern (relative path or filename), '
+             'e.g. "plate_*/*.fcs".')
 
-def parse_arguments():
-    """Parse command line arguments."""
+    fcs_in.add_argument(
+        '--exclude', nargs='+', metavar='<pattern>',
+        help='Skip fcs files and directories matching any pattern.')
 
-    parser = argparse.ArgumentParser(prog='xfcs', description='Extract FCS Data and Metadata')
+    fcs_in.add_argument(
+        '--max-depth', type=int, default=None, dest='max_depth', metavar='n',
+        help='Maximum sub directory depth of recursive search.')
 
-    subparsers = parser.add_subparsers(dest='command')
-    data = subparsers.add_parser('data')
-    data.set_defaults(func=get_data.main)
-    add_global_options(data)
+    fcs_in.add_argument(
+        '--walk-threads', type=int, default=1, dest='walk_threads', metavar='n',
+        help='Number of threads listing sub directories in recursive search.')
 
-    meta = subparsers.add_parser('metadata')
-    meta.set_defaults(func=get_metadata.main)
-    add_global_options(meta)
 
-    # --------------------------------------------------------------------------
-    # DATA ARGS
-    # --------------------------------------------------------------------------
-    dsval = data.add_argument_group('Data Set Options')
+def add_data_set_options(cmd_parser):
+    dsval = cmd_parser.add_argument_group('Data Set Options')
 
     dsval.add_argument(
         '--raw', '-w', action='store_true', help='Raw data values.')
@@ -56,6 +60,61 @@ def parse_arguments():
         '--scale-fl-comp', '-p', action='store_true', dest='scale_fl_comp',
         help='Log scaled, fluorescence compensated data values.')
 
+
+def add_query_options(cmd_parser):
+    query = cmd_parser.add_argument_group('Query Options')
+    query.add_argument(
+        '--where', nargs='+', type=metadata_query.predicate, metavar='<predicate>',
+        help='Only include fcs files whose metadata matches all predicates: '
+             'keyword op value, op: == != > >= < <= ~ (pattern). '
+             'e.g. "$CYT~*Fortessa*" "$P3V>500" "$DATE>=01-SEP-2026"')
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(prog='xfcs', description='Extract FCS Data and Metadata')
+
+    subparsers = parser.add_subparsers(dest='command')
+    data = subparsers.add_parser('data')
+    data.set_defaults(func=get_data.main)
+    add_global_options(data)
+    add_query_options(data)
+
+    meta = subparsers.add_parser('metadata')
+    meta.set_defaults(func=get_metadata.main)
+    add_global_options(meta)
+    add_query_options(meta)
+
+    gate = subparsers.add_parser('gate')
+    gate.set_defaults(func=get_populations.main)
+    add_global_options(gate)
+
+    hist = subparsers.add_parser('hist')
+    hist.set_defaults(func=get_histograms.main)
+    add_global_options(hist)
+
+    stats = subparsers.add_parser('stats')
+    stats.set_defaults(func=get_stats.main)
+    add_global_options(stats)
+
+    subset = subparsers.add_parser('subset')
+    subset.set_defaults(func=get_subset.main)
+    add_global_options(subset)
+
+    concat = subparsers.add_parser('concat')
+    concat.set_defaults(func=get_concat.main)
+    add_global_options(concat)
+
+    split = subparsers.add_parser('split')
+    split.set_defaults(func=get_split.main)
+    add_global_options(split)
+
+    # --------------------------------------------------------------------------
+    # DATA ARGS
+    # --------------------------------------------------------------------------
+    add_data_set_options(data)
+
     fcs_out = data.add_argument_group('Output Options')
 
     fcs_out.add_argument(
@@ -66,14 +125,92 @@ def parse_arguments():
         '--ref-time', '-t', dest='norm_time', action='store_false',
         help='Use actual time parameter data instead of normalizing start to zero.')
 
-    fcs_out.add_argument(
+    file_type = fcs_out.add_mutually_exclusive_group()
+
+    file_type.add_argument(
         '--hdf5', action='store_true',
         help='Use HDF5 filetype for data instead of csv.')
 
+    file_type.add_argument(
+        '--parquet', action='store_true',
+        help='Use Parquet filetype for data instead of csv (requires pyarrow).')
+
+    file_type.add_argument(
+        '--npy', action='store_true',
+        help='Use memory-mappable NumPy .npy array with json sidecar for data instead of csv.')
+
+    file_type.add_argument(
+        '--hdf5-store', dest='hdf5_store', metavar='<store.h5>',
+        help='Write all fcs files into one appendable HDF5 store, one table per file per '
+             'data set. Previously stored data sets are skipped.')
+
+    fcs_out.add_argument(
+        '--complib', default='blosc:lz4',
+        choices=('blosc:lz4', 'blosc:zstd', 'blosc', 'zlib', 'lzo', 'bzip2'),
+        help='HDF5 compression library (default: blosc:lz4).')
+
+    fcs_out.add_argument(
+        '--complevel', type=int, default=5, choices=range(10), metavar='0-9',
+        help='HDF5 compression level (default: 5).')
+
+    fcs_out.add_argument(
+        '--compression', default='zstd', choices=('zstd', 'snappy', 'gzip', 'none'),
+        help='Parquet compression codec (default: zstd).')
+
+    fcs_out.add_argument(
+        '--row-group-size', type=int, default=2**18, dest='row_group_size', metavar='n',
+        help='Events per Parquet row group, also used as read chunk size (default: 262144).')
+
+    float_fmt = fcs_out.add_mutually_exclusive_group()
+
+    float_fmt.add_argument(
+        '--float-format', dest='float_format', metavar='<fmt>',
+        help='csv float column format e.g. %%.4f (default: shortest exact value).')
+
+    float_fmt.add_argument(
+        '--sig-digits', type=int, dest='sig_digits', metavar='n',
+        help='csv float columns with n significant digits.')
+
+    fcs_out.add_argument(
+        '--gzip', action='store_true',
+        help='gzip compress csv files while writing (.csv.gz).')
+
     fcs_out.add_argument(
         '--metadata', '-m', action='store_true',
         help='Generate metadata csv file for each fcs file.')
 
+    fcs_out.add_argument(
+        '--stdout', action='store_true',
+        help='Stream one selected data set for all files to stdout instead of files. '
+             'Progress is written to stderr.')
+
+    fcs_out.add_argument(
+        '--format', default='arrow', choices=('arrow', 'csv'),
+        help='stdout stream format: Arrow IPC stream (requires pyarrow) or csv (default: arrow).')
+
+    fcs_out.add_argument(
+        '--jobs', '-j', type=int, default=1, metavar='n',
+        help='Number of worker processes.')
+
+    fcs_out.add_argument(
+        '--manifest', nargs='?', const=manifest.MANIFEST_NAME, metavar='<manifest.jsonl>',
+        help='Record exported files in manifest and skip files unchanged since a previous '
+             'export with the same options (default: {}).'.format(manifest.MANIFEST_NAME))
+
+    sample_opt = data.add_argument_group('Sample Options')
+
+    sample_opt.add_argument(
+        '--sample', type=int, default=0, metavar='n',
+        help='Randomly select n events per file. Only sampled events are decoded.')
+
+    sample_opt.add_argument(
+        '--seed', type=int, default=None, metavar='n',
+        help='Random seed for reproducible samples.')
+
+    sample_opt.add_argument(
+        '--stratified', action='store_true',
+        help='Spread sampled events evenly over acquisition time.')
+
     # --------------------------------------------------------------------------
     # METADATA ARGS
     # --------------------------------------------------------------------------
@@ -86,7 +223,25 @@ def parse_arguments():
 
     outgrp.add_argument(
         '--output', '-o', type=argparse.FileType('w'), metavar='<file.csv>',
-        help='Output .csv filepath for merged metadata file.')
+        help='Output filepath for merged metadata file (.csv, or .parquet / .sqlite with '
+             '--format).')
+
+    outgrp.add_argument(
+        '--paths', action='store_true',
+        help='Write filepaths of selected fcs files to stdout instead of csv, '
+             'e.g. with --where.')
+
+    typed_out = meta.add_argument_group('Typed Export Options')
+
+    typed_out.add_argument(
+        '--format', default='csv', choices=metadata_columnar.EXPORT_FORMATS,
+        help='Merged metadata file format. parquet (requires pyarrow) and sqlite store one '
+             'typed row per file, numeric keywords as numeric columns (default: csv).')
+
+    typed_out.add_argument(
+        '--channels', action='store_true',
+        help='With --format parquet|sqlite, pivot $PnX keywords to a channel table with '
+             'one row per file per channel.')
 
     procopt = meta.add_argument_group('Metadata Option - select 1')
     kw_merge = procopt.add_mutually_exclusive_group()
@@ -119,10 +274,160 @@ def parse_arguments():
         '--dashboard', action='store_true',
         help='Generate interactive plot with current metadata scan.')
 
+    watch_opt = meta.add_argument_group('Watch Options')
+
+    watch_opt.add_argument(
+        '--watch', action='store_true',
+        help='Poll directory for new fcs files and append metadata to --append-to, '
+             '--output or default csv file until interrupted.')
+
+    watch_opt.add_argument(
+        '--interval', type=float, default=10.0, metavar='sec',
+        help='Seconds between directory polls (default: 10).')
+
+    watch_opt.add_argument(
+        '--batch-size', type=int, default=100, dest='batch_size', metavar='n',
+        help='Maximum number of new fcs files per append (default: 100).')
+
+    meta.add_argument(
+        '--index', nargs='?', const=metadata_index.INDEX_NAME, metavar='<index.sqlite>',
+        help='Persistent metadata index, only new or changed fcs files are opened '
+             '(default: {}).'.format(metadata_index.INDEX_NAME))
+
+    meta.add_argument(
+        '--jobs', '-j', type=int, default=1, metavar='n',
+        help='Number of threads reading fcs files concurrently.')
+
     meta.add_argument(
         '-q', '--quiet', action='store_true',
         help='Disable fcs load notification.')
 
+    # --------------------------------------------------------------------------
+    # GATE ARGS
+    # --------------------------------------------------------------------------
+    gate.add_argument(
+        '--gating-ml', '-g', type=argparse.FileType('r'), metavar='<gates.xml>',
+        dest='gating_ml', required=True,
+        help='Gating-ML 2.0 file containing gating strategy.')
+
+    gate.add_argument(
+        '--data-set', '-d', dest='data_set', default='channel_scale',
+        choices=('raw', 'channel', 'scale', 'channel_scale'),
+        help='Data set used for uncompensated gate dimensions (default: channel_scale).')
+
+    gate.add_argument(
+        '--output', '-o', type=argparse.FileType('w'), metavar='<file.csv>',
+        help='Output .csv filepath for population stats.')
+
+    gate.add_argument(
+        '--jobs', '-j', type=int, default=1, metavar='n',
+        help='Number of worker processes.')
+
+    gate.add_argument(
+        '--ref-count', '-e', dest='norm_count', action='store_false',
+        help='Use actual event count parameter data instead of normalizing start to one.')
+
+    gate.add_argument(
+        '--ref-time', '-t', dest='norm_time', action='store_false',
+        help='Use actual time parameter data instead of normalizing start to zero.')
+
+    # --------------------------------------------------------------------------
+    # HIST ARGS
+    # --------------------------------------------------------------------------
+    hist.add_argument(
+        '--data-set', '-d', dest='data_set', default='channel',
+        choices=('raw', 'channel', 'scale', 'channel_scale', 'compensated', 'scale_compensated'),
+        help='Data set used for histograms (default: channel).')
+
+    hist.add_argument(
+        '--bins', '-b', type=int, default=256, metavar='n',
+        help='Number of bins per channel (default: 256).')
+
+    hist.add_argument(
+        '--channels', '-c', nargs='+', metavar='<name>',
+        help='Channel names for 1D histograms (default: all channels).')
+
+    hist.add_argument(
+        '--pairs', '-p', nargs='+', metavar='<x,y>',
+        help='Channel name pairs for 2D histograms.')
+
+    hist.add_argument(
+        '--ref-count', '-e', dest='norm_count', action='store_false',
+        help='Use actual event count parameter data instead of normalizing start to one.')
+
+    hist.add_argument(
+        '--ref-time', '-t', dest='norm_time', action='store_false',
+        help='Use actual time parameter data instead of normalizing start to zero.')
+
+    # --------------------------------------------------------------------------
+    # STATS ARGS
+    # --------------------------------------------------------------------------
+    add_data_set_options(stats)
+
+    stats_out = stats.add_argument_group('Output Options')
+
+    stats_out.add_argument(
+        '--percentiles', nargs='+', type=float, default=[5, 25, 50, 75, 95], metavar='q',
+        help='Approximate percentiles to include (default: 5 25 50 75 95).')
+
+    stats_out.add_argument(
+        '--output', '-o', type=argparse.FileType('w'), metavar='<file.csv>',
+        help='Output filepath for channel stats.')
+
+    stats_out.add_argument(
+        '--parquet', action='store_true',
+        help='Use Parquet filetype for channel stats instead of csv (requires pyarrow).')
+
+    stats_out.add_argument(
+        '--ref-count', '-e', dest='norm_count', action='store_false',
+        help='Use actual event count parameter data instead of normalizing start to one.')
+
+    stats_out.add_argument(
+        '--ref-time', '-t', dest='norm_time', action='store_false',
+        help='Use actual time parameter data instead of normalizing start to zero.')
+
+    # --------------------------------------------------------------------------
+    # SUBSET ARGS
+    # --------------------------------------------------------------------------
+    subset.add_argument(
+        '--channels', '-c', nargs='+', metavar='<name>',
+        help='Channel names to include in output order (default: all channels).')
+
+    subset.add_argument(
+        '--events', '-n', metavar='<start:stop>',
+        help='Event index range, stop is exclusive e.g. 0:50000 or 1000:')
+
+    subset.add_argument(
+        '--time-range', '-t', dest='time_range', metavar='<min:max>',
+        help='Time range relative to first event, max is exclusive e.g. 10:60 or :30')
+
+    subset.add_argument(
+        '--suffix', default='subset', metavar='<suffix>',
+        help='Appended to source filename for output fcs file (default: subset).')
+
+    # --------------------------------------------------------------------------
+    # CONCAT ARGS
+    # --------------------------------------------------------------------------
+    concat.add_argument(
+        '--output', '-o', metavar='<file.fcs>',
+        help='Output fcs filepath, all input files must share one channel layout. Written '
+             'only after the inputs are validated.')
+
+    concat.add_argument(
+        '--suffix', default='concat', metavar='<suffix>',
+        help='Appended to first filename of each group for output fcs file (default: concat).')
+
+    # --------------------------------------------------------------------------
+    # SPLIT ARGS
+    # --------------------------------------------------------------------------
+    split.add_argument(
+        '--every', required=True, metavar='<duration>',
+        help='Time window length e.g. 60s, 5m, 500ms. Number without unit is seconds.')
+
+    split.add_argument(
+        '--suffix', default='split', metavar='<suffix>',
+        help='Appended to source filename before window number (default: split).')
+
     # --------------------------------------------------------------------------
     parser.add_argument('-v', '--version', action='version', version=VERSION)
 
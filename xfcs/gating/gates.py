@@ -0,0 +1,392 @@
+"""
+Vectorized gate evaluation for extracted parameter data sets.
+
+A gate selects a population of events based on one or more parameter channel
+values. Evaluating a gate returns a boolean numpy mask with one entry per event.
+
+Supported gate types:
+    RectangleGate: min / max range for any number of channels (open ended allowed)
+    QuadrantGate: one quadrant of 2 channels split at a single point
+    PolygonGate: 2 channel polygon using a vectorized crossing number test
+    EllipseGate: ellipsoid defined by mean, covariance matrix and distance squared
+    BooleanGate: and / or / not combinations of any other gates
+
+Gates combine with the bitwise operators:
+    gate_a & gate_b, gate_a | gate_b, ~gate_a
+
+Range conventions follow Gating-ML 2.0: min values are inclusive, max values
+are exclusive and ellipse boundaries are inclusive. Polygon edges use the
+half-open crossing number rule.
+
+GateMasks caches one mask per gate for a single data set so repeated queries
+(and any BooleanGate sharing operands) never evaluate the same gate twice.
+"""
+
+from itertools import count
+
+import numpy as np
+
+from xfcs.FCSFile.FCSError import ChannelNotFoundError
+# ------------------------------------------------------------------------------
+_gate_counter = count(1)
+
+
+def channel_values(values, channel):
+    """Retrieve numpy array for channel from any mapping of channel name to data.
+
+    Args:
+        values: dict, DataFrame or GateMasks values mapping channel name -> data
+        channel: channel name
+
+    Returns:
+        np.array of channel values
+
+    Raises:
+        ChannelNotFoundError: if channel is not located in values
+    """
+
+    try:
+        ch_data = values[channel]
+    except KeyError:
+        raise ChannelNotFoundError(channel, list(values.keys())) from None
+    return np.asarray(ch_data)
+
+
+def _event_count(values, dimensions):
+    return channel_values(values, dimensions[0]).shape[0]
+
+
+# ------------------------------------------------------------------------------
+class Gate(object):
+    """Base class for all gates.
+
+    Attributes:
+        gate_id: str name of gate
+        dimensions: tuple of channel names required to evaluate gate
+    """
+
+    def __init__(self, gate_id, dimensions):
+        if not gate_id:
+            gate_id = '{}_{}'.format(self.__class__.__name__, next(_gate_counter))
+
+        self.gate_id = gate_id
+        self.dimensions = tuple(dimensions)
+
+
+    def __repr__(self):
+        return '{}({!r}, {})'.format(self.__class__.__name__, self.gate_id, self.dimensions)
+
+
+    def __and__(self, other):
+        return BooleanGate('', 'and', (self, other))
+
+    def __or__(self, other):
+        return BooleanGate('', 'or', (self, other))
+
+    def __invert__(self):
+        return BooleanGate('', 'not', (self,))
+
+
+    def evaluate(self, values, masks=None):
+        """Evaluate gate for all events.
+
+        Args:
+            values: mapping of channel name -> np.array (dict or DataFrame)
+            masks: optional GateMasks instance used to retrieve cached masks
+                for any operand gates.
+
+        Returns:
+            np.array of bool with length equal to number of events
+        """
+
+        raise NotImplementedError
+
+
+# ------------------------------------------------------------------------------
+class RectangleGate(Gate):
+    """Range gate for any number of channels. A bound of None is open ended."""
+
+    def __init__(self, gate_id, bounds):
+        """Initialize RectangleGate.
+
+        Args:
+            gate_id: str name of gate
+            bounds: dict mapping channel name -> (min, max) or iterable of
+                (channel name, min, max)
+        """
+
+        if isinstance(bounds, dict):
+            bounds = tuple((ch, lo, hi) for ch, (lo, hi) in bounds.items())
+        else:
+            bounds = tuple(tuple(bound) for bound in bounds)
+
+        if not bounds:
+            raise ValueError('Gate <{}> requires at least one dimension.'.format(gate_id))
+
+        for channel, lo, hi in bounds:
+            if lo is None and hi is None:
+                raise ValueError('Gate dimension <{}> requires min or max value.'.format(channel))
+
+        super().__init__(gate_id, (bound[0] for bound in bounds))
+        self.bounds = bounds
+
+
+    def evaluate(self, values, masks=None):
+        n_events = _event_count(values, self.dimensions)
+        mask = np.ones(n_events, dtype=bool)
+        tmp = np.empty(n_events, dtype=bool)
+
+        for channel, lo, hi in self.bounds:
+            ch_data = channel_values(values, channel)
+            if lo is not None:
+                np.greater_equal(ch_data, lo, out=tmp)
+                mask &= tmp
+            if hi is not None:
+                np.less(ch_data, hi, out=tmp)
+                mask &= tmp
+
+        return mask
+
+
+class QuadrantGate(RectangleGate):
+    """One quadrant of a 2 channel split. Quadrant ids refer to x, y position
+    relative to split point: '++', '+-', '-+', '--'
+    e.g. '+-' selects events with x >= x_split and y < y_split
+    """
+
+    quadrant_ids = ('++', '+-', '-+', '--')
+
+    def __init__(self, gate_id, x, y, x_split, y_split, quadrant):
+        if quadrant not in self.quadrant_ids:
+            raise ValueError('Quadrant must be one of: {}'.format(self.quadrant_ids))
+
+        x_pos, y_pos = (pos == '+' for pos in quadrant)
+        x_bound = (x, x_split, None) if x_pos else (x, None, x_split)
+        y_bound = (y, y_split, None) if y_pos else (y, None, y_split)
+        super().__init__(gate_id, (x_bound, y_bound))
+        self.split = (x_split, y_split)
+        self.quadrant = quadrant
+
+
+def quadrant_gates(x, y, x_split, y_split, prefix='Q'):
+    """Creates all 4 QuadrantGate instances for a 2 channel split.
+
+    Returns:
+        dict mapping quadrant id -> QuadrantGate
+    """
+
+    return {
+        quad: QuadrantGate('{}{}'.format(prefix, quad), x, y, x_split, y_split, quad)
+        for quad in QuadrantGate.quadrant_ids}
+
+
+# ------------------------------------------------------------------------------
+class PolygonGate(Gate):
+    """Closed polygon for 2 channels. Vertices are connected in order and the
+    last vertex is connected to the first.
+    """
+
+    def __init__(self, gate_id, x, y, vertices):
+        """Initialize PolygonGate.
+
+        Args:
+            gate_id: str name of gate
+            x, y: channel names
+            vertices: iterable of (x, y) coordinates, minimum of 3
+        """
+
+        super().__init__(gate_id, (x, y))
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        if self.vertices.shape[0] < 3:
+            raise ValueError('PolygonGate requires at least 3 vertices.')
+
+
+    def evaluate(self, values, masks=None):
+        """Crossing number test. Events outside the polygon bounding box are
+        excluded first and the edge tests run only on remaining candidates.
+        """
+
+        x_data, y_data = (channel_values(values, ch) for ch in self.dimensions)
+        vx, vy = self.vertices[:, 0], self.vertices[:, 1]
+
+        in_box = (x_data >= vx.min()) & (x_data <= vx.max())
+        in_box &= (y_data >= vy.min()) & (y_data <= vy.max())
+        candidates = np.flatnonzero(in_box)
+        px = x_data[candidates].astype(np.float64)
+        py = y_data[candidates].astype(np.float64)
+
+        inside = np.zeros(candidates.size, dtype=bool)
+        spans_y = np.empty_like(inside)
+        left_of = np.empty_like(inside)
+        x_cross = np.empty_like(px)
+        edges = zip(vx, vy, np.roll(vx, -1), np.roll(vy, -1))
+
+        for x1, y1, x2, y2 in edges:
+            if y1 == y2:
+                continue
+            np.not_equal(y1 > py, y2 > py, out=spans_y)
+            np.subtract(py, y1, out=x_cross)
+            x_cross *= (x2 - x1) / (y2 - y1)
+            x_cross += x1
+            np.less(px, x_cross, out=left_of)
+            left_of &= spans_y
+            inside ^= left_of
+
+        in_box[candidates] = inside
+        return in_box
+
+
+class EllipseGate(Gate):
+    """Ellipsoid gate for 2 or more channels.
+    Events are inside if (x - mean)' * inv(covariance) * (x - mean) <= distance_square
+    """
+
+    def __init__(self, gate_id, dimensions, mean, covariance, distance_square):
+        """Initialize EllipseGate.
+
+        Args:
+            gate_id: str name of gate
+            dimensions: iterable of channel names
+            mean: center coordinate for each dimension
+            covariance: square covariance matrix
+            distance_square: squared Mahalanobis distance of gate boundary
+        """
+
+        super().__init__(gate_id, dimensions)
+        n_dim = len(self.dimensions)
+        self.mean = np.asarray(mean, dtype=np.float64).reshape(n_dim)
+        self.covariance = np.asarray(covariance, dtype=np.float64).reshape(n_dim, n_dim)
+        self.distance_square = float(distance_square)
+        self._inv_covariance = np.linalg.inv(self.covariance)
+
+
+    def evaluate(self, values, masks=None):
+        deltas = [
+            channel_values(values, ch).astype(np.float64) - center
+            for ch, center in zip(self.dimensions, self.mean)]
+
+        n_dim = len(deltas)
+        inv_cov = self._inv_covariance
+        dist = np.zeros(deltas[0].shape[0], dtype=np.float64)
+        tmp = np.empty_like(dist)
+
+        for j in range(n_dim):
+            for k in range(j, n_dim):
+                factor = inv_cov[j, k] if j == k else inv_cov[j, k] + inv_cov[k, j]
+                if factor:
+                    np.multiply(deltas[j], deltas[k], out=tmp)
+                    tmp *= factor
+                    dist += tmp
+
+        return dist <= self.distance_square
+
+
+# ------------------------------------------------------------------------------
+class BooleanGate(Gate):
+    """Combines other gates with and / or / not."""
+
+    operators = ('and', 'or', 'not')
+
+    def __init__(self, gate_id, operator, gates):
+        """Initialize BooleanGate.
+
+        Args:
+            gate_id: str name of gate
+            operator: 'and', 'or', 'not'
+            gates: iterable of Gate instances - 'not' requires exactly 1
+        """
+
+        operator = operator.lower()
+        gates = tuple(gates)
+        if operator not in self.operators:
+            raise ValueError('BooleanGate operator must be one of: {}'.format(self.operators))
+        if operator == 'not' and len(gates) != 1:
+            raise ValueError("BooleanGate 'not' requires exactly 1 gate.")
+        if not gates:
+            raise ValueError('BooleanGate requires at least 1 gate.')
+
+        dimensions = []
+        for gate in gates:
+            dimensions.extend(ch for ch in gate.dimensions if ch not in dimensions)
+
+        super().__init__(gate_id, dimensions)
+        self.operator = operator
+        self.gates = gates
+
+
+    def evaluate(self, values, masks=None):
+        if masks is not None:
+            get_mask = masks.mask
+        else:
+            get_mask = lambda gate: gate.evaluate(values)
+
+        if self.operator == 'not':
+            return ~get_mask(self.gates[0])
+
+        combine = np.logical_and if self.operator == 'and' else np.logical_or
+        mask = get_mask(self.gates[0]).copy()
+        for gate in self.gates[1:]:
+            combine(mask, get_mask(gate), out=mask)
+        return mask
+
+
+# ------------------------------------------------------------------------------
+class GateMasks(object):
+    """Mask cache for a single data set. Each gate is evaluated once.
+
+    Attributes:
+        values: dict mapping channel name -> np.array
+        n_events: number of events in data set
+    """
+
+    def __init__(self, data):
+        """Initialize GateMasks.
+
+        Arg:
+            data: DataFrame or mapping of channel name -> array like
+        """
+
+        if hasattr(data, 'columns'):
+            self.values = {name: data[name].to_numpy() for name in data.columns}
+        else:
+            self.values = {name: np.asarray(ch_data) for name, ch_data in data.items()}
+
+        lengths = set(ch_data.shape[0] for ch_data in self.values.values())
+        self.n_events = lengths.pop() if len(lengths) == 1 else 0
+        self._masks = {}
+
+
+    def __contains__(self, gate):
+        return gate in self._masks
+
+
+    def mask(self, gate):
+        """Return cached, read only boolean mask for gate."""
+
+        gate_mask = self._masks.get(gate)
+        if gate_mask is None:
+            gate_mask = gate.evaluate(self.values, self)
+            gate_mask.flags.writeable = False
+            self._masks[gate] = gate_mask
+        return gate_mask
+
+
+    def count(self, gate):
+        """Number of events inside gate."""
+        return int(np.count_nonzero(self.mask(gate)))
+
+
+    def select(self, gate, channel=None):
+        """Return gated values for one channel or dict of all channels."""
+
+        gate_mask = self.mask(gate)
+        if channel:
+            return channel_values(self.values, channel)[gate_mask]
+        return {name: ch_data[gate_mask] for name, ch_data in self.values.items()}
+
+
+    def clear(self):
+        self._masks.clear()
+
+
+# ------------------------------------------------------------------------------
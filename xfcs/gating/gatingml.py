@@ -0,0 +1,210 @@
+"""
+Gating-ML 2.0 reader.
+    http://flowcyt.sourceforge.net/gating/latest.pdf
+
+Supported gate elements:
+    RectangleGate, PolygonGate, EllipsoidGate, QuadrantGate, BooleanGate
+
+Dimension compensation-ref values:
+    uncompensated: channel values
+    FCS: values compensated with the $SPILLOVER matrix stored in each fcs file
+
+Not supported (raises NotImplementedError):
+    transformation-ref, custom spectrumMatrix compensation, new-dimension ratios
+
+Each Quadrant within a QuadrantGate becomes its own RectangleGate using the
+Quadrant id and the QuadrantGate parent.
+"""
+
+import xml.etree.ElementTree as ET
+
+from xfcs.gating.gates import BooleanGate, EllipseGate, PolygonGate, RectangleGate
+from xfcs.gating.strategy import COMP_PREFIX, GatingStrategy
+# ------------------------------------------------------------------------------
+NS = {
+    'gating': 'http://www.isac-net.org/std/Gating-ML/v2.0/gating',
+    'data-type': 'http://www.isac-net.org/std/Gating-ML/v2.0/datatypes',
+    'transforms': 'http://www.isac-net.org/std/Gating-ML/v2.0/transformations'}
+
+
+def _attr(element, prefix, name, default=None):
+    """Retrieve namespaced attribute value."""
+    return element.get('{{{}}}{}'.format(NS[prefix], name), default)
+
+
+def _float_attr(element, prefix, name):
+    value = _attr(element, prefix, name)
+    return float(value) if value is not None else None
+
+
+def _values(elements):
+    return [float(_attr(element, 'data-type', 'value')) for element in elements]
+
+
+# ------------------------------------------------------------------------------
+def parse_dimension(dimension):
+    """Convert gating:dimension or gating:divider element to channel name.
+
+    Returns:
+        channel name, prefixed with COMP_PREFIX if FCS compensation is used
+
+    Raises:
+        NotImplementedError: for unsupported transforms or compensation
+    """
+
+    transform_ref = _attr(dimension, 'gating', 'transformation-ref')
+    if transform_ref:
+        raise NotImplementedError('Gating-ML transformations are not supported: {}'.format(transform_ref))
+
+    fcs_dim = dimension.find('data-type:fcs-dimension', NS)
+    if fcs_dim is None:
+        raise NotImplementedError('Gating-ML dimension type is not supported.')
+
+    channel = _attr(fcs_dim, 'data-type', 'name')
+    comp_ref = _attr(dimension, 'gating', 'compensation-ref', 'uncompensated')
+    if comp_ref == 'FCS':
+        channel = COMP_PREFIX + channel
+    elif comp_ref != 'uncompensated':
+        raise NotImplementedError('Gating-ML compensation is not supported: {}'.format(comp_ref))
+
+    return channel
+
+
+def parse_rectangle(element, gate_id):
+    bounds = []
+    for dimension in element.findall('gating:dimension', NS):
+        lo = _float_attr(dimension, 'gating', 'min')
+        hi = _float_attr(dimension, 'gating', 'max')
+        bounds.append((parse_dimension(dimension), lo, hi))
+    return [RectangleGate(gate_id, bounds)]
+
+
+def parse_polygon(element, gate_id):
+    x, y = (parse_dimension(dim) for dim in element.findall('gating:dimension', NS))
+    vertices = [
+        _values(vertex.findall('gating:coordinate', NS))
+        for vertex in element.findall('gating:vertex', NS)]
+    return [PolygonGate(gate_id, x, y, vertices)]
+
+
+def parse_ellipsoid(element, gate_id):
+    dimensions = [parse_dimension(dim) for dim in element.findall('gating:dimension', NS)]
+    mean = _values(element.findall('gating:mean/gating:coordinate', NS))
+    covariance = [
+        _values(row.findall('gating:entry', NS))
+        for row in element.findall('gating:covarianceMatrix/gating:row', NS)]
+    distance_square = _float_attr(element.find('gating:distanceSquare', NS), 'data-type', 'value')
+    return [EllipseGate(gate_id, dimensions, mean, covariance, distance_square)]
+
+
+def parse_quadrant(element, gate_id):
+    """Each Quadrant is converted to a RectangleGate. A position location is any
+    value within the quadrant and selects the divider range containing it.
+    Raises ValueError if no position of a Quadrant resolves to a bound.
+    """
+
+    dividers = {}
+    for divider in element.findall('gating:divider', NS):
+        split_vals = sorted(float(val.text) for val in divider.findall('gating:value', NS))
+        dividers[_attr(divider, 'gating', 'id')] = (parse_dimension(divider), split_vals)
+
+    gates = []
+    for quadrant in element.findall('gating:Quadrant', NS):
+        bounds = []
+        for position in quadrant.findall('gating:position', NS):
+            channel, split_vals = dividers[_attr(position, 'gating', 'divider_ref')]
+            location = float(_attr(position, 'gating', 'location'))
+            lo = max((val for val in split_vals if val <= location), default=None)
+            hi = min((val for val in split_vals if val > location), default=None)
+            if lo is not None or hi is not None:
+                bounds.append((channel, lo, hi))
+
+        quadrant_id = _attr(quadrant, 'gating', 'id')
+        if not bounds:
+            raise ValueError(
+                'Quadrant <{}> has no position bounded by a divider value.'.format(quadrant_id))
+        gates.append(RectangleGate(quadrant_id, bounds))
+
+    return gates
+
+
+GATE_PARSERS = {
+    'RectangleGate': parse_rectangle,
+    'PolygonGate': parse_polygon,
+    'EllipsoidGate': parse_ellipsoid,
+    'QuadrantGate': parse_quadrant}
+
+
+# ------------------------------------------------------------------------------
+def boolean_references(element):
+    """Locate BooleanGate operator and its referenced gate ids.
+
+    Returns:
+        operator, list of (gate id, use as complement)
+    """
+
+    for operator in BooleanGate.operators:
+        op_element = element.find('gating:{}'.format(operator), NS)
+        if op_element is not None:
+            break
+    else:
+        raise ValueError('BooleanGate <{}> has no operator.'.format(_attr(element, 'gating', 'id')))
+
+    gate_refs = [
+        (_attr(gate_ref, 'gating', 'ref'),
+         _attr(gate_ref, 'gating', 'use-as-complement', 'false') == 'true')
+        for gate_ref in op_element.findall('gating:gateReference', NS)]
+
+    return operator, gate_refs
+
+
+class BooleanGateBuilder(object):
+    """Creates BooleanGate once referenced populations are resolved.
+    Operands reference populations (gate including parents).
+    """
+
+    def __init__(self, gate_id, operator, gate_refs):
+        self.gate_id = gate_id
+        self.operator = operator
+        self.gate_refs = gate_refs
+
+    def __call__(self, populations):
+        operands = []
+        for ref_id, complement in self.gate_refs:
+            population = populations[ref_id]
+            operands.append(~population if complement else population)
+        return BooleanGate(self.gate_id, self.operator, operands)
+
+
+def read_gatingml(gatingml_file):
+    """Read Gating-ML 2.0 file and build GatingStrategy.
+
+    Arg:
+        gatingml_file: filepath or file object
+
+    Returns:
+        GatingStrategy instance with all populations resolved
+    """
+
+    root = ET.parse(gatingml_file).getroot()
+    strategy = GatingStrategy()
+
+    for element in root:
+        tag = element.tag.rsplit('}', 1)[-1]
+        gate_id = _attr(element, 'gating', 'id')
+        parent_id = _attr(element, 'gating', 'parent_id')
+
+        if tag in GATE_PARSERS:
+            for gate in GATE_PARSERS[tag](element, gate_id):
+                strategy.add_gate(gate, parent_id)
+        elif tag == 'BooleanGate':
+            operator, gate_refs = boolean_references(element)
+            make_gate = BooleanGateBuilder(gate_id, operator, gate_refs)
+            requires = [ref_id for ref_id, _ in gate_refs]
+            strategy.add_deferred_gate(gate_id, make_gate, requires, parent_id)
+
+    strategy.build()
+    return strategy
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,242 @@
+"""
+Hierarchical gating strategy.
+
+A GatingStrategy is a tree of gates where each population is the intersection
+of its own gate with its parent population. Populations are converted once into
+gates (parent & gate) so a GateMasks cache reuses every parent mask when
+evaluating children and any BooleanGate referencing other populations.
+
+Compensated dimensions are referenced by prefixing the channel name with
+COMP_PREFIX e.g. Comp-FL1-A.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xfcs.gating.gates import BooleanGate, GateMasks
+# ------------------------------------------------------------------------------
+COMP_PREFIX = 'Comp-'
+REF_CHANNELS = ('TIME', 'Event Count')
+
+
+# ------------------------------------------------------------------------------
+class GatingStrategy(object):
+    """Instantiates a GatingStrategy.
+
+    Public Attributes:
+        gates: OrderedDict mapping gate id -> Gate
+        parents: dict mapping gate id -> parent gate id or None
+        populations: OrderedDict mapping gate id -> population Gate (gate & parent)
+        compensated: bool - True if any gate dimension uses compensated values
+    """
+
+    def __init__(self):
+        self.gates = OrderedDict()
+        self.parents = {}
+        self.populations = OrderedDict()
+        self.__deferred = {}
+        self.__built = False
+
+
+    def __len__(self):
+        return len(self.gates)
+
+
+    def add_gate(self, gate, parent_id=None):
+        """Add gate to strategy. Parent gates may be added in any order."""
+
+        self.__add_id(gate.gate_id, parent_id)
+        self.gates[gate.gate_id] = gate
+
+
+    def add_deferred_gate(self, gate_id, make_gate, requires, parent_id=None):
+        """Add a gate which depends on other populations e.g. BooleanGate operands.
+
+        Args:
+            gate_id: str name of gate
+            make_gate: callable accepting populations dict and returning Gate
+            requires: iterable of population ids required by make_gate
+            parent_id: optional parent gate id
+        """
+
+        self.__add_id(gate_id, parent_id)
+        self.gates[gate_id] = None
+        self.__deferred[gate_id] = (make_gate, tuple(requires))
+
+
+    def __add_id(self, gate_id, parent_id):
+        if gate_id in self.gates:
+            raise ValueError('Duplicate gate id: {}'.format(gate_id))
+
+        self.parents[gate_id] = parent_id
+        self.__built = False
+
+
+    @property
+    def compensated(self):
+        return any(
+            ch.startswith(COMP_PREFIX)
+            for gate in self.gates.values() if gate
+            for ch in gate.dimensions)
+
+
+    def depth(self, gate_id):
+        """Number of ancestors for gate."""
+
+        n_parents = 0
+        parent_id = self.parents.get(gate_id)
+        while parent_id:
+            n_parents += 1
+            parent_id = self.parents.get(parent_id)
+        return n_parents
+
+
+    def build(self):
+        """Resolves population gates in hierarchical order (parents first).
+
+        Raises:
+            ValueError: if a parent id is missing or the gate tree has a cycle
+                or unresolved references
+        """
+
+        if self.__built:
+            return self.populations
+
+        populations = OrderedDict()
+        pending = list(self.gates)
+
+        while pending:
+            resolved = []
+            for gate_id in pending:
+                parent_id = self.parents[gate_id]
+                if parent_id and parent_id not in self.gates:
+                    raise ValueError('Gate <{}> parent <{}> not located.'.format(gate_id, parent_id))
+
+                if parent_id and parent_id not in populations:
+                    continue
+
+                if gate_id in self.__deferred:
+                    make_gate, requires = self.__deferred[gate_id]
+                    if not all(req_id in populations for req_id in requires):
+                        continue
+                    self.gates[gate_id] = make_gate(populations)
+                    del self.__deferred[gate_id]
+
+                if parent_id:
+                    operands = (populations[parent_id], self.gates[gate_id])
+                    populations[gate_id] = BooleanGate(gate_id, 'and', operands)
+                else:
+                    populations[gate_id] = self.gates[gate_id]
+                resolved.append(gate_id)
+
+            if not resolved:
+                raise ValueError('Unable to resolve gate hierarchy for: {}'.format(pending))
+            pending = [gate_id for gate_id in pending if gate_id not in resolved]
+
+        self.populations = populations
+        self.__built = True
+        return populations
+
+
+    # --------------------------------------------------------------------------
+    def gate_values(self, data_section, data_set='channel_scale'):
+        """Collect channel values required for gating from a loaded DataSection.
+
+        Args:
+            data_section: DataSection instance
+            data_set: data set used for uncompensated dimensions
+
+        Returns:
+            dict mapping channel name -> np.array
+        """
+
+        _, data = getattr(data_section, data_set)
+        if data is None:
+            return {}
+
+        values = {name: data[name].to_numpy() for name in data.columns}
+        if not self.compensated:
+            return values
+
+        comp_values = {COMP_PREFIX + name: ch_data for name, ch_data in values.items()}
+        if data_section.spec.spillover:
+            for comp_set in ('compensated', 'scale_compensated'):
+                _, comp_data = getattr(data_section, comp_set)
+                if comp_data is not None:
+                    comp_values.update({
+                        COMP_PREFIX + name: comp_data[name].to_numpy()
+                        for name in comp_data.columns
+                        if name not in REF_CHANNELS})
+
+        values.update(comp_values)
+        return values
+
+
+    def evaluate(self, values):
+        """Evaluate all populations.
+
+        Arg:
+            values: dict mapping channel name -> np.array
+
+        Returns:
+            GateMasks instance containing all population masks
+        """
+
+        masks = GateMasks(values)
+        for population in self.build().values():
+            masks.mask(population)
+        return masks
+
+
+    def population_stats(self, values, stat_channels=None):
+        """Calculates count, percent parent, percent total and channel medians
+        for each population.
+
+        Args:
+            values: dict mapping channel name -> np.array
+            stat_channels: channel names for median values, defaults to all
+                non reference channels
+
+        Returns:
+            list of OrderedDict, one per population in hierarchical order
+        """
+
+        masks = self.evaluate(values)
+        total = masks.n_events
+
+        if stat_channels is None:
+            stat_channels = [
+                name for name in values
+                if name not in REF_CHANNELS and not name.startswith(COMP_PREFIX)]
+
+        rows = []
+        for gate_id, population in self.populations.items():
+            parent_id = self.parents[gate_id]
+            pop_mask = masks.mask(population)
+            n_events = int(np.count_nonzero(pop_mask))
+
+            if parent_id:
+                n_parent = masks.count(self.populations[parent_id])
+            else:
+                n_parent = total
+
+            row = OrderedDict((
+                ('POPULATION', gate_id),
+                ('PARENT', parent_id or ''),
+                ('DEPTH', self.depth(gate_id)),
+                ('COUNT', n_events),
+                ('PCT_PARENT', round(100 * n_events / n_parent, 4) if n_parent else 0),
+                ('PCT_TOTAL', round(100 * n_events / total, 4) if total else 0)))
+
+            for channel in stat_channels:
+                ch_data = values[channel][pop_mask]
+                median = round(float(np.median(ch_data)), 4) if n_events else ''
+                row['MEDIAN_{}'.format(channel)] = median
+
+            rows.append(row)
+
+        return rows
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+import os
+import sys
+import time
+
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.FCSFile.edit import concat_fcs
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+def group_by_layout(fcs_paths):
+    """Groups fcs files sharing the same channel layout (hashkey), in order.
+
+    Returns:
+        list of lists of loaded FCSFile instances
+    """
+
+    groups = OrderedDict()
+    for path in fcs_paths:
+        fcs = FCSFile()
+        fcs.load(path)
+        groups.setdefault(fcs.hashkey, []).append(fcs)
+    return list(groups.values())
+
+
+def batch_concat(fcs_paths, output=None, suffix='concat'):
+    """Concatenates every group of fcs files sharing a channel layout.
+
+    Args:
+        fcs_paths: iterable of fcs filepaths in output order
+        output: optional output filepath, requires all files to share a layout
+        suffix: appended to first filename of each group if output is not set
+
+    Returns:
+        list of generated fcs filepaths
+    """
+
+    groups = group_by_layout(fcs_paths)
+    if output and len(groups) > 1:
+        print('>>> Input files do not share one channel layout, groups:', len(groups))
+        return []
+
+    concat_paths = []
+    for fcs_files in groups:
+        if len(fcs_files) < 2:
+            print('>>> No matching channel layout for:', fcs_files[0].name)
+            continue
+
+        concat_path = output or fcs_files[0].filepath.rsplit('.', 1)[0] + '_{}.fcs'.format(suffix)
+        n_events = concat_fcs(fcs_files, concat_path)
+        concat_paths.append(concat_path)
+        print('>>> {} files, events written to {}: {}'.format(len(fcs_files), concat_path, n_events))
+
+    return concat_paths
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    suffix = '_{}.fcs'.format(args.suffix)
+    fcs_paths = [path for path in fcs_paths if not path.endswith(suffix)]
+    if args.output:
+        out_path = os.path.abspath(args.output)
+        fcs_paths = [path for path in fcs_paths if os.path.abspath(path) != out_path]
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    start = time.perf_counter()
+    batch_concat(fcs_paths, args.output, args.suffix)
+
+    end = time.perf_counter() - start
+    n_files = len(fcs_paths)
+    txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
@@ -1,91 +1,406 @@
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from functools import partial
 import os
 import sys
 import time
 
+from xfcs.FCSFile.DataStream import CHUNK_EVENTS
 from xfcs.FCSFile.FCSFile import FCSFile
-from xfcs.get_metadata import write_obj_metadata
-from xfcs.utils.locator import locate_fcs_files
+from xfcs.get_metadata import query_paths, write_obj_metadata
+from xfcs.utils.data_csv import CSVDataWriter
+from xfcs.utils.data_hdf5 import HDFStoreWriter
+from xfcs.utils.data_npy import NpyDataWriter
+from xfcs.utils.data_parquet import PARQUET, ParquetDataWriter
+from xfcs.utils.data_parquet import STATUS as PARQUET_STATUS
+from xfcs.utils.data_stdout import ARROW, StdoutDataWriter
+from xfcs.utils.data_stdout import STATUS as ARROW_STATUS
+from xfcs.utils.locator import locate_fcs_files, search_options
+from xfcs.utils.manifest import ExportManifest
 from xfcs.version import VERSION
 # ------------------------------------------------------------------------------
-def store_hdf5_data(data_set, data_desc, filepath):
+DATA_SET_OPTIONS = ('raw', 'channel', 'scale', 'xcxs', 'fl_comp', 'scale_fl_comp')
+DATA_SET_ATTRS = ('raw', 'channel', 'scale', 'channel_scale', 'compensated', 'scale_compensated')
+
+MANIFEST_OPTIONS = DATA_SET_OPTIONS + (
+    'metadata', 'norm_count', 'norm_time', 'hdf5', 'parquet', 'npy', 'hdf5_store', 'complib',
+    'complevel', 'compression', 'row_group_size', 'float_format', 'sig_digits', 'gzip',
+    'sample', 'seed', 'stratified')
+
+ExportResult = namedtuple(
+    'ExportResult', ('filepath', 'messages', 'written', 'outputs', 'n_events', 'worker',
+                     'elapsed', 'error'))
+
+
+def selected_data_sets(data_choices):
+    """Pairs each user enabled data set option with its DataSection attribute.
+
+    Returns:
+        list of (user option, data attr)
+    """
+
+    user_select = []
+    for user_option, data_attr in zip(DATA_SET_OPTIONS, DATA_SET_ATTRS):
+        if getattr(data_choices, user_option):
+            user_select.append((user_option, data_attr))
+    return user_select
+
+
+def data_set_path(filepath, data_desc, ext):
+    return filepath.rsplit('.', 1)[0] + '_{}.{}'.format(data_desc, ext)
+
+
+def stream_data_sets(data_sections, user_select, open_writer):
+    """Writes each selected data set chunk by chunk.
+
+    Args:
+        data_sections: iterable of DataSection instances e.g. DataStream chunks
+        user_select: list of (user option, data attr) from selected_data_sets
+        open_writer: func(user option, parameter names) returning a writer with
+            write_chunk(DataFrame) and close() methods
+
+    Returns:
+        written: list of user options written
+        unavailable: list of user options unavailable in file
+    """
+
+    writers = {}
+    unavailable = []
+    try:
+        for data in data_sections:
+            for user_option, data_attr in user_select:
+                if user_option in unavailable:
+                    continue
+
+                par_names, data_chunk = getattr(data, data_attr)
+                if not par_names:
+                    unavailable.append(user_option)
+                    continue
+
+                if user_option not in writers:
+                    writers[user_option] = open_writer(user_option, par_names)
+                writers[user_option].write_chunk(data_chunk)
+
+            if len(unavailable) == len(user_select):
+                break
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    written = [user_option for user_option, _ in user_select if user_option in writers]
+    return written, unavailable
+
+
+def store_hdf5_data(data_set, data_desc, filepath, complib='zlib', complevel=9):
     # >>> fix names
     data_name = os.path.basename(filepath.rsplit('.', 1)[0]).replace(' ', '_')
     data_path = filepath.rsplit('.', 1)[0] + '_{}.h5'.format(data_desc)
-    data_set.to_hdf(data_path, data_name, mode='w', complib='zlib', complevel=9)
+    data_set.to_hdf(data_path, data_name, mode='w', complib=complib, complevel=complevel)
+    return data_path
 
 
 def store_csv_data(data_set, data_desc, filepath):
     data_path = filepath.rsplit('.', 1)[0] + '_{}.csv'.format(data_desc)
     data_set.to_csv(data_path, index=False)
+    return data_path
 
 
-def batch_export_data(fcs_paths, data_choices, metadata, norm_count, norm_time, hdf):
+def csv_writer(fcs, data_desc, par_names, **options):
+    """Opens CSVDataWriter for one data set of an fcs file."""
+    return CSVDataWriter(data_set_path(fcs.filepath, data_desc, 'csv'), **options)
 
-    if hdf:
-        store_data = store_hdf5_data
-    else:
-        store_data = store_csv_data
 
-    get_options = ('raw', 'channel', 'scale', 'xcxs', 'fl_comp', 'scale_fl_comp')
-    data_attrs = ('raw', 'channel', 'scale', 'channel_scale', 'compensated', 'scale_compensated')
+def npy_writer(fcs, data_desc, par_names, sample=0):
+    """Opens NpyDataWriter for one data set of an fcs file. Array length is
+    $TOT or the number of sampled events.
+    """
 
-    user_select = []
+    n_events = min(sample, fcs.spec.tot) if sample else fcs.spec.tot
+    return NpyDataWriter(
+        data_set_path(fcs.filepath, data_desc, 'npy'), n_events, fcs.text, fcs.spec, fcs.filepath)
 
-    for user_option, data_attr in zip(get_options, data_attrs):
-        if getattr(data_choices, user_option):
-            user_select.append((user_option, data_attr))
 
-    for path in fcs_paths:
-        fcs = FCSFile()
+def parquet_writer(fcs, data_desc, par_names, **options):
+    """Opens ParquetDataWriter for one data set of an fcs file."""
+    return ParquetDataWriter(data_set_path(fcs.filepath, data_desc, 'parquet'), fcs.text, **options)
+
+
+def export_fcs_data(path, user_select, metadata, norm_count, norm_time, store_data,
+                    sample=0, seed=None, sample_method='uniform', open_writer=None,
+                    chunk_size=CHUNK_EVENTS, quiet=False):
+    """Exports selected data sets for one fcs file. Progress messages are
+    returned instead of printed so results from worker processes can be
+    reported in input order.
+
+    Returns:
+        ExportResult
+    """
+
+    start = time.perf_counter()
+    messages, outputs, write_count, n_events = [], [], 0, 0
+
+    def open_file_writer(fcs, data_desc, par_names):
+        writer = open_writer(fcs, data_desc, par_names)
+        if getattr(writer, 'filepath', None):
+            outputs.append(writer.filepath)
+        return writer
+
+    try:
+        fcs = FCSFile(quiet)
         fcs.load(path)
-        fcs.load_data(norm_count, norm_time)
-        write_count = 0
-
-        for user_option, data_attr in user_select:
-            data_pkg = getattr(fcs.data, data_attr)
-            data_names, data_set = data_pkg
-            if data_pkg and data_names:
-                store_data(data_set, user_option, path)
-                write_count += 1
+        n_events = int(fcs.numeric_param('$TOT'))
+        stored = getattr(open_writer, 'exists', None)
+
+        if open_writer is not None:
+            file_select = user_select
+            if stored:
+                file_select = [(opt, attr) for opt, attr in user_select if not stored(fcs, opt)]
+                if not file_select:
+                    messages.append('>>> Data sets previously stored for: {}'.format(fcs.name))
+                    return ExportResult(
+                        path, messages, 0, outputs, 0, os.getpid(), time.perf_counter() - start, '')
+
+            if sample:
+                fcs.load_data(norm_count, norm_time, sample, seed, sample_method)
+                data_sections = [fcs.data]
             else:
-                print('>>> fcs data set <{}> is unavailable.'.format(user_option))
+                stream = fcs.stream_data(norm_count, norm_time, chunk_size)
+                data_sections = (data for _, data in stream.data_sections())
+
+            written, unavailable = stream_data_sets(
+                data_sections, file_select,
+                lambda data_desc, par_names: open_file_writer(fcs, data_desc, par_names))
+            for user_option in unavailable:
+                messages.append('>>> fcs data set <{}> is unavailable.'.format(user_option))
+            write_count = len(written)
 
-        print('>>> Data sets extracted to file:', write_count)
+        else:
+            fcs.load_data(norm_count, norm_time, sample, seed, sample_method)
+
+            for user_option, data_attr in user_select:
+                data_pkg = getattr(fcs.data, data_attr)
+                data_names, data_set = data_pkg
+                if data_pkg and data_names:
+                    outputs.append(store_data(data_set, user_option, path))
+                    write_count += 1
+                else:
+                    messages.append('>>> fcs data set <{}> is unavailable.'.format(user_option))
+
+        messages.append('>>> Data sets extracted to file: {}'.format(write_count))
 
         if metadata:
-            write_obj_metadata(fcs)
-            print('>>> Metadata generated for:', fcs.name)
+            outputs.append(write_obj_metadata(fcs))
+            messages.append('>>> Metadata generated for: {}'.format(fcs.name))
+
+        fcs.close()
+
+    except Exception as err:
+        error = '{}: {}'.format(err.__class__.__name__, err)
+        return ExportResult(
+            path, messages, write_count, outputs, 0, os.getpid(), time.perf_counter() - start, error)
+
+    return ExportResult(
+        path, messages, write_count, outputs, n_events, os.getpid(), time.perf_counter() - start, '')
+
+
+def batch_export_data(fcs_paths, data_choices, metadata, norm_count, norm_time, hdf,
+                      sample=0, seed=None, sample_method='uniform', open_writer=None,
+                      chunk_size=CHUNK_EVENTS, hdf_options=None, jobs=1, manifest=None):
+    """Exports selected data sets for each fcs file. Files are distributed
+    across a process pool when jobs > 1, results are reported in input order.
+    A failed file is reported and the batch continues.
+
+    With a manifest, files exported by a previous run with the same options
+    and unchanged since are skipped. Each exported file is recorded as soon as
+    it completes, so an interrupted batch resumes with the remaining files.
+
+    Args:
+        fcs_paths: iterable of fcs filepaths
+        data_choices: namedtuple of bool per data set option
+        metadata: bool - generate metadata csv file per fcs file
+        norm_count: bool - force event count to start at 1.
+        norm_time: bool - force time to start at 0.
+        hdf: bool - use HDF5 instead of csv
+        sample: optional number of randomly selected events per file
+        seed: optional seed for reproducible samples
+        sample_method: uniform or stratified
+        open_writer: optional func(fcs, data_desc, par_names) returning a
+            writer with write_chunk(DataFrame) and close() methods. Enables
+            streaming output, data is read in chunks of chunk_size events.
+            Data sets are skipped if open_writer.exists(fcs, data_desc) is True.
+            Writers sharing one output (shared_output True) run in one process.
+        chunk_size: number of events per chunk for streaming output
+        hdf_options: optional dict with complib, complevel for HDF5 files
+        jobs: number of worker processes
+        manifest: optional ExportManifest instance
+
+    Returns:
+        results: list of ExportResult in input order, without messages
+    """
+
+    if hdf:
+        store_data = partial(store_hdf5_data, **(hdf_options or {}))
+    else:
+        store_data = store_csv_data
+
+    fcs_paths = list(fcs_paths)
+    if manifest is not None:
+        current = [manifest.is_current(path) for path in fcs_paths]
+        if any(current):
+            print('>>> fcs files up to date in manifest:', sum(current))
+        fcs_paths = [path for path, is_current in zip(fcs_paths, current) if not is_current]
+
+    parallel = jobs > 1 and len(fcs_paths) > 1
+    if parallel and getattr(open_writer, 'shared_output', False):
+        print('>>> Shared output is written by one process, --jobs ignored.')
+        parallel = False
+
+    export_data = partial(
+        export_fcs_data, user_select=selected_data_sets(data_choices), metadata=metadata,
+        norm_count=norm_count, norm_time=norm_time, store_data=store_data, sample=sample,
+        seed=seed, sample_method=sample_method, open_writer=open_writer,
+        chunk_size=chunk_size, quiet=parallel)
+
+    results = []
+    with ExitStack() as stack:
+        if parallel:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs))
+            file_results = executor.map(export_data, fcs_paths)
+        else:
+            file_results = map(export_data, fcs_paths)
+
+        for result in file_results:
+            if parallel:
+                print('--> xfcs.load: {}'.format(os.path.basename(result.filepath)))
+            for message in result.messages:
+                print(message)
+            if result.error:
+                print('>>> Data export failed for {}: {}'.format(result.filepath, result.error))
+            elif manifest is not None:
+                manifest.record(result.filepath, result.outputs)
+            results.append(result._replace(messages=()))
+
+    return results
+
+
+def print_throughput(results, total_sec):
+    """Prints aggregate and per worker process throughput."""
+
+    n_files = len(results)
+    if not n_files:
+        print('\nfcs files: 0, ave/total: 0.000/{:.3f} sec'.format(total_sec))
+        return
+
+    n_events = sum(result.n_events for result in results)
+    n_failed = sum(1 for result in results if result.error)
+
+    txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, total_sec / n_files, total_sec)
+    print(txt)
+    if n_failed:
+        print('failed files: {}'.format(n_failed))
+    print('events: {}, {:.0f} events/sec, {:.2f} files/sec'.format(
+        n_events, n_events / total_sec, n_files / total_sec))
+
+    workers = OrderedDict()
+    for result in results:
+        files_sum, events_sum, busy_sec = workers.get(result.worker, (0, 0, 0.0))
+        workers[result.worker] = (
+            files_sum + 1, events_sum + result.n_events, busy_sec + result.elapsed)
+
+    if len(workers) > 1:
+        for worker, (files_sum, events_sum, busy_sec) in workers.items():
+            print('  worker {}: files: {}, events: {}, busy: {:.3f} sec, {:.0f} events/sec'.format(
+                worker, files_sum, events_sum, busy_sec, events_sum / busy_sec if busy_sec else 0))
 
 # ------------------------------------------------------------------------------
 def main(args):
     if args.input:
         fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
     else:
-        fcs_paths = locate_fcs_files(args.recursive)
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    if fcs_paths and args.where:
+        with redirect_stdout(sys.stderr) if args.stdout else ExitStack():
+            fcs_paths = query_paths(fcs_paths, args.where)
+            print('>>> fcs files matching --where:', len(fcs_paths))
 
     if not fcs_paths:
         print('No fcs files located')
         sys.exit(0)
 
-    set_names = ('raw', 'channel', 'scale', 'xcxs', 'fl_comp', 'scale_fl_comp')
-    set_choices = tuple(getattr(args, name) for name in set_names)
-    get_data = namedtuple('GetData', set_names)
+    set_choices = tuple(getattr(args, name) for name in DATA_SET_OPTIONS)
+    get_data = namedtuple('GetData', DATA_SET_OPTIONS)
 
     start = time.perf_counter()
 
     data_choices = get_data(*set_choices)
     output_options = ('metadata', 'norm_count', 'norm_time', 'hdf5')
     output = (getattr(args, name) for name in output_options)
-    batch_export_data(fcs_paths, data_choices, *output)
+    sample_method = 'stratified' if args.stratified else 'uniform'
+    open_writer, chunk_size = None, CHUNK_EVENTS
+    float_format = args.float_format
+    if args.sig_digits:
+        float_format = '%.{}g'.format(args.sig_digits)
+    if float_format:
+        try:
+            float_format % 1.0
+        except (TypeError, ValueError):
+            print('>>> Invalid float format:', float_format)
+            sys.exit(1)
 
-    end = time.perf_counter() - start
-    n_files = len(fcs_paths)
-    x_ave = end / n_files
-    txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, x_ave, end)
-    print(txt)
-    print()
+    if not (args.hdf5 or args.parquet or args.hdf5_store or args.npy):
+        open_writer = partial(csv_writer, float_format=float_format, compress=args.gzip)
+
+    if args.parquet:
+        if not PARQUET:
+            print('>>>', PARQUET_STATUS)
+            print('>>> Unable to write Parquet files. Install pyarrow.')
+            sys.exit(1)
+        open_writer = partial(
+            parquet_writer, compression=args.compression, row_group_size=args.row_group_size)
+        chunk_size = args.row_group_size
+
+    if args.npy:
+        open_writer = partial(npy_writer, sample=args.sample)
+
+    hdf_options = {'complib': args.complib, 'complevel': args.complevel}
+    if args.hdf5_store:
+        open_writer = HDFStoreWriter(args.hdf5_store, **hdf_options)
+
+    if args.stdout:
+        if len(selected_data_sets(data_choices)) != 1:
+            print('>>> Select exactly one data set for stdout output.', file=sys.stderr)
+            sys.exit(1)
+        if args.format == 'arrow' and not ARROW:
+            print('>>>', ARROW_STATUS, file=sys.stderr)
+            print('>>> Unable to write Arrow stream. Install pyarrow.', file=sys.stderr)
+            sys.exit(1)
+        open_writer = StdoutDataWriter(args.format, float_format)
+
+    manifest = None
+    if args.manifest and not args.stdout:
+        export_options = {name: getattr(args, name) for name in MANIFEST_OPTIONS}
+        manifest = ExportManifest(args.manifest, export_options)
+
+    # stdout carries the data stream, progress is reported on stderr
+    with redirect_stdout(sys.stderr) if args.stdout else ExitStack():
+        try:
+            results = batch_export_data(
+                fcs_paths, data_choices, *output, args.sample, args.seed, sample_method,
+                open_writer, chunk_size, hdf_options, args.jobs, manifest)
+        finally:
+            if args.hdf5_store or args.stdout:
+                open_writer.close()
+            if args.hdf5_store:
+                print('>>> HDF5 store:', args.hdf5_store)
+            if manifest is not None:
+                manifest.close()
+                print('>>> Export manifest:', args.manifest)
+
+        print_throughput(results, time.perf_counter() - start)
+        print()
 
 
 # ------------------------------------------------------------------------------
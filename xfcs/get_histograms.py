@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+
+from xfcs.FCSFile.FCSError import ChannelNotFoundError
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.stats.histogram import save_histograms, stream_histograms
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+def parse_pairs(pair_args):
+    """Convert 'x,y' channel name args to (x, y) tuples."""
+
+    pairs = []
+    for pair in pair_args or ():
+        names = tuple(name.strip() for name in pair.split(','))
+        if len(names) != 2:
+            print('>>> Ignoring malformed channel pair:', pair)
+            continue
+        pairs.append(names)
+    return pairs
+
+
+def batch_export_histograms(fcs_paths, data_set, channels, pairs, bins, norm_count, norm_time):
+    """Computes and exports histograms for each fcs file to .npz file.
+
+    Returns:
+        list of generated .npz filepaths
+    """
+
+    npz_paths = []
+    for path in fcs_paths:
+        fcs = FCSFile()
+        fcs.load(path)
+        stream = fcs.stream_data(norm_count, norm_time)
+        try:
+            histograms = stream_histograms(stream, data_set, channels, pairs, bins)
+        except (ChannelNotFoundError, ValueError) as err:
+            print('>>> {}: {}'.format(fcs.name, err))
+            continue
+        finally:
+            stream.close()
+
+        if not histograms:
+            print('>>> fcs data set <{}> is unavailable.'.format(data_set))
+            continue
+
+        npz_path = path.rsplit('.', 1)[0] + '_{}_hist.npz'.format(data_set)
+        save_histograms(histograms, npz_path)
+        npz_paths.append(npz_path)
+        print('>>> Histograms extracted to file:', len(histograms))
+
+    return npz_paths
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    start = time.perf_counter()
+    pairs = parse_pairs(args.pairs)
+    channels = args.channels if not (pairs and args.channels is None) else []
+    batch_export_histograms(
+        fcs_paths, args.data_set, channels, pairs, args.bins, args.norm_count, args.norm_time)
+
+    end = time.perf_counter() - start
+    n_files = len(fcs_paths)
+    txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
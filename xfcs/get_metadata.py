@@ -1,18 +1,29 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from functools import partial
 from itertools import compress
 import os
+import re
 import sys
 import time
 
 from xfcs.FCSFile.FCSFile import FCSFile, channel_name_keywords
-from xfcs.utils import metadata_csv, metadata_time, metadata_plot
-from xfcs.utils.locator import locate_fcs_files
-from xfcs.utils.metadata_stats import add_param_mean
+from xfcs.utils import metadata_columnar, metadata_csv, metadata_time, metadata_plot
+from xfcs.utils.locator import locate_fcs_files, locate_recent_fcs_files, search_options
+from xfcs.utils.metadata_append import TidyMetadataAppender
+from xfcs.utils.metadata_index import MetadataIndex
+from xfcs.utils.metadata_query import Predicate, predicate, predicate_keywords, select_rows
+from xfcs.utils.metadata_stats import STAT_KEY, add_param_stats, is_stat_key
+from xfcs.utils.metadata_table import MetadataTable
+from xfcs.utils.watch import DirectoryWatcher
 from xfcs.version import VERSION
 
 # ------------------------------------------------------------------------------
 FORCED_SRC_KEYS = ('CSV_CREATED', 'SRC_DIR', 'SRC_FILE')
+LOAD_WINDOW = 1024
+TIME_KEYS = ('$DATE', '$BTIM', '$ETIM')
 
 
 # ------------------------------ KEYWORD PREFS ---------------------------------
@@ -38,6 +49,31 @@ def read_kw_prefs(kw_filter_file):
     return user_meta_keys
 
 
+def keyword_selection(user_meta_keys):
+    """Keywords stored while scanning for a user keyword selection. Includes
+        time keywords used for sorting, $PxN channel names and, for any rolling
+        stat keyword, its source keyword and all $Px channel keywords.
+
+    Arg:
+        user_meta_keys: iterable of selected keywords, empty for $PxN only.
+
+    Returns:
+        func(keyword) -> bool
+    """
+
+    selected = set(user_meta_keys)
+    selected.update(TIME_KEYS)
+    spx_key = re.compile(r'^\$P\d+N$')
+
+    for key in user_meta_keys:
+        stat_match = STAT_KEY.match(key)
+        if stat_match:
+            selected.add(stat_match.group('param'))
+            spx_key = re.compile(r'^\$P\d+[A-Z]+$')
+
+    return lambda key: key in selected or spx_key.match(key) is not None
+
+
 def write_kw_prefs(meta_keys):
     """Write all located fcs Parameter keys to text file
 
@@ -58,39 +94,138 @@ def write_kw_prefs(meta_keys):
 
 
 # ------------------------------------------------------------------------------
-def load_metadata(paths, quiet=False):
+def set_src_params(fcs, csv_created=''):
+    fcs.set_param('CSV_CREATED', csv_created or time.strftime('%m/%d/%y %H:%M:%S'))
+    fcs.set_param('SRC_DIR', fcs.parentdir)
+    fcs.set_param('SRC_FILE', fcs.name)
+
+
+def read_fcs_metadata(filepath, quiet=False, csv_created=''):
+    """Loads header and text section of one fcs file.
+
+    Args:
+        filepath: fcs filepath
+        quiet: bool - disable fcs load notification
+        csv_created: optional CSV_CREATED timestamp, defaults to current time
+
+    Returns:
+        filepath, FCSFile instance or None, error message or empty str
+    """
+
+    try:
+        fcs = FCSFile(quiet)
+        fcs.load(filepath)
+        set_src_params(fcs, csv_created)
+        fcs.close()
+    except Exception as err:
+        return filepath, None, '{}: {}'.format(err.__class__.__name__, err)
+
+    return filepath, fcs, ''
+
+
+def load_metadata(paths, quiet=False, jobs=1, index=None, keep=None):
     """
-        --> makes hashtable -> filepath : fcs file class instance
+        --> makes columnar table -> one row per fcs file
         meta_keys == all_keys w any new keys extended
         replaced -> meta_keys = ['FILEPATH'] with 'SRC_FILE'
 
+        Keyword values of each file are added to a compact MetadataTable and
+        the FCSFile instance is discarded. Files are processed in windows so
+        memory does not depend on the number of files beyond the table.
+
+        HEADER and TEXT segments are read by a thread pool when jobs > 1, the
+        scan is I/O bound (e.g. network storage latency per file). Results
+        and meta_keys are merged in path order and CSV_CREATED is one batch
+        timestamp, output matches a sequential scan byte for byte. Files that
+        fail to load are reported and skipped.
+
+        With a MetadataIndex, unchanged files are served from the index and
+        only new or changed files are opened and added to the index.
+
     Arg:
         paths: iterable of fcs filepaths
+        quiet: bool - disable fcs load notification
+        jobs: number of scan threads
+        index: optional MetadataIndex instance
+        keep: optional func(keyword) -> bool, only selected keywords are
+            stored. Source keys are always stored.
 
     Returns:
-        fcs_objs:
+        fcs_objs: MetadataRow per fcs file
         meta_keys:
     """
 
-    fcs_objs = []
-    meta_keys = []
-    meta_keys.extend(FORCED_SRC_KEYS)
+    table = MetadataTable(FORCED_SRC_KEYS)
+    if keep is not None:
+        keep_key = lambda key: key in FORCED_SRC_KEYS or keep(key)
+    else:
+        keep_key = None
+
+    paths = list(paths)
+    csv_created = time.strftime('%m/%d/%y %H:%M:%S')
+    parallel = jobs > 1 and len(paths) > 1
+    read_metadata = partial(read_fcs_metadata, quiet=quiet or parallel, csv_created=csv_created)
+    n_indexed = 0
+
+    with ExitStack() as stack:
+        if parallel:
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=jobs))
+            map_paths = executor.map
+        else:
+            map_paths = map
 
-    for filepath in paths:
-        fcs = FCSFile(quiet)
-        fcs.load(filepath)
-        fcs.set_param('CSV_CREATED', time.strftime('%m/%d/%y %H:%M:%S'))
-        fcs.set_param('SRC_DIR', fcs.parentdir)
-        fcs.set_param('SRC_FILE', fcs.name)
+        for ix in range(0, len(paths), LOAD_WINDOW):
+            window_paths = paths[ix:ix + LOAD_WINDOW]
+            indexed = {}
+            if index is not None:
+                for filepath in window_paths:
+                    fcs = index.lookup(filepath, quiet)
+                    if fcs is not None:
+                        set_src_params(fcs, csv_created)
+                        indexed[filepath] = fcs
+                n_indexed += len(indexed)
 
-        meta_keys.extend((mk for mk in fcs.param_keys if mk not in meta_keys))
-        fcs_objs.append(fcs)
-        fcs.close()
+            read_paths = [filepath for filepath in window_paths if filepath not in indexed]
+            results = map_paths(read_metadata, read_paths)
 
-    return fcs_objs, meta_keys
+            for filepath in window_paths:
+                if filepath in indexed:
+                    fcs = indexed.pop(filepath)
+                else:
+                    _, fcs, error = next(results)
+                    if error:
+                        print('>>> Metadata failed for {}: {}'.format(filepath, error))
+                        continue
+
+                    if parallel and not quiet:
+                        print('--> xfcs.load: {}'.format(fcs.name))
+                    if index is not None:
+                        index.store(fcs)
+
+                table.add_file(fcs, keep_key, FORCED_SRC_KEYS)
+
+    if index is not None:
+        print('>>> fcs files served from metadata index:', n_indexed)
+
+    return table.rows(), table.keys
 
 
 # ------------------------------------------------------------------------------
+def default_csv_path(tidy=False):
+    """Merged metadata csv filename based on current directory."""
+
+    desc = '-t' if tidy else '-w'
+    curdir_name = os.path.basename(os.getcwd())
+    return '{}_FCS_metadata{}.csv'.format(curdir_name, desc)
+
+
+def default_export_path(out_format):
+    """Typed metadata export filename based on current directory."""
+
+    curdir_name = os.path.basename(os.getcwd())
+    return '{}_FCS_metadata.{}'.format(curdir_name, out_format)
+
+
 def merge_metadata(fcs_objs, meta_keys, tidy, fn_out=''):
     """All fcs metadata written to one csv file.
 
@@ -104,17 +239,29 @@ def merge_metadata(fcs_objs, meta_keys, tidy, fn_out=''):
         csv_fn: filename of generated csv.
     """
 
-    if fn_out:
-        csv_fn = fn_out
-    else:
-        desc = '-t' if tidy else '-w'
-        curdir_name = os.path.basename(os.getcwd())
-        csv_fn = '{}_FCS_metadata{}.csv'.format(curdir_name, desc)
-
+    csv_fn = fn_out if fn_out else default_csv_path(tidy)
     metadata_csv.write_file(fcs_objs, meta_keys, csv_fn, tidy)
     return csv_fn
 
 
+def export_metadata(fcs_objs, meta_keys, out_format, channels=False, fn_out=''):
+    """All fcs metadata written to one typed parquet or sqlite file.
+
+    Args:
+        fcs_objs: iterable of loaded FCSFile instances.
+        meta_keys: iterable of fcs metadata Parameter keys to use.
+        out_format: 'parquet' or 'sqlite'
+        channels: bool - pivot $PnX keywords to channel table.
+        fn_out: optional filepath/name for output file.
+
+    Returns:
+        list of filepaths written
+    """
+
+    out_fn = fn_out if fn_out else default_export_path(out_format)
+    return metadata_columnar.write_file(fcs_objs, meta_keys, out_fn, out_format, channels)
+
+
 def fcs_to_csv_path(fcs_name, fcs_dir='', tidy=False):
     """Convert fcs filename to csv_metadata filename."""
 
@@ -135,6 +282,7 @@ def write_obj_metadata(fcs):
     fcs.set_param('SRC_DIR', fcs.parentdir)
     fcs.set_param('SRC_FILE', fcs.name)
     metadata_csv.write_file((fcs,), meta_keys, csv_fn, tidy=False)
+    return csv_fn
 
 
 def batch_separate_metadata(fcs_objs, meta_keys, tidy):
@@ -159,50 +307,70 @@ def batch_separate_metadata(fcs_objs, meta_keys, tidy):
 
 
 # ------------------------------------------------------------------------------
-def get_fcs_paths(in_paths, recursive, limit=0):
+def get_fcs_paths(in_paths, recursive, limit=0, search=None):
     """Locate and sort / limit fcs filepaths if not using --input arg.
         Dir search, sorting and limit is disabled if in_paths is not empty.
-        In dir search, files are sorted by filename. If limit is enabled, an
-        attempt to sort via os.path.getctime is made. If this fails, further
+        In dir search, files are sorted by filename. If limit is enabled, the
+        limit most recent files by ctime are selected during the directory
+        walk. If ctime is unavailable, all files are returned and further
         sorting is attempted within main() based on sort_confirmed value.
 
     Args:
         in_paths: iterable of fcs paths from args.input, disables dir search.
         recursive: bool - enables recursive dir search.
         limit: int - concatenates located files if using dir search.
+        search: optional dict of locator search options, see search_options.
 
     Returns:
         fcs_paths: iterable of fcs filepaths.
         sort_confirmed: bool - confirms attempt to sort paths by ctime.
     """
 
+    search = search or {}
     if in_paths:
         fcs_paths = [infile.name for infile in in_paths if infile.name.lower().endswith('.fcs')]
-    else:
-        fcs_paths = locate_fcs_files(recursive)
+        return fcs_paths, True
 
-    sort_confirmed = True
+    if limit:
+        return locate_recent_fcs_files(limit, recursive, **search)
 
-    if limit and not in_paths:
-        by_ctime = metadata_time.sort_by_ctime(fcs_paths)
-        if by_ctime:
-            fcs_paths = by_ctime[-limit:]
-        else:
-            sort_confirmed = False
-
-    return fcs_paths, sort_confirmed
+    return locate_fcs_files(recursive, **search), True
 
 
 # ------------------------------------------------------------------------------
 def batch_load_fcs_from_csv(merge_keys, merge_data):
-    """Init FCSFile instances using extracted metadata from csv file."""
+    """Init MetadataTable rows using extracted metadata from csv file."""
 
-    merge_objs = []
+    table = MetadataTable()
     for param_vals in merge_data:
-        fcs = FCSFile()
-        fcs.load_from_csv(merge_keys, param_vals)
-        merge_objs.append(fcs)
-    return merge_objs
+        row = table.add_row(())
+        for param, value in param_vals.items():
+            row.set_param(param, value)
+    return table.rows()
+
+
+def stream_append_metadata(fcs_objs, meta_keys, master_csv):
+    """Append new fcs file rows to the end of a tidy master csv.
+
+    Returns:
+        bool: False if master requires a full read and rewrite.
+    """
+
+    appender = TidyMetadataAppender(master_csv)
+    if not appender.is_tidy(meta_keys):
+        return False
+    if any(is_stat_key(key) for key in appender.columns):
+        return False
+
+    n_rows = appender.append(fcs_objs)
+    if n_rows is None:
+        return False
+
+    if not n_rows:
+        print('>>> No unique fcs files to append to master csv')
+    else:
+        print('>>> fcs metadata rows appended to {}: {}'.format(master_csv, n_rows))
+    return True
 
 
 def append_metadata(fcs_objs, meta_keys, master_csv, fn_out):
@@ -210,6 +378,11 @@ def append_metadata(fcs_objs, meta_keys, master_csv, fn_out):
         USER_KW_PREFS is bypassed and keyword set from master csv acts as
         keyword filter.
 
+        Tidy masters appended in place are streamed: new rows are checked
+        against the master fingerprint sidecar and written to the end of the
+        file. The master is read and rewritten only if rows must be re-sorted
+        or rolling stat columns (column set) must be recalculated.
+
     Args:
         fcs_objs: iterable of metadata dicts.
         meta_keys: all text param keywords located in new fcs files.
@@ -218,6 +391,9 @@ def append_metadata(fcs_objs, meta_keys, master_csv, fn_out):
             insead of appending.
     """
 
+    if fn_out == master_csv and stream_append_metadata(fcs_objs, meta_keys, master_csv):
+        return
+
     merge_keys, merge_data, is_tidy = metadata_csv.read_file(master_csv, meta_keys)
 
     if not all((merge_keys, merge_data)):
@@ -227,7 +403,8 @@ def append_metadata(fcs_objs, meta_keys, master_csv, fn_out):
     csv_fcs_objs = batch_load_fcs_from_csv(merge_keys, merge_data)
 
     # check duplicate fcs metadata entries
-    comparison_keys = [key for key in merge_keys if key in meta_keys]
+    new_keys = set(meta_keys)
+    comparison_keys = [key for key in merge_keys if key in new_keys]
 
     csv_fcs_hashes = set(fcs.meta_hash(comparison_keys) for fcs in csv_fcs_objs)
     incoming_hashes = [fcs.meta_hash(comparison_keys) for fcs in fcs_objs]
@@ -247,30 +424,96 @@ def append_metadata(fcs_objs, meta_keys, master_csv, fn_out):
         all_fcs_objs.extend(fcs_objs)
 
     if '$DATE' in merge_keys:
-        all_fcs_objs = metadata_time.sort_by_time_params(all_fcs_objs)
+        all_fcs_objs = metadata_time.sort_by_time_params(all_fcs_objs) or all_fcs_objs
     else:
         all_fcs_objs.sort(key=lambda fcs: fcs.name)
 
-    merge_keys = add_param_mean(all_fcs_objs, merge_keys)
+    merge_keys = add_param_stats(all_fcs_objs, merge_keys)
     csv_out_path = merge_metadata(all_fcs_objs, merge_keys, is_tidy, fn_out)
     print('>>> fcs metadata appended to: {}'.format(csv_out_path))
 
 
+def watch_metadata(master_csv, tidy=False, recursive=False, interval=10.0, batch_size=100,
+                   quiet=False, jobs=1, index=None, max_polls=0):
+    """Poll current directory for new fcs files and append their metadata to
+        master csv in batches. Source files already listed in the master csv
+        are skipped unless modified while watching. Runs until interrupted.
+
+    Args:
+        master_csv: metadata csv filepath, created if missing or empty.
+        tidy: bool - tidy format if master csv is created.
+        recursive: bool - include sub directories.
+        interval: sec between polls.
+        batch_size: maximum number of fcs files per append.
+        quiet: bool - disable fcs load notification.
+        jobs: number of scan threads.
+        index: optional MetadataIndex instance.
+        max_polls: stop after n polls, 0 polls until interrupted.
+    """
+
+    known_paths = []
+    if os.path.exists(master_csv) and os.path.getsize(master_csv):
+        known_paths = metadata_csv.read_source_paths(master_csv)
+
+    watcher = DirectoryWatcher(os.curdir, recursive, known_paths)
+    print('>>> Watching for new fcs files, master csv: {}'.format(master_csv))
+
+    n_polls = 0
+    try:
+        while True:
+            new_paths = watcher.poll()
+            for ix in range(0, len(new_paths), batch_size):
+                batch_paths = new_paths[ix:ix + batch_size]
+                fcs_objs, meta_keys = load_metadata(batch_paths, quiet, jobs, index)
+                if not fcs_objs:
+                    continue
+
+                if os.path.exists(master_csv) and os.path.getsize(master_csv):
+                    append_metadata(fcs_objs, meta_keys, master_csv, master_csv)
+                else:
+                    merge_metadata(fcs_objs, meta_keys, tidy, master_csv)
+                    print('>>> csv file written to: {}'.format(master_csv))
+
+            n_polls += 1
+            if max_polls and n_polls >= max_polls:
+                break
+            time.sleep(interval)
+
+    except KeyboardInterrupt:
+        print('\n>>> Watch stopped.')
+
+
 # ------------------------------------------------------------------------------
-def main(args):
-    """Main control for CLI metadata extraction.
+def scan_metadata(args):
+    """Locate, load and time sort / limit fcs metadata for CLI args, then
+        select files matching any --where predicates.
 
-        fcs_objs: iterable of metadata dicts
-        meta_keys: all_keys in order + any new (calculated) keys at end
+    Returns:
+        fcs_objs: MetadataRow per fcs file
+        meta_keys: all located keywords
     """
 
-    paths, sort_confirmed = get_fcs_paths(args.input, args.recursive, args.limit)
+    where = args.where or ()
+    paths, sort_confirmed = get_fcs_paths(
+        args.input, args.recursive, args.limit, search_options(args))
 
     print('>>> fcs files located:', len(paths))
     if not paths:
         sys.exit(0)
 
-    fcs_objs, meta_keys = load_metadata(paths, args.quiet)
+    keep = None
+    if args.kw_filter:
+        keep = keyword_selection(read_kw_prefs(args.kw_filter.name) + predicate_keywords(where))
+    elif args.spx_names:
+        keep = keyword_selection(predicate_keywords(where))
+
+    if args.index:
+        with MetadataIndex(args.index) as index:
+            fcs_objs, meta_keys = load_metadata(paths, args.quiet, args.jobs, index, keep)
+    else:
+        fcs_objs, meta_keys = load_metadata(paths, args.quiet, args.jobs, keep=keep)
+    if not fcs_objs:
+        sys.exit(1)
 
     # TODO: add arg to force param time sort?
     if not sort_confirmed and not args.merge:
@@ -282,6 +525,91 @@ def main(args):
 
         fcs_objs = sorted_fcs[-args.limit:]
 
+    if where:
+        fcs_objs = select_rows(fcs_objs, where)
+        print('>>> fcs files matching --where:', len(fcs_objs))
+        if not fcs_objs:
+            sys.exit(0)
+
+    return fcs_objs, meta_keys
+
+
+def query_metadata(paths, where, quiet=True, jobs=1, index=None):
+    """Query API: metadata of fcs files matching all predicates.
+
+    Args:
+        paths: iterable of fcs filepaths
+        where: iterable of predicate strings or Predicate instances, see
+            xfcs.utils.metadata_query
+        quiet: bool - disable fcs load notification
+        jobs: number of scan threads
+        index: optional MetadataIndex instance, unchanged files are not opened
+
+    Returns:
+        fcs_objs: MetadataRow per matching fcs file, in path order
+    """
+
+    where = [pred if isinstance(pred, Predicate) else predicate(pred) for pred in where]
+    fcs_objs, _ = load_metadata(paths, quiet, jobs, index)
+    return select_rows(fcs_objs, where)
+
+
+def query_paths(paths, where, quiet=True, jobs=1, index=None):
+    """Query API: filepaths of fcs files matching all predicates.
+
+    Usage:
+        query_paths(locate_fcs_files(True), ['$CYT~*Fortessa*', '$P3V>500'])
+    """
+
+    paths = list(paths)
+    input_paths = {os.path.abspath(path): path for path in paths}
+    fcs_objs = query_metadata(paths, where, quiet, jobs, index)
+    return [input_paths.get(fcs.filepath, fcs.filepath) for fcs in fcs_objs]
+
+
+def main(args):
+    """Main control for CLI metadata extraction.
+
+        fcs_objs: iterable of metadata dicts
+        meta_keys: all_keys in order + any new (calculated) keys at end
+    """
+
+    if args.format != 'csv':
+        if args.sepfiles or args.merge or args.get_kw or args.watch or args.paths:
+            print('>>> --format {} writes one merged metadata file, incompatible with '
+                  '--sep-files, --append-to, --get-kw, --watch and --paths.'.format(args.format))
+            sys.exit(1)
+        if args.format == 'parquet' and not metadata_columnar.PARQUET:
+            print('>>>', metadata_columnar.STATUS)
+            print('>>> Unable to write Parquet files. Install pyarrow.')
+            sys.exit(1)
+        if args.output:
+            args.output.close()
+
+    if args.watch:
+        if args.merge:
+            master_csv = args.merge.name
+        elif args.output:
+            master_csv = args.output.name
+        else:
+            master_csv = default_csv_path(args.tidy)
+
+        with MetadataIndex(args.index) if args.index else ExitStack() as index:
+            watch_metadata(
+                master_csv, args.tidy, args.recursive, args.interval, args.batch_size,
+                args.quiet, args.jobs, index if args.index else None)
+        return
+
+    if args.paths:
+        # stdout carries matching filepaths, progress is reported on stderr
+        with redirect_stdout(sys.stderr):
+            fcs_objs, _ = scan_metadata(args)
+        for fcs in fcs_objs:
+            print(fcs.filepath)
+        return
+
+    fcs_objs, meta_keys = scan_metadata(args)
+
     if args.get_kw:
         kw_prefs_filename = write_kw_prefs(meta_keys)
         print('>>> FCS Keyword file generated:', kw_prefs_filename)
@@ -292,10 +620,10 @@ def main(args):
         append_metadata(fcs_objs, meta_keys, master_csv, fn_out)
 
     else:
-        check_user_mean_keys = False
+        check_user_stat_keys = False
         if args.kw_filter:
             meta_keys = read_kw_prefs(args.kw_filter.name)
-            check_user_mean_keys = any('_MEAN' in key for key in meta_keys)
+            check_user_stat_keys = any(is_stat_key(key) for key in meta_keys)
         elif args.spx_names:
             name_keys = list(channel_name_keywords(meta_keys))
             meta_keys = list(FORCED_SRC_KEYS)
@@ -305,12 +633,16 @@ def main(args):
             csv_paths = batch_separate_metadata(fcs_objs, meta_keys, args.tidy)
             print('\n>>> csv files written: {}\n'.format(len(csv_paths)))
         else:
-            if check_user_mean_keys:
-                meta_keys = add_param_mean(fcs_objs, meta_keys)
+            if check_user_stat_keys:
+                meta_keys = add_param_stats(fcs_objs, meta_keys)
 
             fn_out = '' if not args.output else args.output.name
-            csv_out_path = merge_metadata(fcs_objs, meta_keys, args.tidy, fn_out)
-            print('\n>>> csv file written to: {}\n'.format(csv_out_path))
+            if args.format != 'csv':
+                out_paths = export_metadata(fcs_objs, meta_keys, args.format, args.channels, fn_out)
+                print('\n>>> {} file written to: {}\n'.format(args.format, ', '.join(out_paths)))
+            else:
+                csv_out_path = merge_metadata(fcs_objs, meta_keys, args.tidy, fn_out)
+                print('\n>>> csv file written to: {}\n'.format(csv_out_path))
 
 
     if args.dashboard:
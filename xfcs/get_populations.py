@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from functools import partial
+import os
+import sys
+import time
+
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.gating.gatingml import read_gatingml
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+SRC_KEYS = ('SRC_DIR', 'SRC_FILE')
+
+
+def file_population_stats(filepath, strategy, data_set, norm_count, norm_time):
+    """Load fcs file data and calculate stats for all populations in strategy.
+
+    Args:
+        filepath: fcs filepath
+        strategy: GatingStrategy instance
+        data_set: data set used for uncompensated gate dimensions
+        norm_count: bool - force event count to start at 1.
+        norm_time: bool - force time to start at 0.
+
+    Returns:
+        filepath, list of population stat rows, error message or empty str
+    """
+
+    try:
+        fcs = FCSFile(quiet=True)
+        fcs.load(filepath)
+        fcs.load_data(norm_count, norm_time)
+        values = strategy.gate_values(fcs.data, data_set)
+        if not values:
+            return filepath, [], 'data set <{}> is unavailable'.format(data_set)
+
+        rows = []
+        for pop_row in strategy.population_stats(values):
+            row = OrderedDict(zip(SRC_KEYS, (fcs.parentdir, fcs.name)))
+            row.update(pop_row)
+            rows.append(row)
+
+    except Exception as err:
+        return filepath, [], '{}: {}'.format(err.__class__.__name__, err)
+
+    return filepath, rows, ''
+
+
+def batch_population_stats(fcs_paths, strategy, data_set='channel_scale',
+                           norm_count=True, norm_time=True, jobs=1):
+    """Applies gating strategy to every fcs file. Files are distributed across a
+    process pool when jobs > 1, results are returned in input order.
+
+    Args:
+        fcs_paths: iterable of fcs filepaths
+        strategy: GatingStrategy instance, built once and shared by all files
+        data_set: data set used for uncompensated gate dimensions
+        norm_count: bool - force event count to start at 1.
+        norm_time: bool - force time to start at 0.
+        jobs: number of worker processes
+
+    Returns:
+        stat_rows: list of OrderedDict, one per file per population
+        failed: list of (filepath, error message)
+    """
+
+    strategy.build()
+    get_stats = partial(
+        file_population_stats, strategy=strategy, data_set=data_set,
+        norm_count=norm_count, norm_time=norm_time)
+
+    if jobs > 1 and len(fcs_paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(get_stats, fcs_paths))
+    else:
+        results = [get_stats(path) for path in fcs_paths]
+
+    stat_rows, failed = [], []
+    for filepath, rows, error in results:
+        if error:
+            failed.append((filepath, error))
+        stat_rows.extend(rows)
+
+    return stat_rows, failed
+
+
+def write_population_stats(stat_rows, csv_fn):
+    """Writes tidy csv - one row per fcs file per population. Median columns
+    are the union of all channels in order located.
+    """
+
+    stat_keys = OrderedDict()
+    for row in stat_rows:
+        stat_keys.update(OrderedDict.fromkeys(row))
+
+    with open(csv_fn, 'w') as csv_file:
+        writer = csv.writer(csv_file, dialect='excel')
+        writer.writerow(stat_keys)
+        for row in stat_rows:
+            writer.writerow(row.get(key, '') for key in stat_keys)
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    start = time.perf_counter()
+    strategy = read_gatingml(args.gating_ml.name)
+    print('>>> gating strategy populations:', len(strategy.populations))
+
+    stat_rows, failed = batch_population_stats(
+        fcs_paths, strategy, args.data_set, args.norm_count, args.norm_time, args.jobs)
+
+    for filepath, error in failed:
+        print('>>> population stats failed for {}: {}'.format(filepath, error))
+
+    if args.output:
+        csv_fn = args.output.name
+    else:
+        curdir_name = os.path.basename(os.getcwd())
+        csv_fn = '{}_FCS_populations.csv'.format(curdir_name)
+
+    write_population_stats(stat_rows, csv_fn)
+
+    end = time.perf_counter() - start
+    n_files = len(fcs_paths)
+    print('\n>>> csv file written to: {}'.format(csv_fn))
+    txt = 'fcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
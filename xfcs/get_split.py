@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import time
+
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.FCSFile.edit import split_fcs
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'min': 60, 'h': 3600}
+
+
+def parse_duration(duration):
+    """Convert duration arg to seconds e.g. 60s, 2m, 500ms, 1.5h, 90"""
+
+    match = re.match(r'^\s*(\d+(?:\.\d*)?|\.\d+)\s*([a-z]*)\s*$', duration.lower())
+    if not match or match.group(2) not in DURATION_UNITS and match.group(2):
+        raise ValueError('Unable to parse duration: {}'.format(duration))
+
+    value, unit = match.groups()
+    return float(value) * DURATION_UNITS.get(unit or 's')
+
+
+def batch_split(fcs_paths, every, suffix='split'):
+    """Splits each fcs file into consecutive time windows.
+
+    Returns:
+        list of generated fcs filepaths
+    """
+
+    split_paths = []
+    for path in fcs_paths:
+        fcs = FCSFile()
+        fcs.load(path)
+        try:
+            split_files = split_fcs(fcs, every, suffix)
+        except ValueError as err:
+            print('>>>', err)
+            continue
+
+        split_paths.extend(split_path for split_path, _ in split_files)
+        print('>>> Split files generated:', len(split_files))
+
+    return split_paths
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    split_name = re.compile(r'_{}\d+\.fcs$'.format(re.escape(args.suffix)))
+    fcs_paths = [path for path in fcs_paths if not split_name.search(path)]
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    start = time.perf_counter()
+    batch_split(fcs_paths, parse_duration(args.every), args.suffix)
+
+    end = time.perf_counter() - start
+    n_files = len(fcs_paths)
+    txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+import csv
+import os
+import sys
+import time
+
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.get_data import selected_data_sets
+from xfcs.stats.summary import DEFAULT_PERCENTILES, stream_channel_stats
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+SRC_KEYS = ('SRC_DIR', 'SRC_FILE', 'DATA_SET', 'CHANNEL')
+
+
+def file_channel_stats(filepath, user_select, percentiles=DEFAULT_PERCENTILES,
+                       norm_count=True, norm_time=True):
+    """Computes summary stats for every channel in each selected data set in one
+    streaming pass over the fcs data section.
+
+    Args:
+        filepath: fcs filepath
+        user_select: iterable of (user option, data attr) from selected_data_sets
+        percentiles: iterable of percentiles to include
+        norm_count: bool - force event count to start at 1.
+        norm_time: bool - force time to start at 0.
+
+    Returns:
+        list of OrderedDict, one row per data set per channel
+    """
+
+    fcs = FCSFile()
+    fcs.load(filepath)
+    stream = fcs.stream_data(norm_count, norm_time)
+    set_names = dict((data_attr, user_option) for user_option, data_attr in user_select)
+    channel_stats = stream_channel_stats(stream, set_names.keys())
+
+    rows = []
+    for (data_attr, channel), ch_stats in channel_stats.items():
+        row = OrderedDict(zip(SRC_KEYS, (fcs.parentdir, fcs.name, set_names[data_attr], channel)))
+        row.update(ch_stats.summary(percentiles))
+        rows.append(row)
+
+    unavailable = set(set_names) - set(data_attr for data_attr, _ in channel_stats)
+    for data_attr in unavailable:
+        print('>>> fcs data set <{}> is unavailable.'.format(set_names[data_attr]))
+
+    return rows
+
+
+def write_stats_csv(stat_rows, csv_fn):
+    """Writes tidy csv - one row per fcs file per data set per channel."""
+
+    if not stat_rows:
+        return
+
+    stat_keys = list(stat_rows[0].keys())
+    with open(csv_fn, 'w') as csv_file:
+        writer = csv.writer(csv_file, dialect='excel')
+        writer.writerow(stat_keys)
+        for row in stat_rows:
+            writer.writerow('' if row[key] is None else row[key] for key in stat_keys)
+
+
+def write_stats_parquet(stat_rows, parquet_fn):
+    """Writes tidy parquet file, requires pyarrow or fastparquet."""
+
+    import pandas as pd
+
+    stats_df = pd.DataFrame(stat_rows)
+    try:
+        stats_df.to_parquet(parquet_fn, index=False)
+    except ImportError as err:
+        print('>>>', err)
+        print('>>> Unable to write parquet file. Install pyarrow.')
+        return False
+    return True
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    user_select = selected_data_sets(args)
+    if not user_select:
+        user_select = [('channel', 'channel')]
+
+    start = time.perf_counter()
+    stat_rows = []
+    for path in fcs_paths:
+        stat_rows.extend(file_channel_stats(
+            path, user_select, args.percentiles, args.norm_count, args.norm_time))
+
+    ext = '.parquet' if args.parquet else '.csv'
+    if args.output:
+        out_fn = args.output.name
+    else:
+        curdir_name = os.path.basename(os.getcwd())
+        out_fn = '{}_FCS_stats{}'.format(curdir_name, ext)
+
+    if args.parquet:
+        if not write_stats_parquet(stat_rows, out_fn):
+            sys.exit(1)
+    else:
+        write_stats_csv(stat_rows, out_fn)
+
+    end = time.perf_counter() - start
+    n_files = len(fcs_paths)
+    print('\n>>> stats file written to: {}'.format(out_fn))
+    txt = 'fcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+
+from xfcs.FCSFile.FCSError import ChannelNotFoundError
+from xfcs.FCSFile.FCSFile import FCSFile
+from xfcs.utils.locator import locate_fcs_files, search_options
+# ------------------------------------------------------------------------------
+def parse_range(range_arg, value_type=int):
+    """Convert 'min:max' arg to (min, max). Either side may be empty for an
+    open bound, e.g. '1000:' or ':30.5'.
+    """
+
+    if not range_arg:
+        return None, None
+
+    if ':' not in range_arg:
+        raise ValueError('Range must use the form min:max - {}'.format(range_arg))
+
+    bounds = []
+    for bound in range_arg.split(':', 1):
+        bound = bound.strip()
+        bounds.append(value_type(bound) if bound else None)
+    return tuple(bounds)
+
+
+def batch_subset(fcs_paths, channels=None, events=None, time_range=None, suffix='subset'):
+    """Writes FCS 3.1 file for each fcs file with selected channels and events.
+
+    Args:
+        fcs_paths: iterable of fcs filepaths
+        channels: optional channel names in output order
+        events: optional (start, stop) event index range
+        time_range: optional (min, max) time range
+        suffix: appended to source filename
+
+    Returns:
+        list of generated fcs filepaths
+    """
+
+    start, stop = events or (None, None)
+    start = start or 0
+    if time_range == (None, None):
+        time_range = None
+
+    subset_paths = []
+    for path in fcs_paths:
+        fcs = FCSFile()
+        fcs.load(path)
+        subset_path = path.rsplit('.', 1)[0] + '_{}.fcs'.format(suffix)
+        try:
+            n_events = fcs.write(subset_path, channels, start, stop, time_range)
+        except (ChannelNotFoundError, ValueError) as err:
+            print('>>> {}: {}'.format(fcs.name, err))
+            continue
+
+        subset_paths.append(subset_path)
+        print('>>> Events written to {}: {}'.format(subset_path, n_events))
+
+    return subset_paths
+
+
+# ------------------------------------------------------------------------------
+def main(args):
+    if args.input:
+        fcs_paths = [infile.name for infile in args.input if infile.name.lower().endswith('.fcs')]
+    else:
+        fcs_paths = locate_fcs_files(args.recursive, **search_options(args))
+
+    suffix = '_{}.fcs'.format(args.suffix)
+    fcs_paths = [path for path in fcs_paths if not path.endswith(suffix)]
+    if not fcs_paths:
+        print('No fcs files located')
+        sys.exit(0)
+
+    events = parse_range(args.events, int)
+    time_range = parse_range(args.time_range, float)
+
+    start = time.perf_counter()
+    subset_paths = batch_subset(fcs_paths, args.channels, events, time_range, args.suffix)
+
+    end = time.perf_counter() - start
+    n_files = len(subset_paths)
+    if n_files:
+        txt = '\nfcs files: {}, ave/total: {:.3f}/{:.3f} sec'.format(n_files, end / n_files, end)
+    else:
+        txt = '\nfcs files: 0, ave/total: 0.000/{:.3f} sec'.format(end)
+    print(txt)
+    print()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,236 @@
+"""
+Fixed bin 1D and 2D histograms accumulated over chunks of the DATA segment.
+
+Bin edges are derived from each parameter's value range ($PnB, $PnR, $PnE, $PnG)
+within the selected data set, so every chunk uses identical bins and memory use
+is O(bins) regardless of event count. Log scaled parameters use log spaced bins.
+
+Integer data with an integer bin width (e.g. raw, channel values) is binned with
+integer division, float data with one multiply - both accumulate with np.bincount.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xfcs.FCSFile.FCSError import ChannelNotFoundError
+# ------------------------------------------------------------------------------
+DEFAULT_BINS = 256
+BIN_EDGE_TOL = 1e-9
+REF_CHANNELS = ('TIME', 'Event Count')
+
+
+class Histogram(object):
+    """Instantiates a fixed bin Histogram for 1 or 2 channels.
+
+    Public Attributes:
+        channels: tuple of channel names
+        bins: tuple of bin count per channel
+        ranges: tuple of (min, max) per channel
+        log: tuple of bool per channel - log spaced bins
+        counts: np.array of event counts with shape == bins
+        outside: number of events outside of bin ranges
+    """
+
+    def __init__(self, channels, ranges, bins=DEFAULT_BINS, log=False):
+        """Initialize Histogram.
+
+        Args:
+            channels: channel name or (x, y) channel names
+            ranges: (min, max) or one (min, max) per channel
+            bins: int or one int per channel
+            log: bool or one bool per channel
+        """
+
+        if isinstance(channels, str):
+            channels, ranges = (channels,), (ranges,)
+
+        n_dim = len(channels)
+        if isinstance(bins, int):
+            bins = (bins,) * n_dim
+        if isinstance(log, bool):
+            log = (log,) * n_dim
+
+        self.channels = tuple(channels)
+        self.ranges = tuple((lo, hi) for lo, hi in ranges)
+        self.log = tuple(bool(is_log) for is_log in log)
+        self.bins = tuple(int(n_bins) for n_bins in bins)
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.outside = 0
+
+        for channel, (lo, hi), is_log in zip(self.channels, self.ranges, self.log):
+            if not hi > lo or (is_log and lo <= 0):
+                raise ValueError('Invalid histogram range for {}: {}'.format(channel, (lo, hi)))
+
+
+    def __repr__(self):
+        return 'Histogram({}, bins={})'.format(self.channels, self.bins)
+
+
+    @property
+    def edges(self):
+        """Bin edges per channel, length is bins + 1."""
+
+        dim_edges = []
+        for (lo, hi), n_bins, is_log in zip(self.ranges, self.bins, self.log):
+            if is_log:
+                dim_edges.append(np.geomspace(lo, hi, n_bins + 1))
+            else:
+                dim_edges.append(np.linspace(lo, hi, n_bins + 1))
+        return tuple(dim_edges)
+
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+
+    def bin_index(self, values, dim=0):
+        """Converts values to bin index for one dimension. Values outside of the
+        range (or nan) are assigned -1.
+        """
+
+        lo, hi = self.ranges[dim]
+        n_bins = self.bins[dim]
+        values = np.asarray(values)
+
+        if self.log[dim]:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.log10(values)
+            lo, hi = np.log10(lo), np.log10(hi)
+
+        width = (hi - lo) / n_bins
+        if values.dtype.kind in 'ui' and float(lo).is_integer() and float(width).is_integer():
+            bin_ix = values.astype(np.int64)
+            if lo:
+                bin_ix -= int(lo)
+            bin_ix //= int(width)
+        else:
+            with np.errstate(invalid='ignore'):
+                scaled = (values - lo) * (n_bins / (hi - lo))
+                scaled[~np.isfinite(scaled)] = -1
+            # tolerance for values located exactly on a bin edge
+            bin_ix = np.floor(scaled + BIN_EDGE_TOL).astype(np.int64)
+
+        bin_ix[(bin_ix < 0) | (bin_ix >= n_bins)] = -1
+        return bin_ix
+
+
+    def add(self, *columns):
+        """Accumulate one chunk of events, one array per channel."""
+
+        bin_ix = self.bin_index(columns[0], 0)
+        valid = bin_ix >= 0
+        for dim in range(1, len(columns)):
+            dim_ix = self.bin_index(columns[dim], dim)
+            valid &= dim_ix >= 0
+            bin_ix = bin_ix * self.bins[dim] + dim_ix
+
+        n_valid = int(np.count_nonzero(valid))
+        self.outside += valid.size - n_valid
+        if n_valid != valid.size:
+            bin_ix = bin_ix[valid]
+
+        flat_counts = np.bincount(bin_ix, minlength=self.counts.size)
+        self.counts += flat_counts.reshape(self.bins)
+
+
+    def merge(self, other):
+        """Add counts from another Histogram with identical bins."""
+
+        if (other.ranges, other.bins, other.log) != (self.ranges, self.bins, self.log):
+            raise ValueError('Histogram bins do not match.')
+        self.counts += other.counts
+        self.outside += other.outside
+
+
+    def compact_counts(self):
+        """Counts using the smallest unsigned integer dtype."""
+        max_count = int(self.counts.max()) if self.counts.size else 0
+        return self.counts.astype(np.min_scalar_type(max_count))
+
+
+# ------------------------------------------------------------------------------
+def stream_histograms(stream, data_set='channel', channels=None, pairs=(),
+                      bins=DEFAULT_BINS, ranges=None):
+    """Computes 1D histograms for channels and 2D histograms for channel pairs
+    in one pass over a DataStream.
+
+    Args:
+        stream: DataStream instance
+        data_set: DataSection data set name
+        channels: channel names for 1D histograms, defaults to all non
+            reference channels in data set. Use empty list to disable.
+        pairs: iterable of (x, y) channel names for 2D histograms
+        bins: number of bins per channel
+        ranges: optional dict mapping channel name -> (min, max) to override
+            ranges derived from the fcs text section
+
+    Returns:
+        OrderedDict mapping channel name or (x, y) -> Histogram
+    """
+
+    ranges = ranges or {}
+    param_data = stream.parameter_data
+    histograms = None
+
+    def channel_range(channel):
+        if channel in ranges:
+            lo, hi = ranges[channel]
+            return lo, hi, False
+
+        ch_range = param_data.value_range(param_data.id_map.get(channel), data_set)
+        if not ch_range:
+            raise ValueError('Unknown value range for {}, add range manually.'.format(channel))
+        return ch_range
+
+    def make_histogram(ch_names, par_names):
+        for channel in ch_names:
+            if channel not in par_names:
+                raise ChannelNotFoundError(channel, par_names)
+
+        ch_ranges = [channel_range(channel) for channel in ch_names]
+        return Histogram(
+            ch_names, [(lo, hi) for lo, hi, _ in ch_ranges], bins,
+            [is_log for _, _, is_log in ch_ranges])
+
+    for par_names, data_chunk in stream.chunks(data_set):
+        if histograms is None:
+            if channels is None:
+                channels = [name for name in par_names if name not in REF_CHANNELS]
+
+            histograms = OrderedDict()
+            for channel in channels:
+                histograms[channel] = make_histogram((channel,), par_names)
+            for x_name, y_name in pairs:
+                histograms[(x_name, y_name)] = make_histogram((x_name, y_name), par_names)
+
+        for hist in histograms.values():
+            hist.add(*(data_chunk[channel].to_numpy() for channel in hist.channels))
+
+    return histograms or OrderedDict()
+
+
+def save_histograms(histograms, filepath):
+    """Export histograms to compressed .npz file. Arrays are stored per key:
+        1D: <channel>_counts, <channel>_edges
+        2D: <x>_vs_<y>_counts, <x>_vs_<y>_xedges, <x>_vs_<y>_yedges
+    """
+
+    arrays = {}
+    for key, hist in histograms.items():
+        edges = hist.edges
+        if len(hist.channels) == 1:
+            arrays['{}_counts'.format(key)] = hist.compact_counts()
+            arrays['{}_edges'.format(key)] = edges[0]
+        else:
+            name = '{}_vs_{}'.format(*key)
+            arrays['{}_counts'.format(name)] = hist.compact_counts()
+            arrays['{}_xedges'.format(name)] = edges[0]
+            arrays['{}_yedges'.format(name)] = edges[1]
+
+    np.savez_compressed(filepath, **arrays)
+    return filepath
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,292 @@
+"""
+One pass, mergeable per channel summary statistics.
+
+ChannelStats accumulates count, mean and sum of squared deviations (Chan et al.
+parallel update), min and max for each chunk of events. Median and percentiles
+are approximated from a fine bin Histogram. Bins start from the channel value
+range or, without $PnR, the first chunk and grow to cover every observed value:
+existing counts are rebinned into the wider range, each exceeded side padded by
+half the new span so monotonic channels (TIME) rebin O(log n) times. Integer
+channels with a span <= MAX_EXACT_BINS use one bin per value, so their
+percentiles are exact.
+
+Any two ChannelStats can be merged, e.g. chunks processed in separate workers
+or the same channel across files.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xfcs.stats.histogram import Histogram
+# ------------------------------------------------------------------------------
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+QUANTILE_BINS = 2**14
+MAX_EXACT_BINS = 2**16
+
+
+class ChannelStats(object):
+    """Instantiates a mergeable ChannelStats accumulator.
+
+    Public Attributes:
+        channel: channel name
+        count: number of events
+        mean: running mean
+        m2: running sum of squared deviations from mean
+        min, max: running min, max values
+        histogram: Histogram used for percentiles or None before any values
+    """
+
+    def __init__(self, channel, value_range=None, integer=False):
+        """Initialize ChannelStats.
+
+        Args:
+            channel: channel name
+            value_range: (min, max, log) possible channel values or None
+            integer: bool - channel values are integers
+        """
+
+        self.channel = channel
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.histogram = None
+        self._exact = False
+        self._integer = integer
+
+        if value_range:
+            lo, hi, is_log = value_range
+            self.histogram = self.__new_histogram(lo, hi, is_log)
+
+
+    def __new_histogram(self, lo, hi, is_log):
+        n_bins = QUANTILE_BINS
+        span = hi - lo
+        self._exact = (self._integer and not is_log and span <= MAX_EXACT_BINS
+                       and float(span).is_integer() and float(lo).is_integer())
+        if self._exact:
+            n_bins = int(span)
+        return Histogram(self.channel, (lo, hi), n_bins, is_log)
+
+
+    def __cover(self, v_min, v_max):
+        """Create or grow histogram so that v_min, v_max fall inside its bins.
+        Existing counts are rebinned at their bin positions.
+        """
+
+        hist = self.histogram
+        if hist is None:
+            hi = v_max + 1 if self._integer else v_max + (v_max - v_min) / QUANTILE_BINS
+            if not hi > v_max:
+                hi = v_max + max(abs(v_max), 1.0)
+            self.histogram = self.__new_histogram(v_min, hi, False)
+            return
+
+        (lo, hi), is_log = hist.ranges[0], hist.log[0]
+        if v_min >= lo and v_max < hi:
+            return
+
+        new_lo, new_hi = min(lo, v_min), max(hi, v_max)
+        if is_log and new_lo <= 0:
+            is_log = False
+
+        if is_log:
+            log_lo, log_hi = np.log10(new_lo), np.log10(new_hi)
+            pad = (log_hi - log_lo) / 2
+            new_lo = 10**(log_lo - pad) if v_min < lo else new_lo
+            new_hi = 10**(log_hi + pad) if v_max >= hi else new_hi
+        else:
+            pad = (new_hi - new_lo) / 2
+            new_lo = new_lo - pad if v_min < lo else new_lo
+            new_hi = new_hi + pad if v_max >= hi else new_hi
+            if self._integer:
+                new_lo, new_hi = float(np.floor(new_lo)), float(np.ceil(new_hi))
+
+        was_exact = self._exact
+        self.histogram = self.__new_histogram(new_lo, new_hi, is_log)
+        self.histogram.outside = hist.outside
+        self.__add_counts(hist, was_exact)
+
+
+    def __add_counts(self, hist, exact):
+        """Add counts of another 1D histogram, each bin at its lower edge
+        (exact bins) or center.
+        """
+
+        edges = hist.edges[0]
+        if exact:
+            positions = edges[:-1]
+        elif hist.log[0]:
+            positions = np.sqrt(edges[:-1] * edges[1:])
+        else:
+            positions = (edges[:-1] + edges[1:]) / 2
+
+        counts = hist.counts
+        nonzero = counts > 0
+        if not nonzero.any():
+            return
+
+        positions, counts = positions[nonzero], counts[nonzero]
+        self.__cover(float(positions.min()), float(positions.max()))
+        target = self.histogram
+        bin_ix = target.bin_index(positions)
+        target.counts += np.bincount(bin_ix, weights=counts, minlength=target.counts.size).astype(
+            np.int64)
+
+
+    def add(self, values):
+        """Accumulate one chunk of channel values."""
+
+        n_add = values.size
+        if not n_add:
+            return
+
+        add_vals = values.astype(np.float64, copy=False)
+        add_mean = float(add_vals.mean())
+        add_m2 = float(np.square(add_vals - add_mean).sum())
+        add_min, add_max = float(add_vals.min()), float(add_vals.max())
+        self.__combine(n_add, add_mean, add_m2, add_min, add_max)
+
+        if not (np.isfinite(add_min) and np.isfinite(add_max)):
+            finite = add_vals[np.isfinite(add_vals)]
+            if not finite.size:
+                if self.histogram:
+                    self.histogram.outside += n_add
+                return
+            add_min, add_max = float(finite.min()), float(finite.max())
+
+        self.__cover(add_min, add_max)
+        self.histogram.add(values)
+
+
+    def merge(self, other):
+        """Merge another ChannelStats accumulator into this one."""
+
+        if other.count:
+            self.__combine(other.count, other.mean, other.m2, other.min, other.max)
+        if other.histogram:
+            self.__add_counts(other.histogram, other._exact)
+            if self.histogram:
+                self.histogram.outside += other.histogram.outside
+
+
+    def __combine(self, n_add, add_mean, add_m2, add_min, add_max):
+        n_total = self.count + n_add
+        delta = add_mean - self.mean
+        self.mean += delta * n_add / n_total
+        self.m2 += add_m2 + delta**2 * self.count * n_add / n_total
+        self.count = n_total
+        self.min = min(self.min, add_min)
+        self.max = max(self.max, add_max)
+
+
+    # --------------------------------------------------------------------------
+    @property
+    def variance(self):
+        """Sample variance (ddof=1)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return self.variance**0.5
+
+    @property
+    def cv(self):
+        """Coefficient of variation as percent."""
+        return 100 * self.std / abs(self.mean) if self.mean else 0.0
+
+
+    def percentile(self, q):
+        """Approximate percentile from histogram counts (inverted cdf with linear
+        interpolation inside the located bin).
+
+        Arg:
+            q: percentile 0 - 100
+
+        Returns:
+            float value or None if unavailable
+        """
+
+        hist = self.histogram
+        if not hist or not hist.total:
+            return None
+
+        counts = hist.counts
+        cumulative = np.cumsum(counts)
+        target = q / 100 * cumulative[-1]
+        bin_ix = min(int(np.searchsorted(cumulative, target, side='left')), counts.size - 1)
+        while not counts[bin_ix] and bin_ix < counts.size - 1:
+            bin_ix += 1
+
+        edges = hist.edges[0]
+        lo, hi = edges[bin_ix], edges[bin_ix + 1]
+        if self._exact:
+            value = lo
+        else:
+            prev_total = cumulative[bin_ix - 1] if bin_ix else 0
+            frac = (target - prev_total) / counts[bin_ix] if counts[bin_ix] else 0
+            value = lo + min(max(frac, 0), 1) * (hi - lo)
+
+        return float(min(max(value, self.min), self.max))
+
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """Returns OrderedDict of all statistics."""
+
+        stats = OrderedDict((
+            ('COUNT', self.count),
+            ('MEAN', self.mean),
+            ('VARIANCE', self.variance),
+            ('CV_PCT', self.cv),
+            ('MIN', self.min if self.count else None),
+            ('MAX', self.max if self.count else None),
+            ('MEDIAN', self.percentile(50))))
+
+        for q in percentiles:
+            stats['P{:g}'.format(q)] = self.percentile(q)
+
+        return stats
+
+
+# ------------------------------------------------------------------------------
+def stream_channel_stats(stream, data_sets=('channel',)):
+    """Computes ChannelStats for every channel in each data set in one pass over
+    a DataStream.
+
+    Args:
+        stream: DataStream instance
+        data_sets: iterable of DataSection data set names
+
+    Returns:
+        OrderedDict mapping (data set, channel name) -> ChannelStats
+    """
+
+    param_data = stream.parameter_data
+    available = list(data_sets)
+    channel_stats = OrderedDict()
+
+    for _, data in stream.data_sections():
+        for data_set in tuple(available):
+            par_names, data_chunk = getattr(data, data_set)
+            if not par_names:
+                available.remove(data_set)
+                continue
+
+            for channel in par_names:
+                key = (data_set, channel)
+                values = data_chunk[channel].to_numpy()
+                if key not in channel_stats:
+                    value_range = param_data.value_range(param_data.id_map.get(channel), data_set)
+                    is_int = values.dtype.kind in 'ui'
+                    channel_stats[key] = ChannelStats(channel, value_range, is_int)
+                channel_stats[key].add(values)
+
+        if not available:
+            break
+
+    return channel_stats
+
+
+# ------------------------------------------------------------------------------
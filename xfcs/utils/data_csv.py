@@ -0,0 +1,114 @@
+"""
+Chunked csv data set writer.
+
+Each DataFrame chunk is formatted column by column: every column is converted
+to a list of str in one C level pass (map over the column values) and rows are
+joined with str.join, which is several times faster than DataFrame.to_csv.
+Integer columns are written without decimals. Float columns use float_format
+if given, otherwise the shortest repr that round trips the value. NaN is
+written as an empty field.
+"""
+
+import csv
+import gzip
+
+import numpy as np
+# ------------------------------------------------------------------------------
+GZIP_LEVEL = 6
+
+
+def format_column(values, float_format=None):
+    """Formats one column of values.
+
+    Args:
+        values: np.array of column values
+        float_format: optional format for float columns e.g. %.6g, %.2f
+
+    Returns:
+        list of str, NaN values are empty strings
+    """
+
+    kind = values.dtype.kind
+    if kind == 'b':
+        return list(map(str, values.astype(np.int8).tolist()))
+    if kind in 'ui':
+        return list(map(str, values.tolist()))
+    if kind != 'f':
+        return values.astype(str).tolist()
+
+    if float_format:
+        text = list(map(float_format.__mod__, values.tolist()))
+    elif values.dtype == np.float64:
+        text = list(map(repr, values.tolist()))
+    else:
+        # float32: shortest repr of the single precision value
+        text = values.astype(str).tolist()
+
+    for ix in np.flatnonzero(np.isnan(values)).tolist():
+        text[ix] = ''
+    return text
+
+
+class CSVDataWriter(object):
+    """Instantiates a CSVDataWriter object.
+
+    Public Methods:
+        write_chunk: Append DataFrame chunk, header is written with first chunk.
+        close: Close csv file.
+    """
+
+    def __init__(self, filepath, float_format=None, compress=False):
+        """Initialize CSVDataWriter.
+
+        Args:
+            filepath: output csv filepath, .gz is appended if compress is True.
+                An open text file object (e.g. sys.stdout) is written to and
+                flushed but not closed.
+            float_format: optional format for float columns e.g. %.6g, %.2f
+            compress: bool - gzip compress while writing
+        """
+
+        self._own_file = not hasattr(filepath, 'write')
+        if compress and self._own_file and not filepath.endswith('.gz'):
+            filepath += '.gz'
+
+        self.filepath = filepath if self._own_file else None
+        self.float_format = float_format
+        self.n_events = 0
+        self._header = False
+
+        if not self._own_file:
+            self._csv = filepath
+        elif compress:
+            self._csv = gzip.open(filepath, 'wt', compresslevel=GZIP_LEVEL, newline='')
+        else:
+            self._csv = open(filepath, 'w', newline='')
+
+
+    def __write_header(self, data_chunk):
+        csv.writer(self._csv, dialect='excel', lineterminator='\n').writerow(
+            [str(name) for name in data_chunk.columns])
+        self._header = True
+
+
+    def write_chunk(self, data_chunk):
+        if not self._header:
+            self.__write_header(data_chunk)
+
+        if not len(data_chunk):
+            return
+
+        columns = [format_column(data_chunk[name].to_numpy(), self.float_format)
+                   for name in data_chunk.columns]
+        self._csv.write('\n'.join(map(','.join, zip(*columns))) + '\n')
+        self.n_events += len(data_chunk)
+
+
+    def close(self):
+        if self._own_file:
+            self._csv.close()
+        else:
+            self._csv.flush()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,189 @@
+"""
+Consolidated HDF5 data store - requires PyTables (pandas HDFStore).
+
+One HDF5 file holds a whole batch with one appendable table per fcs file per
+data set:
+    /<relative directory>/<fcs file name>/<data set>
+
+The group path follows the fcs filepath relative to the current directory, so
+files with the same name in different directories (-r) get separate tables.
+
+Chunks are appended as they are read. A table is marked complete once its
+last chunk is written, together with the source path, size, mtime and content
+fingerprint. Re-running a batch skips complete tables of unchanged files,
+replaces incomplete or outdated tables and appends new fcs files.
+"""
+
+import hashlib
+import os
+import re
+
+import pandas as pd
+
+from xfcs.utils.manifest import file_fingerprint
+# ------------------------------------------------------------------------------
+HDF5_CODECS = ('blosc:lz4', 'blosc:zstd', 'blosc', 'zlib', 'lzo', 'bzip2')
+
+
+def group_names(filepath):
+    """HDF5 group names for fcs filepath: relative directories and file stem.
+    Paths outside of the current directory use the absolute path.
+    """
+
+    rel_path = os.path.relpath(filepath)
+    if rel_path.startswith(os.pardir):
+        rel_path = os.path.abspath(filepath).lstrip(os.sep)
+    parts = os.path.splitext(rel_path)[0].split(os.sep)
+    return [re.sub(r'\W', '_', part) or '_' for part in parts]
+
+
+def store_key(fcs, data_desc, path_hash=False):
+    """HDF5 table key for one data set of an fcs file. With path_hash, the
+    file group name gets a source path hash suffix.
+    """
+
+    groups = group_names(fcs.filepath)
+    if path_hash:
+        digest = hashlib.blake2b(fcs.filepath.encode('utf-8'), digest_size=4).hexdigest()
+        groups[-1] = '{}_{}'.format(groups[-1], digest)
+    return '/{}/{}'.format('/'.join(groups), data_desc)
+
+
+def source_state(filepath):
+    """Source file attributes stored with each complete table."""
+
+    stat = os.stat(filepath)
+    return {
+        'src_file': filepath, 'src_size': stat.st_size, 'src_mtime_ns': stat.st_mtime_ns,
+        'src_fingerprint': file_fingerprint(filepath, stat.st_size)}
+
+
+class HDFStoreTableWriter(object):
+    """Appends DataFrame chunks to one table within an open HDFStore."""
+
+    def __init__(self, store, key, src_file, text=None, complib='blosc:lz4', complevel=5):
+        self.store = store
+        self.key = key
+        self.src_file = src_file
+        self.text = text or {}
+        self.complib = complib
+        self.complevel = complevel
+        self.n_events = 0
+
+        if key in store:
+            store.remove(key)
+
+
+    def write_chunk(self, data_chunk):
+        n_chunk = len(data_chunk)
+        data_chunk.index = pd.RangeIndex(self.n_events, self.n_events + n_chunk)
+        self.store.append(
+            self.key, data_chunk, format='table', index=False,
+            complib=self.complib, complevel=self.complevel)
+        self.n_events += n_chunk
+
+
+    def close(self):
+        if self.key not in self.store:
+            return
+
+        attrs = self.store.get_storer(self.key).attrs
+        for name, value in source_state(self.src_file).items():
+            setattr(attrs, name, value)
+        attrs.fcs_keywords = {
+            key: str(value) for key, value in self.text.items() if key.startswith('$')}
+        attrs.complete = True
+
+
+class HDFStoreWriter(object):
+    """Instantiates an HDFStoreWriter for a batch of fcs files.
+
+    Usage:
+        with HDFStoreWriter('batch.h5', complib='blosc:zstd') as open_writer:
+            batch_export_data(..., open_writer=open_writer)
+    """
+
+    shared_output = True
+
+    def __init__(self, filepath, complib='blosc:lz4', complevel=5):
+        """Initialize HDFStoreWriter. Existing store files are opened in append
+        mode.
+
+        Args:
+            filepath: HDF5 store filepath
+            complib: blosc:lz4, blosc:zstd, blosc, zlib, lzo or bzip2
+            complevel: compression level 0 - 9
+        """
+
+        if complib not in HDF5_CODECS:
+            raise ValueError('Unknown HDF5 compression: {}'.format(complib))
+
+        self.filepath = filepath
+        self.complib = complib
+        self.complevel = complevel
+        self.store = pd.HDFStore(filepath, mode='a')
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __stored_src(self, key):
+        if key not in self.store:
+            return None
+        return getattr(self.store.get_storer(key).attrs, 'src_file', None)
+
+
+    def key(self, fcs, data_desc):
+        """Table key for fcs data set. A key already used by a different
+        source file (group names only differ in replaced characters) is
+        extended with a path hash.
+        """
+
+        key = store_key(fcs, data_desc)
+        stored_src = self.__stored_src(key)
+        if stored_src is not None and stored_src != fcs.filepath:
+            key = store_key(fcs, data_desc, path_hash=True)
+        return key
+
+
+    def exists(self, fcs, data_desc):
+        """True if data set for fcs file was completely written to store and
+        the source file is unchanged: size and mtime match or, when only mtime
+        changed, the content fingerprint matches.
+        """
+
+        key = self.key(fcs, data_desc)
+        if key not in self.store:
+            return False
+        attrs = self.store.get_storer(key).attrs
+        if not getattr(attrs, 'complete', False):
+            return False
+        if getattr(attrs, 'src_file', None) != fcs.filepath:
+            return False
+
+        stat = os.stat(fcs.filepath)
+        if getattr(attrs, 'src_size', None) != stat.st_size:
+            return False
+        if getattr(attrs, 'src_mtime_ns', None) == stat.st_mtime_ns:
+            return True
+        fingerprint = file_fingerprint(fcs.filepath, stat.st_size)
+        return getattr(attrs, 'src_fingerprint', None) == fingerprint
+
+
+    def __call__(self, fcs, data_desc, par_names):
+        """Opens table writer for one data set of an fcs file."""
+
+        return HDFStoreTableWriter(
+            self.store, self.key(fcs, data_desc), fcs.filepath, fcs.text,
+            self.complib, self.complevel)
+
+
+    def close(self):
+        self.store.close()
+
+
+# ------------------------------------------------------------------------------
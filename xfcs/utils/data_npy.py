@@ -0,0 +1,113 @@
+"""
+Memory-mappable NumPy data set writer.
+
+Each data set is written as one 2D .npy array (events x channels) with a json
+sidecar holding channel names, column dtypes, fcs spec fields and $ keywords.
+The .npy file is preallocated with np.lib.format.open_memmap and filled chunk
+by chunk, exported data sets open instantly with:
+
+    values = np.load('sample_channel.npy', mmap_mode='r')
+"""
+
+import json
+
+import numpy as np
+# ------------------------------------------------------------------------------
+def sidecar_path(filepath):
+    return filepath.rsplit('.', 1)[0] + '.json'
+
+
+def shrink_npy(filepath, n_rows):
+    """Reduce first dimension of a C order .npy file in place. The header is
+    rewritten with the same length so the data offset does not change.
+    """
+
+    with open(filepath, 'r+b') as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+        data_offset = npy_file.tell()
+
+        shape = (n_rows,) + tuple(shape[1:])
+        header = "{{'descr': {!r}, 'fortran_order': {}, 'shape': {}, }}".format(
+            np.lib.format.dtype_to_descr(dtype), fortran_order, shape)
+        prefix_len = len(np.lib.format.magic(*version)) + (2 if version == (1, 0) else 4)
+        header = header.ljust(data_offset - prefix_len - 1) + '\n'
+
+        npy_file.seek(prefix_len)
+        npy_file.write(header.encode('latin1'))
+        npy_file.truncate(data_offset + int(np.prod(shape)) * dtype.itemsize)
+
+
+class NpyDataWriter(object):
+    """Instantiates a NpyDataWriter object.
+
+    Public Methods:
+        write_chunk: Copy DataFrame chunk into preallocated array.
+        close: Flush array, write json sidecar.
+    """
+
+    def __init__(self, filepath, n_events, text=None, spec=None, src_file=''):
+        """Initialize NpyDataWriter. The .npy file is allocated on first chunk
+        when the number of channels and common dtype are known.
+
+        Args:
+            filepath: output .npy filepath
+            n_events: number of events in data set
+            text: optional fcs text section dict, $ keywords are stored in sidecar
+            spec: optional fcs spec namedtuple stored in sidecar
+            src_file: source fcs filepath stored in sidecar
+        """
+
+        self.filepath = filepath
+        self.n_rows = n_events
+        self.n_events = 0
+        self._keywords = {
+            key: str(value) for key, value in (text or {}).items() if key.startswith('$')}
+        self._spec = spec._asdict() if spec is not None else {}
+        self._src_file = src_file
+        self._columns = None
+        self._values = None
+
+
+    def write_chunk(self, data_chunk):
+        if self._values is None:
+            self._columns = [(str(name), str(dtype)) for name, dtype in data_chunk.dtypes.items()]
+            dtype = np.result_type(*data_chunk.dtypes)
+            self._values = np.lib.format.open_memmap(
+                self.filepath, mode='w+', dtype=dtype, shape=(self.n_rows, data_chunk.shape[1]))
+
+        n_chunk = len(data_chunk)
+        if self.n_events + n_chunk > self.n_rows:
+            raise ValueError('{} exceeds {} preallocated events.'.format(self.filepath, self.n_rows))
+
+        self._values[self.n_events:self.n_events + n_chunk] = data_chunk.to_numpy()
+        self.n_events += n_chunk
+
+
+    def close(self):
+        if self._values is None:
+            return
+
+        dtype, n_channels = self._values.dtype, self._values.shape[1]
+        self._values.flush()
+        self._values = None
+        if self.n_events < self.n_rows:
+            shrink_npy(self.filepath, self.n_events)
+
+        sidecar = {
+            'src_file': self._src_file,
+            'shape': [self.n_events, n_channels],
+            'dtype': str(dtype),
+            'channels': [name for name, _ in self._columns],
+            'column_dtypes': dict(self._columns),
+            'spec': self._spec,
+            'keywords': self._keywords}
+
+        with open(sidecar_path(self.filepath), 'w') as json_file:
+            json.dump(sidecar, json_file, indent=2, default=str)
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,88 @@
+"""
+Parquet data set writer - requires pyarrow.
+
+Each chunk of events is written as one or more row groups, so a data set is
+never held in memory as one DataFrame. Column dtypes are taken from the first
+chunk, fcs $ keywords are stored as Parquet key-value metadata.
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    STATUS = ''
+    PARQUET = True
+
+except ImportError as e:
+    STATUS = e
+    PARQUET = False
+
+# ------------------------------------------------------------------------------
+PARQUET_CODECS = ('zstd', 'snappy', 'gzip', 'none')
+ROW_GROUP_SIZE = 2**18
+
+
+def keyword_metadata(text):
+    """Parquet key-value metadata for all fcs text section $ keywords."""
+
+    return {
+        key.encode('utf-8'): str(value).encode('utf-8')
+        for key, value in text.items() if key.startswith('$')}
+
+
+class ParquetDataWriter(object):
+    """Instantiates a ParquetDataWriter object.
+
+    Public Methods:
+        write_chunk: Append DataFrame chunk as row group(s).
+        close: Write Parquet footer and close file.
+    """
+
+    def __init__(self, filepath, text=None, compression='zstd', row_group_size=ROW_GROUP_SIZE):
+        """Initialize ParquetDataWriter. Parquet file is created on first chunk.
+
+        Args:
+            filepath: output .parquet filepath
+            text: optional fcs text section dict, $ keywords are stored as
+                key-value metadata
+            compression: zstd, snappy, gzip or none
+            row_group_size: maximum number of events per row group
+        """
+
+        if not PARQUET:
+            raise ImportError('{} - Parquet output requires pyarrow.'.format(STATUS))
+
+        if compression not in PARQUET_CODECS:
+            raise ValueError('Unknown Parquet compression: {}'.format(compression))
+
+        self.filepath = filepath
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.n_events = 0
+        self._metadata = keyword_metadata(text or {})
+        self._schema = None
+        self._writer = None
+
+
+    def write_chunk(self, data_chunk):
+        """Append DataFrame chunk. Chunks are cast to the first chunk schema."""
+
+        table = pa.Table.from_pandas(data_chunk, preserve_index=False)
+        if self._writer is None:
+            schema_metadata = dict(table.schema.metadata or {})
+            schema_metadata.update(self._metadata)
+            self._schema = table.schema.with_metadata(schema_metadata)
+            self._writer = pq.ParquetWriter(
+                self.filepath, self._schema, compression=self.compression)
+
+        table = table.cast(self._schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.n_events += table.num_rows
+
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,126 @@
+"""
+Stream one data set to stdout while fcs files are decoded.
+
+    arrow: Arrow IPC stream, one record batch per chunk - requires pyarrow
+    csv: header once, rows appended per chunk
+
+All fcs files of a batch are written to the same stream and must share the
+same columns. Consumers can process the first batch before the last chunk is
+read, e.g.
+    xfcs data --channel --stdout | python -c "import pyarrow as pa, sys; ..."
+"""
+
+import sys
+
+from xfcs.utils.data_csv import CSVDataWriter
+
+try:
+    import pyarrow as pa
+    STATUS = ''
+    ARROW = True
+
+except ImportError as e:
+    STATUS = e
+    ARROW = False
+
+# ------------------------------------------------------------------------------
+STDOUT_FORMATS = ('arrow', 'csv')
+
+
+class ArrowStreamWriter(object):
+    """Writes DataFrame chunks as record batches of one Arrow IPC stream."""
+
+    def __init__(self, sink):
+        if not ARROW:
+            raise ImportError('{} - Arrow output requires pyarrow.'.format(STATUS))
+
+        self.sink = sink
+        self.n_events = 0
+        self._schema = None
+        self._writer = None
+
+
+    def write_chunk(self, data_chunk):
+        batch = pa.RecordBatch.from_pandas(data_chunk, preserve_index=False)
+        if self._writer is None:
+            self._schema = batch.schema
+            self._writer = pa.ipc.new_stream(self.sink, self._schema)
+
+        self._writer.write_batch(batch.cast(self._schema))
+        self.sink.flush()
+        self.n_events += batch.num_rows
+
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.sink.flush()
+
+
+class StdoutDataSet(object):
+    """Per fcs file handle on a shared stdout stream. Closing the handle keeps
+    the stream open for the next fcs file.
+    """
+
+    def __init__(self, stream_writer, columns):
+        self.stream_writer = stream_writer
+        self.columns = columns
+
+    def write_chunk(self, data_chunk):
+        columns = [str(name) for name in data_chunk.columns]
+        if self.columns is None:
+            self.columns = self.stream_writer.columns = columns
+        elif columns != self.columns:
+            raise ValueError('Columns differ from first file in stdout stream.')
+        self.stream_writer.writer.write_chunk(data_chunk)
+
+    def close(self):
+        pass
+
+
+class StdoutDataWriter(object):
+    """Instantiates a StdoutDataWriter for a batch of fcs files.
+
+    Usage:
+        with StdoutDataWriter('arrow') as open_writer:
+            batch_export_data(..., open_writer=open_writer)
+    """
+
+    shared_output = True
+
+    def __init__(self, stdout_format='arrow', float_format=None):
+        """Initialize StdoutDataWriter.
+
+        Args:
+            stdout_format: arrow or csv
+            float_format: optional format for csv float columns
+        """
+
+        if stdout_format not in STDOUT_FORMATS:
+            raise ValueError('Unknown stdout format: {}'.format(stdout_format))
+
+        self.columns = None
+        self._stdout = sys.stdout
+        if stdout_format == 'arrow':
+            self.writer = ArrowStreamWriter(self._stdout.buffer)
+        else:
+            self.writer = CSVDataWriter(self._stdout, float_format)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __call__(self, fcs, data_desc, par_names):
+        return StdoutDataSet(self, self.columns)
+
+
+    def close(self):
+        self.writer.close()
+
+
+# ------------------------------------------------------------------------------
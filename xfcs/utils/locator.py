@@ -1,24 +1,164 @@
-"""File specific locators"""
+"""File specific locators
 
-import glob
+Directories are listed with os.scandir, file type checks use the DirEntry
+d_type and each fcs file is stat'ed at most once (only when recency is
+needed). Hidden files and directories are skipped and symlinked directories
+are not followed.
+
+Include / exclude patterns are fnmatch patterns tested against the path
+relative to the search root and the basename. Exclude patterns also prune
+matching directories.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+import heapq
 import os
 # ------------------------------------------------------------------------------
-def locate_fcs_files(recursive=False):
+def is_fcs_name(name):
+    return name.lower().endswith('.fcs') and not name.startswith('.')
+
+
+def search_options(args):
+    """Directory search keyword arguments from parsed command line args."""
+
+    return {
+        'include': getattr(args, 'include', None) or (),
+        'exclude': getattr(args, 'exclude', None) or (),
+        'max_depth': getattr(args, 'max_depth', None),
+        'threads': getattr(args, 'walk_threads', 1)}
+
+
+def matches_any(rel_path, name, patterns):
+    return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def scan_dir(dirpath, rel_dir, include, exclude, with_ctime):
+    """List one directory.
+
+    Returns:
+        files: list of (path, ctime or None)
+        sub_dirs: list of (dirpath, relative dirpath)
+    """
+
+    files, sub_dirs = [], []
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if exclude and matches_any(rel_path, entry.name, exclude):
+                    continue
+
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append((entry.path, rel_path))
+                elif is_fcs_name(entry.name) and entry.is_file():
+                    if include and not matches_any(rel_path, entry.name, include):
+                        continue
+                    ctime = entry.stat().st_ctime if with_ctime else None
+                    files.append((entry.path, ctime))
+    except OSError:
+        pass
+    return files, sub_dirs
+
+
+def walk_fcs_files(root=os.curdir, recursive=False, include=(), exclude=(), max_depth=None,
+                   threads=1, with_ctime=False):
+    """Single pass search for fcs files below root.
+
+    Args:
+        root: search directory
+        recursive: bool - include sub directories
+        include: fnmatch patterns, only matching fcs files are returned
+        exclude: fnmatch patterns for skipped files and directories
+        max_depth: optional sub directory depth limit when recursive
+        threads: number of threads listing sub directories concurrently
+        with_ctime: bool - stat files and return ctime
+
+    Returns:
+        list of (path, ctime or None), unordered
+    """
+
+    if not recursive:
+        max_depth = 0
+    found = []
+    scan = lambda dirpath, rel_dir: scan_dir(dirpath, rel_dir, include, exclude, with_ctime)
+
+    def expand(sub_dirs, depth):
+        if max_depth is not None and depth >= max_depth:
+            return []
+        return [(dirpath, rel_dir, depth + 1) for dirpath, rel_dir in sub_dirs]
+
+    if threads <= 1:
+        pending = [(root, '', 0)]
+        while pending:
+            dirpath, rel_dir, depth = pending.pop()
+            files, sub_dirs = scan(dirpath, rel_dir)
+            found.extend(files)
+            pending.extend(expand(sub_dirs, depth))
+        return found
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        running = {executor.submit(scan, root, ''): 0}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = running.pop(future)
+                files, sub_dirs = future.result()
+                found.extend(files)
+                for dirpath, rel_dir, sub_depth in expand(sub_dirs, depth):
+                    running[executor.submit(scan, dirpath, rel_dir)] = sub_depth
+    return found
+
+
+def display_path(path, recursive):
+    """Path format of previous glob search: name in current directory,
+    ./sub/name when recursive.
+    """
+
+    if recursive:
+        return path
+    return os.path.basename(path)
+
+
+def sorted_by_name(found, recursive):
+    paths = [display_path(path, recursive) for path, _ in found]
+    paths.sort(key=lambda fp: (os.path.basename(fp), fp))
+    return paths
+
+
+def locate_fcs_files(recursive=False, include=(), exclude=(), max_depth=None, threads=1):
     """Returns sorted from oldest -> most recent if name format uses date.
 
     Arg:
         recursive: enable recursive directory search
+        include, exclude, max_depth, threads: see walk_fcs_files
 
     Returns:
         sorted list of fcs filepaths
 
     """
 
-    glob_loc = '[!.]*.fcs'
-    if recursive:
-        rec_loc_path = os.path.join(os.curdir, '**', glob_loc)
-        glob_loc = rec_loc_path
+    found = walk_fcs_files(os.curdir, recursive, include, exclude, max_depth, threads)
+    return sorted_by_name(found, recursive)
 
-    found = glob.glob(glob_loc, recursive=recursive)
-    found.sort(key=lambda fp: os.path.basename(fp))
-    return found
+
+def locate_recent_fcs_files(limit, recursive=False, include=(), exclude=(), max_depth=None,
+                            threads=1):
+    """Selects the limit most recent fcs files by ctime with a heap. ctime is
+        read from the directory walk stat results.
+
+    Returns:
+        fcs filepaths: limit most recent sorted by ctime in ascending order or,
+            if ctime is unavailable or identical, all files sorted by name.
+        sort_confirmed: bool - paths are sorted and limited by ctime.
+    """
+
+    found = walk_fcs_files(os.curdir, recursive, include, exclude, max_depth, threads, True)
+    ctimes = set(ctime for _, ctime in found)
+    if not all(ctimes) or len(ctimes) <= 1:
+        return sorted_by_name(found, recursive), False
+
+    recent = heapq.nlargest(limit, found, key=lambda item: item[1])
+    return [display_path(path, recursive) for path, _ in reversed(recent)], True
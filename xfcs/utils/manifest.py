@@ -0,0 +1,121 @@
+"""
+Incremental export manifest.
+
+One json line is appended per exported fcs file once all of its outputs are
+written, so an interrupted batch keeps every completed entry. Entries record:
+    path, size, mtime_ns, fingerprint, options, outputs
+
+A file is up to date if its entry was written with the same export options,
+all outputs still exist and either size and mtime match or, when only mtime
+changed (copied / touched files), the content fingerprint matches.
+"""
+
+import hashlib
+import json
+import os
+# ------------------------------------------------------------------------------
+MANIFEST_NAME = 'xfcs_data_manifest.jsonl'
+FINGERPRINT_BLOCK = 2**20
+
+
+def file_fingerprint(filepath, size=None):
+    """Content fingerprint from file size and the whole file. Only computed
+    when an entry is recorded or when mtime changed with size unchanged.
+    """
+
+    if size is None:
+        size = os.path.getsize(filepath)
+
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    with open(filepath, 'rb') as fcs_file:
+        for block in iter(lambda: fcs_file.read(FINGERPRINT_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExportManifest(object):
+    """Instantiates an ExportManifest object.
+
+    Public Methods:
+        is_current: True if fcs file was exported with the same options and is
+            unchanged.
+        record: Append entry for exported fcs file.
+        close: Close manifest file.
+    """
+
+    def __init__(self, filepath, options):
+        """Initialize ExportManifest. Existing entries are loaded and the
+        manifest is compacted to one line per fcs file.
+
+        Args:
+            filepath: manifest .jsonl filepath
+            options: dict of export options, json serializable
+        """
+
+        self.filepath = filepath
+        self.options = json.loads(json.dumps(options))
+        self.entries = {}
+
+        if os.path.exists(filepath):
+            with open(filepath, 'r') as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry['path']] = entry
+
+            tmp_path = filepath + '.tmp'
+            with open(tmp_path, 'w') as manifest:
+                for entry in self.entries.values():
+                    manifest.write(json.dumps(entry) + '\n')
+            os.replace(tmp_path, filepath)
+
+        self._manifest = open(filepath, 'a')
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def is_current(self, filepath):
+        entry = self.entries.get(os.path.abspath(filepath))
+        if not entry or entry['options'] != self.options:
+            return False
+
+        if not all(os.path.exists(output) for output in entry['outputs']):
+            return False
+
+        stat = os.stat(filepath)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        return file_fingerprint(filepath, stat.st_size) == entry['fingerprint']
+
+
+    def record(self, filepath, outputs=()):
+        """Append entry for fcs file, written and flushed immediately."""
+
+        stat = os.stat(filepath)
+        entry = {
+            'path': os.path.abspath(filepath),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'fingerprint': file_fingerprint(filepath, stat.st_size),
+            'options': self.options,
+            'outputs': [os.path.abspath(output) for output in outputs]}
+
+        self.entries[entry['path']] = entry
+        self._manifest.write(json.dumps(entry) + '\n')
+        self._manifest.flush()
+
+
+    def close(self):
+        self._manifest.close()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,194 @@
+"""
+Streaming append for tidy (row per fcs file) metadata csv files.
+
+Row fingerprints of the master csv are kept in a sidecar file next to it:
+    <master.csv>.fingerprints
+
+Sidecar lines are either a row fingerprint or a json state record with the
+column signature, master size, mtime and the sort key of the last row. The
+last state record must match the master csv, otherwise the sidecar is rebuilt
+with one pass over the master rows. New rows are checked against the
+fingerprints and appended to the end of the master csv without reading or
+rewriting existing rows.
+"""
+
+import csv
+import hashlib
+import json
+import os
+
+from xfcs.utils.metadata_time import keyword_timestamp
+# ------------------------------------------------------------------------------
+SIDECAR_EXT = '.fingerprints'
+SRC_KEYS = ('CSV_CREATED', 'SRC_DIR', 'SRC_FILE')
+
+
+def render_value(value):
+    """Value as written by csv.writer."""
+    return '' if value is None else str(value)
+
+
+def row_fingerprint(columns, values):
+    """Fingerprint of one metadata row, source keys are excluded."""
+
+    digest = hashlib.blake2b(digest_size=16)
+    for key, value in zip(columns, values):
+        if key not in SRC_KEYS:
+            digest.update('{}\x1e{}\x1f'.format(key, value).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def columns_signature(columns):
+    return hashlib.blake2b('\x1f'.join(columns).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def row_order_key(columns, values):
+    """Sort key matching append_metadata: $DATE, $BTIM / $ETIM timestamp if
+    $DATE is a column, otherwise SRC_FILE name. None if timestamp is
+    unavailable.
+    """
+
+    row = dict(zip(columns, values))
+    if '$DATE' in row:
+        return keyword_timestamp(row['$DATE'], row.get('$ETIM', ''), row.get('$BTIM', ''))
+    return row.get('SRC_FILE', '')
+
+
+class TidyMetadataAppender(object):
+    """Instantiates a TidyMetadataAppender for an existing master csv.
+
+    Public Attributes:
+        columns: master csv header
+
+    Public Methods:
+        is_tidy: True if master header shares keywords with new fcs files.
+        append: Append unique fcs metadata rows or None if rows cannot be
+            appended in order.
+    """
+
+    def __init__(self, master_csv):
+        self.master_csv = master_csv
+        self.sidecar = master_csv + SIDECAR_EXT
+        with open(master_csv, 'r') as csv_file:
+            self.columns = next(csv.reader(csv_file), [])
+
+        self._signature = columns_signature(self.columns)
+        self._fingerprints = None
+        self._last_key = None
+        self._n_rows = 0
+
+
+    def is_tidy(self, meta_keys):
+        return len(set(self.columns) & set(meta_keys)) > 1
+
+
+    def __master_state(self):
+        stat = os.stat(self.master_csv)
+        return {'columns': self._signature, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'last_key': self._last_key, 'n_rows': self._n_rows}
+
+
+    def __load_sidecar(self):
+        if not os.path.exists(self.sidecar):
+            return False
+
+        fingerprints, state = set(), None
+        with open(self.sidecar, 'r') as sidecar:
+            for line in sidecar:
+                line = line.strip()
+                if line.startswith('{'):
+                    state = json.loads(line)
+                elif line:
+                    fingerprints.add(line)
+
+        if not state:
+            return False
+
+        stat = os.stat(self.master_csv)
+        current = (state['columns'], state['size'], state['mtime_ns'])
+        if current != (self._signature, stat.st_size, stat.st_mtime_ns):
+            return False
+
+        self._fingerprints = fingerprints
+        self._last_key = state['last_key']
+        self._n_rows = state['n_rows']
+        return True
+
+
+    def __rebuild_sidecar(self):
+        """One pass over master rows, constant memory apart from fingerprints."""
+
+        self._fingerprints = set()
+        self._last_key = None
+        self._n_rows = 0
+        with open(self.master_csv, 'r') as csv_file, open(self.sidecar, 'w') as sidecar:
+            reader = csv.reader(csv_file)
+            next(reader, None)
+            values = None
+            for values in reader:
+                fingerprint = row_fingerprint(self.columns, values)
+                self._fingerprints.add(fingerprint)
+                sidecar.write(fingerprint + '\n')
+                self._n_rows += 1
+            if values is not None:
+                self._last_key = row_order_key(self.columns, values)
+            sidecar.write(json.dumps(self.__master_state()) + '\n')
+
+
+    def load_fingerprints(self):
+        if not self.__load_sidecar():
+            self.__rebuild_sidecar()
+
+
+    def append(self, fcs_objs):
+        """Append rows for fcs files not yet in master csv. New rows are sorted
+        and must not sort before the last master row.
+
+        Args:
+            fcs_objs: iterable of loaded FCSFile instances.
+
+        Returns:
+            number of rows appended or None if a full rewrite is required.
+        """
+
+        if self._fingerprints is None:
+            self.load_fingerprints()
+
+        rows, batch_fingerprints = [], set()
+        for fcs in fcs_objs:
+            values = [render_value(fcs.param(key)) for key in self.columns]
+            fingerprint = row_fingerprint(self.columns, values)
+            if fingerprint in self._fingerprints or fingerprint in batch_fingerprints:
+                continue
+            batch_fingerprints.add(fingerprint)
+            rows.append((row_order_key(self.columns, values), fingerprint, values))
+
+        if not rows:
+            return 0
+
+        if any(order_key is None for order_key, _, _ in rows):
+            return None
+        if self._n_rows and self._last_key is None:
+            return None
+
+        rows.sort(key=lambda row: row[0])
+        if self._n_rows and rows[0][0] < self._last_key:
+            return None
+
+        with open(self.master_csv, 'a') as csv_file:
+            writer = csv.writer(csv_file, dialect='excel')
+            for _, _, values in rows:
+                writer.writerow(values)
+
+        self._fingerprints.update(batch_fingerprints)
+        self._last_key = rows[-1][0]
+        self._n_rows += len(rows)
+        with open(self.sidecar, 'a') as sidecar:
+            for _, fingerprint, _ in rows:
+                sidecar.write(fingerprint + '\n')
+            sidecar.write(json.dumps(self.__master_state()) + '\n')
+
+        return len(rows)
+
+
+# ------------------------------------------------------------------------------
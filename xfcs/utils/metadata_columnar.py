@@ -0,0 +1,227 @@
+"""
+Typed columnar metadata export (Parquet / SQLite).
+
+One row per fcs file. Each keyword column is typed from its values: integer
+if all values are int, real if all values are numeric, text otherwise. Files
+without the keyword store null. With channels enabled, $PnX keywords are
+pivoted to a channel table, one row per file per channel with one column per
+$PxX attribute, linked to the file table by FILE_ID.
+
+    parquet: <name>.parquet (+ <name>_channels.parquet), requires pyarrow
+    sqlite: tables fcs_metadata (+ fcs_channels) in <name>.sqlite
+"""
+
+from collections import OrderedDict
+import re
+import sqlite3
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    STATUS = ''
+    PARQUET = True
+
+except ImportError as e:
+    STATUS = e
+    PARQUET = False
+
+# ------------------------------------------------------------------------------
+EXPORT_FORMATS = ('csv', 'parquet', 'sqlite')
+FILE_TABLE = 'fcs_metadata'
+CHANNEL_TABLE = 'fcs_channels'
+CHANNEL_KEY = re.compile(r'^\$P(?P<channel>\d+)(?P<attr>[A-Z]+)$')
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+PA_TYPES = {'INTEGER': 'int64', 'REAL': 'float64', 'TEXT': 'string'}
+
+
+def column_type(values):
+    """SQL type of one keyword column: INTEGER, REAL or TEXT. None values are
+    ignored, an all None column is TEXT.
+    """
+
+    col_type = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return 'TEXT'
+        if isinstance(value, float) or not INT64_MIN <= value <= INT64_MAX:
+            col_type = 'REAL'
+        elif col_type is None:
+            col_type = 'INTEGER'
+    return col_type or 'TEXT'
+
+
+def typed_values(values, col_type):
+    if col_type == 'TEXT':
+        return [None if value is None else str(value) for value in values]
+    if col_type == 'REAL':
+        return [None if value is None else float(value) for value in values]
+    return values
+
+
+def split_channel_keys(meta_keys):
+    """Separates $PnX channel keywords.
+
+    Returns:
+        file_keys: list of non channel keywords
+        channel_keys: dict of (channel number, attribute) -> keyword
+    """
+
+    file_keys, channel_keys = [], {}
+    for key in meta_keys:
+        match = CHANNEL_KEY.match(key)
+        if match:
+            channel_keys[int(match.group('channel')), match.group('attr')] = key
+        else:
+            file_keys.append(key)
+    return file_keys, channel_keys
+
+
+def keyword_column(fcs_objs, key):
+    return [fcs.param(key) if fcs.has_param(key) else None for fcs in fcs_objs]
+
+
+def file_columns(fcs_objs, meta_keys):
+    """Typed file table columns, FILE_ID followed by meta_keys.
+
+    Returns:
+        OrderedDict of column name -> (sql type, list of values)
+    """
+
+    columns = OrderedDict()
+    columns['FILE_ID'] = ('INTEGER', list(range(1, len(fcs_objs) + 1)))
+    for key in meta_keys:
+        values = keyword_column(fcs_objs, key)
+        col_type = column_type(values)
+        columns[key] = (col_type, typed_values(values, col_type))
+    return columns
+
+
+def channel_columns(fcs_objs, channel_keys):
+    """Typed channel table columns: FILE_ID, SRC_FILE, CHANNEL and one $PxX
+    column per channel attribute. A file has a row for channel n if any $PnX
+    keyword is present.
+
+    Returns:
+        OrderedDict of column name -> (sql type, list of values)
+    """
+
+    channels = sorted(set(n for n, _ in channel_keys))
+    attrs = sorted(set(attr for _, attr in channel_keys))
+    rows = []
+    for file_id, fcs in enumerate(fcs_objs, 1):
+        for n in channels:
+            keys = [channel_keys.get((n, attr)) for attr in attrs]
+            values = [fcs.param(key) if key and fcs.has_param(key) else None for key in keys]
+            if any(value is not None for value in values):
+                rows.append([file_id, fcs.param('SRC_FILE'), n] + values)
+
+    names = ['FILE_ID', 'SRC_FILE', 'CHANNEL'] + ['$Px{}'.format(attr) for attr in attrs]
+    columns = OrderedDict()
+    for name, values in zip(names, zip(*rows) if rows else [()] * len(names)):
+        col_type = column_type(values)
+        columns[name] = (col_type, typed_values(values, col_type))
+    return columns
+
+
+def metadata_tables(fcs_objs, meta_keys, channels=False):
+    """Typed file table and, if channels, pivoted $PnX channel table.
+
+    Args:
+        fcs_objs: list of MetadataRow or loaded FCSFile instances.
+        meta_keys: iterable of fcs metadata Parameter keys to use.
+        channels: bool - pivot $PnX keywords to channel table.
+
+    Returns:
+        OrderedDict of table name -> columns
+    """
+
+    fcs_objs = list(fcs_objs)
+    tables = OrderedDict()
+    if channels:
+        file_keys, channel_keys = split_channel_keys(meta_keys)
+        tables[FILE_TABLE] = file_columns(fcs_objs, file_keys)
+        tables[CHANNEL_TABLE] = channel_columns(fcs_objs, channel_keys)
+    else:
+        tables[FILE_TABLE] = file_columns(fcs_objs, meta_keys)
+    return tables
+
+
+# ------------------------------------------------------------------------------
+def quote_name(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def write_sqlite(tables, db_fn):
+    """Writes each table to sqlite database, existing tables are replaced.
+
+    Returns:
+        list of filepaths written
+    """
+
+    db = sqlite3.connect(db_fn)
+    try:
+        for table_name, columns in tables.items():
+            table = quote_name(table_name)
+            col_defs = ', '.join(
+                '{} {}'.format(quote_name(name), col_type)
+                for name, (col_type, _) in columns.items())
+            db.execute('DROP TABLE IF EXISTS {}'.format(table))
+            db.execute('CREATE TABLE {} ({})'.format(table, col_defs))
+
+            insert = 'INSERT INTO {} VALUES ({})'.format(table, ', '.join('?' * len(columns)))
+            db.executemany(insert, zip(*(values for _, values in columns.values())))
+            if table_name == CHANNEL_TABLE:
+                db.execute('CREATE INDEX {} ON {} (FILE_ID)'.format(
+                    quote_name(table_name + '_file_id'), table))
+        db.commit()
+    finally:
+        db.close()
+    return [db_fn]
+
+
+def channel_table_path(parquet_fn):
+    return parquet_fn.rsplit('.', 1)[0] + '_channels.parquet'
+
+
+def write_parquet(tables, parquet_fn, compression='zstd'):
+    """Writes file table to parquet_fn and channel table, if present, to
+    <name>_channels.parquet. Requires pyarrow.
+
+    Returns:
+        list of filepaths written
+    """
+
+    paths = []
+    for table_name, columns in tables.items():
+        arrays = [pa.array(values, type=pa.type_for_alias(PA_TYPES[col_type]))
+                  for col_type, values in columns.values()]
+        table = pa.Table.from_arrays(arrays, names=list(columns))
+        path = parquet_fn if table_name == FILE_TABLE else channel_table_path(parquet_fn)
+        pq.write_table(table, path, compression=compression)
+        paths.append(path)
+    return paths
+
+
+def write_file(fcs_objs, meta_keys, out_fn, out_format, channels=False):
+    """Typed metadata export in parquet or sqlite out_format.
+
+    Args:
+        fcs_objs: iterable of MetadataRow or loaded FCSFile instances.
+        meta_keys: iterable of fcs metadata Parameter keys to use.
+        out_fn: filepath/name for parquet or sqlite file.
+        out_format: 'parquet' or 'sqlite'
+        channels: bool - pivot $PnX keywords to channel table.
+
+    Returns:
+        list of filepaths written
+    """
+
+    tables = metadata_tables(fcs_objs, meta_keys, channels)
+    if out_format == 'parquet':
+        return write_parquet(tables, out_fn)
+    return write_sqlite(tables, out_fn)
+
+
+# ------------------------------------------------------------------------------
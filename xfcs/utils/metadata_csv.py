@@ -1,7 +1,11 @@
 
 import csv
+import os
 
 # ------------------------------------------------------------------------------
+SRC_PATH_KEYS = ('SRC_DIR', 'SRC_FILE')
+
+
 def write_tidy_csv(writer, fcs_objs, meta_keys):
     """Writes tidy / long csv format file.
 
@@ -88,4 +92,28 @@ def read_file(master_csv, meta_keys):
     return merge_keys, merge_data, is_tidy
 
 
+def read_source_paths(master_csv):
+    """Source fcs filepaths (SRC_DIR / SRC_FILE) listed in a tidy or wide
+    metadata csv file. Tidy files are read one row at a time.
+
+    Returns:
+        list of fcs filepaths
+    """
+
+    with open(master_csv, 'r') as metadata_csv:
+        meta_reader = csv.reader(metadata_csv)
+        header = next(meta_reader, [])
+        if 'SRC_DIR' in header and 'SRC_FILE' in header:
+            dir_ix, file_ix = header.index('SRC_DIR'), header.index('SRC_FILE')
+            return [os.path.join(row[dir_ix], row[file_ix])
+                    for row in meta_reader if len(row) > max(dir_ix, file_ix)]
+
+        key_rows = {row[0]: row[1:] for row in meta_reader if row and row[0] in SRC_PATH_KEYS}
+        if header and header[0] in SRC_PATH_KEYS:
+            key_rows[header[0]] = header[1:]
+
+    src_dirs, src_files = key_rows.get('SRC_DIR', []), key_rows.get('SRC_FILE', [])
+    return [os.path.join(src_dir, src_file) for src_dir, src_file in zip(src_dirs, src_files)]
+
+
 # ------------------------------------------------------------------------------
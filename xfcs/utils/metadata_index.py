@@ -0,0 +1,139 @@
+"""
+Persistent metadata index (sqlite3).
+
+Parsed TEXT keywords of every scanned fcs file are stored with the file path,
+size, mtime and a fingerprint of the HEADER and TEXT segment bytes. A later
+scan serves a file from the index if size and mtime match or, when only mtime
+changed, the HEADER and TEXT fingerprint matches. Only new or changed files are
+opened.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from xfcs.FCSFile.FCSFile import FCSFile
+# ------------------------------------------------------------------------------
+INDEX_NAME = 'xfcs_metadata_index.sqlite'
+COMMIT_EVERY = 1000
+HEADER_BYTES = 58
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fcs_text (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    version TEXT,
+    param_keys TEXT NOT NULL,
+    param_values TEXT NOT NULL
+)
+"""
+
+
+def text_fingerprint(filepath):
+    """Fingerprint of the HEADER and TEXT segment bytes, the only parts of the
+    file parsed for metadata. Returns None if the HEADER can not be read.
+    """
+
+    with open(filepath, 'rb') as fcs_file:
+        header = fcs_file.read(HEADER_BYTES)
+        try:
+            text_start, text_end = int(header[10:18]), int(header[18:26])
+        except ValueError:
+            return None
+        fcs_file.seek(text_start)
+        text = fcs_file.read(text_end - text_start + 1)
+
+    digest = hashlib.blake2b(header, digest_size=16)
+    digest.update(text)
+    return digest.hexdigest()
+
+
+class MetadataIndex(object):
+    """Instantiates a MetadataIndex object.
+
+    Public Methods:
+        lookup: FCSFile instance loaded from index or None if file is new or
+            changed.
+        store: Insert or replace index entry for a loaded FCSFile.
+        close: Commit and close index database.
+
+    Usage:
+        with MetadataIndex('metadata_index.sqlite') as index:
+            fcs_objs, meta_keys = load_metadata(paths, index=index)
+    """
+
+    def __init__(self, filepath=INDEX_NAME):
+        self.filepath = filepath
+        self.n_served = 0
+        self.n_stored = 0
+        self._pending = 0
+        self._db = sqlite3.connect(filepath)
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def lookup(self, filepath, quiet=False):
+        path = os.path.abspath(filepath)
+        row = self._db.execute(
+            'SELECT size, mtime_ns, fingerprint, version, param_keys, param_values '
+            'FROM fcs_text WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, fingerprint, version, param_keys, param_values = row
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return None
+
+        if stat.st_mtime_ns != mtime_ns:
+            if text_fingerprint(path) != fingerprint:
+                return None
+            self._db.execute(
+                'UPDATE fcs_text SET mtime_ns = ? WHERE path = ?', (stat.st_mtime_ns, path))
+            self.__pending()
+
+        fcs = FCSFile(quiet)
+        fcs.load_from_index(path, version, json.loads(param_keys), json.loads(param_values))
+        self.n_served += 1
+        return fcs
+
+
+    def store(self, fcs):
+        """Insert or replace entry for FCSFile loaded from fcs file. Only text
+        section keywords are stored, keys added with set_param are excluded.
+        """
+
+        path = fcs.filepath
+        stat = os.stat(path)
+        param_values = [fcs.text[key] for key in fcs.param_keys]
+        self._db.execute(
+            'INSERT OR REPLACE INTO fcs_text VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (path, stat.st_size, stat.st_mtime_ns, text_fingerprint(path),
+             fcs.version, json.dumps(fcs.param_keys), json.dumps(param_values)))
+        self.n_stored += 1
+        self.__pending()
+
+
+    def __pending(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._db.commit()
+            self._pending = 0
+
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,120 @@
+"""
+Keyword predicates for selecting scanned fcs files.
+
+Predicate format: <keyword><op><value>
+    op: == (or =), !=, >, >=, <, <=, ~ (fnmatch pattern, case insensitive)
+
+Values are typed with filter_numeric like TEXT segment values, ordering
+operators compare numeric values only. $DATE compares as a date
+(dd-mmm-yyyy) and $BTIM / $ETIM as clock times. String equality is case
+insensitive. A file without the keyword never matches.
+
+Examples:
+    '$CYT~*Fortessa*'   '$P3V>500'   '$DATE>=01-SEP-2026'   '$TOT<10000'
+"""
+
+from fnmatch import fnmatchcase
+import operator
+import re
+
+from xfcs.FCSFile.FCSFile import filter_numeric
+from xfcs.utils.metadata_time import parse_clock, parse_date
+# ------------------------------------------------------------------------------
+PREDICATE_RE = re.compile(
+    r'^\s*(?P<keyword>[^=!<>~]+?)\s*(?P<op>==|!=|>=|<=|=|>|<|~)\s*(?P<value>.*?)\s*$')
+COMPARE = {
+    '==': operator.eq, '!=': operator.ne, '>': operator.gt, '>=': operator.ge,
+    '<': operator.lt, '<=': operator.le}
+TIME_PARSERS = {'$DATE': parse_date, '$BTIM': parse_clock, '$ETIM': parse_clock}
+MISSING = object()
+
+
+class Predicate(object):
+    """Instantiates a Predicate for one keyword.
+
+    Public Attributes:
+        keyword: upper case keyword
+        op: comparison operator
+        value: operand text
+
+    Public Methods:
+        matches: True if a keyword value satisfies the predicate.
+    """
+
+    def __init__(self, keyword, op, value):
+        self.keyword = keyword.strip().upper()
+        self.op = '==' if op == '=' else op
+        self.value = value
+        self._parse = TIME_PARSERS.get(self.keyword)
+
+        if self.op == '~':
+            self._operand = value.upper()
+        elif self._parse:
+            self._operand = self._parse(value)
+            if self._operand is None:
+                raise ValueError('invalid {} value: {}'.format(self.keyword, value))
+        else:
+            self._operand = filter_numeric(value)
+
+
+    def __repr__(self):
+        return '{}{}{}'.format(self.keyword, self.op, self.value)
+
+
+    def matches(self, value):
+        if value is MISSING:
+            return False
+        if self.op == '~':
+            return fnmatchcase(str(value).upper(), self._operand)
+
+        operand = self._operand
+        if self._parse:
+            value = self._parse(value)
+            if value is None:
+                return False
+        elif not (isinstance(value, (int, float)) and isinstance(operand, (int, float))):
+            if self.op not in ('==', '!='):
+                return False
+            value, operand = str(value).upper(), self.value.upper()
+
+        return COMPARE[self.op](value, operand)
+
+
+def predicate(text):
+    """Parse one predicate string, used as argparse type.
+
+    Raises:
+        ValueError: malformed predicate.
+    """
+
+    match = PREDICATE_RE.match(text)
+    if not match:
+        raise ValueError('malformed predicate: {}'.format(text))
+    return Predicate(match.group('keyword'), match.group('op'), match.group('value'))
+
+
+def predicate_keywords(predicates):
+    return [pred.keyword for pred in predicates]
+
+
+def select_rows(fcs_objs, predicates):
+    """Files matching all predicates, one pass over the candidates per
+        predicate keyword (column).
+
+    Args:
+        fcs_objs: iterable of MetadataRow or loaded FCSFile instances.
+        predicates: iterable of Predicate instances.
+
+    Returns:
+        list of matching fcs objs in input order
+    """
+
+    selected = list(fcs_objs)
+    for pred in predicates:
+        key = pred.keyword
+        selected = [fcs for fcs in selected
+                    if pred.matches(fcs.param(key) if fcs.has_param(key) else MISSING)]
+    return selected
+
+
+# ------------------------------------------------------------------------------
@@ -1,7 +1,110 @@
-from collections import deque
+"""
+Rolling keyword statistics over time sorted fcs metadata.
+
+User keyword format: <keyword>_<STAT> or <keyword>_<STAT>_<n>
+    STAT: MEAN, STD, MIN, MAX, MEDIAN over the last n files (default 10),
+          EWMA exponentially weighted mean with span n (alpha = 2 / (n + 1)).
+
+Each source keyword is read once into a numpy array and every requested
+statistic is computed for all files in one vectorized pass. The first n - 1
+files use the available history. STD is the population standard deviation.
+"""
+
 from itertools import compress
 import re
-from statistics import mean
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ------------------------------------------------------------------------------
+ROLLING_STATS = ('MEAN', 'STD', 'MIN', 'MAX', 'MEDIAN', 'EWMA')
+DEFAULT_WINDOW = 10
+STAT_KEY = re.compile(
+    r'^(?P<param>.+)_(?P<stat>{})(?P<val>_\d+)?$'.format('|'.join(ROLLING_STATS)),
+    re.IGNORECASE)
+WINDOW_FUNCS = {
+    'MEAN': np.nanmean, 'STD': np.nanstd, 'MIN': np.nanmin, 'MAX': np.nanmax,
+    'MEDIAN': np.nanmedian}
+EWMA_BLOCK_EXP = 300.0
+
+
+def is_stat_key(key):
+    return STAT_KEY.match(key) is not None
+
+
+# ------------------------------ ROLLING STATS ---------------------------------
+
+def rolling_windows(values, window):
+    """Trailing window view, rows before the first value are NaN padded."""
+
+    padded = np.concatenate((np.full(window - 1, np.nan), values))
+    return sliding_window_view(padded, window)
+
+
+def ewma(values, span):
+    """Exponentially weighted mean, weights normalized over available history.
+
+    Computed in blocks where decay**-k stays finite:
+        num_t = decay**t * (decay * num_prev + cumsum(x_k * decay**-k))
+    """
+
+    decay = 1 - 2 / (span + 1)
+    if decay <= 0:
+        return values.copy()
+
+    result = np.empty(values.size)
+    block = max(1, int(EWMA_BLOCK_EXP / -np.log(decay)))
+    numer = 0.0
+    for start in range(0, values.size, block):
+        block_values = values[start:start + block]
+        k = np.arange(block_values.size)
+        block_numer = decay**k * (decay * numer + np.cumsum(block_values * decay**-k))
+        denom = (1 - decay**(start + k + 1)) / (1 - decay)
+        result[start:start + block] = block_numer / denom
+        numer = block_numer[-1]
+    return result
+
+
+def rolling_stat(values, stat, window):
+    """Rolling statistic for each position of values.
+
+    Args:
+        values: 1d float array ordered by acquisition time
+        stat: one of ROLLING_STATS
+        window: history length or EWMA span
+
+    Returns:
+        1d float array
+    """
+
+    if stat == 'EWMA':
+        return ewma(values, window)
+    return WINDOW_FUNCS[stat](rolling_windows(values, window), axis=1)
+
+
+def numeric_column(fcs_objs, param):
+    """Parameter values of all fcs objects as float array.
+
+    Returns:
+        values, bool - all source values are int. None if any value is missing
+        or not numeric.
+    """
+
+    column = [fcs.param(param) for fcs in fcs_objs]
+    if not all(isinstance(value, (float, int)) for value in column):
+        return None
+    int_source = all(isinstance(value, int) for value in column)
+    return np.array(column, dtype=np.float64), int_source
+
+
+def stat_values(result, int_source):
+    """Rounded python values, integral results of int keywords stay int."""
+
+    rounded = [round(value, 4) for value in result.tolist()]
+    if int_source:
+        rounded = [int(value) if value.is_integer() else value for value in rounded]
+    return rounded
+
 
 # ------------------------------- KW  STATS ------------------------------------
 
@@ -12,21 +115,22 @@ def prep_re_group(re_groupdict):
         re_groupdict: re.match.groupdict() instance.
 
     Returns:
-        parameter keyword, historic mean range, $PxN channel name
+        parameter keyword, statistic, history range, $PxN channel name
     """
 
     param_key = re_groupdict.get('param')
-    channel_name = re_groupdict.get('channel', '').strip('_').replace(' ','').upper()
+    stat = re_groupdict.get('stat').upper()
+    channel_name = (re_groupdict.get('channel') or '').strip('_').replace(' ','').upper()
     tmp_val = re_groupdict.get('val', '')
     if not tmp_val:
-        mean_range = 10
+        stat_range = DEFAULT_WINDOW
     else:
-        mean_range = int(tmp_val.strip('_'))
+        stat_range = max(int(tmp_val.strip('_')), 1)
 
-    return param_key, mean_range, channel_name
+    return param_key, stat, stat_range, channel_name
 
 
-def config_spx_mean_keys(fcs_objs, spx_keys):
+def config_spx_stat_keys(fcs_objs, spx_keys):
     """Configures keywords for $Px params.
 
     Arg:
@@ -34,15 +138,16 @@ def config_spx_mean_keys(fcs_objs, spx_keys):
         spx_keys: iterable of re.match instances
 
     Returns:
-        spx_mean_keys: iterable of configured keywords needed to add mean values
+        spx_stat_keys: iterable of configured keywords needed to add stat values
     """
 
-    spx_mean_keys = []
+    spx_stat_keys = []
 
     for spx_key in spx_keys:
-        param_key, mean_range, channel_name = prep_re_group(spx_key.groupdict())
+        param_key, stat, stat_range, channel_name = prep_re_group(spx_key.groupdict())
         attr = ''.join(a for a in param_key[3:] if a.isalpha())
         new_data_key = '$Px{}_{}'.format(attr, channel_name)
+        data_key = new_data_key
 
         for fcs in fcs_objs:
             if fcs.has_param(new_data_key):
@@ -52,81 +157,80 @@ def config_spx_mean_keys(fcs_objs, spx_keys):
                 if data_key:
                     fcs.set_param(new_data_key, fcs.param(data_key))
 
-        mean_key = '{}_MEAN_{}'.format(new_data_key, mean_range)
+        stat_key = '{}_{}_{}'.format(new_data_key, stat, stat_range)
         force_key = new_data_key
         user_key = spx_key.string
-        key_group = (data_key, force_key, mean_key, mean_range)
-        spx_mean_keys.append((user_key, key_group))
+        key_group = (data_key, force_key, stat_key, stat_range, stat)
+        spx_stat_keys.append((user_key, key_group))
 
-    return spx_mean_keys
+    return spx_stat_keys
 
 
-def config_param_mean_keys(par_keys):
+def config_param_stat_keys(par_keys):
     """Configures keywords for non-$Px params.
 
     Arg:
         par_keys: iterable of re.match instances
 
     Returns:
-        param_mean_keys: iterable of configured keywords needed to add mean values
+        param_stat_keys: iterable of configured keywords needed to add stat values
     """
 
-    param_mean_keys = []
+    param_stat_keys = []
     for par_match in par_keys:
-        data_key, mean_range, _ = prep_re_group(par_match.groupdict())
-        mean_key = par_match.string
+        data_key, stat, stat_range, _ = prep_re_group(par_match.groupdict())
+        stat_key = par_match.string
         force_key = data_key
 
         user_key = par_match.string
-        key_group = (data_key, force_key, mean_key, mean_range)
+        key_group = (data_key, force_key, stat_key, stat_range, stat)
 
-        param_mean_keys.append((user_key, key_group))
-    return param_mean_keys
+        param_stat_keys.append((user_key, key_group))
+    return param_stat_keys
 
 
-def find_mean_keys(fcs_objs, user_meta_keys):
-    """Locates any user requested mean keyword.
-    Mean keyword format examples:
-        $P8V_FL5LOG_MEAN_10, $PxV_FL5LOG_MEAN_10, $PxV_FL5LOG_MEAN
-        $TOT_MEAN_10, $TOT_MEAN
+def find_stat_keys(fcs_objs, user_meta_keys):
+    """Locates any user requested rolling statistic keyword.
+    Keyword format examples:
+        $P8V_FL5LOG_MEAN_10, $PxV_FL5LOG_STD_10, $PxV_FL5LOG_MEDIAN
+        $TOT_MEAN_10, $TOT_MAX, $TOT_EWMA_5
 
     Args:
         fcs_objs: iterable of fcs objects
         user_meta_keys: all selected metadata keywords
 
     Returns:
-        mean_keys: iterable of configured keywords needed to add mean values
+        stat_keys: iterable of configured keywords needed to add stat values
     """
 
-    spx_re = r'^(?P<param>\$P(x|\d+)\w)_(?P<channel>\w+)_MEAN(?P<val>_\d+)?$'
-    spx_mean = re.compile(spx_re, re.IGNORECASE)
-    par_mean = re.compile(r'^(?P<param>.+)_MEAN(?P<val>_\d+)?$')
+    spx_re = r'^(?P<param>\$P(x|\d+)\w)_(?P<channel>\w+)_(?P<stat>{})(?P<val>_\d+)?$'
+    spx_stat = re.compile(spx_re.format('|'.join(ROLLING_STATS)), re.IGNORECASE)
 
-    mean_keys, spx_keys, par_keys = [], [], []
+    stat_keys, spx_keys, par_keys = [], [], []
 
     for kw in user_meta_keys:
-        spx_match = spx_mean.match(kw)
+        spx_match = spx_stat.match(kw)
         if spx_match:
             spx_keys.append(spx_match)
         else:
-            par_match = par_mean.match(kw)
+            par_match = STAT_KEY.match(kw)
             if par_match:
                 par_keys.append(par_match)
 
     if spx_keys:
-        mean_keys.extend(config_spx_mean_keys(fcs_objs, spx_keys))
+        stat_keys.extend(config_spx_stat_keys(fcs_objs, spx_keys))
     if par_keys:
-        mean_keys.extend(config_param_mean_keys(par_keys))
-    return mean_keys
+        stat_keys.extend(config_param_stat_keys(par_keys))
+    return stat_keys
 
 
-def add_param_mean(fcs_objs, user_meta_keys):
-    """Calculates rolling mean for any user selected parameter keyword.
+def add_param_stats(fcs_objs, user_meta_keys):
+    """Calculates rolling statistics for any user selected parameter keyword.
         Confirms parameter's have numeric values and exist within each fcs file.
-        Adds new parameter keywords for any mean values relating to a $PX param.
+        Adds new parameter keywords for any stat values relating to a $PX param.
 
     Args:
-        fcs_objs: iterable of loaded FCSFile instances.
+        fcs_objs: iterable of loaded FCSFile instances sorted by time.
         user_meta_keys: iterable of param keys read from user_kw_prefs text file
             or keys found in master csv for appending new data.
 
@@ -135,51 +239,52 @@ def add_param_mean(fcs_objs, user_meta_keys):
             user keywords.
     """
 
-    if not any('_MEAN' in key.upper() for key in user_meta_keys):
+    if not any(is_stat_key(key) for key in user_meta_keys):
         return user_meta_keys
 
-    mean_keys = find_mean_keys(fcs_objs, user_meta_keys)
-    if not mean_keys:
+    stat_keys = find_stat_keys(fcs_objs, user_meta_keys)
+    if not stat_keys:
         return user_meta_keys
 
-    ignore_keys = []
+    ignore_keys = set()
+    selected_keys = set(user_meta_keys)
+    source_columns = {}
 
-    for user_key, key_group in mean_keys:
-        data_key, force_key, mean_key, mean_range = key_group
+    for user_key, key_group in stat_keys:
+        data_key, force_key, stat_key, stat_range, stat = key_group
 
-        if not any(fcs.has_param(force_key) for fcs in fcs_objs):
-            ignore_keys.extend((data_key, force_key, mean_key))
-            continue
+        if force_key not in source_columns:
+            source_columns[force_key] = numeric_column(fcs_objs, force_key)
 
-        elif not all(fcs.param_is_numeric(force_key) for fcs in fcs_objs):
-            ignore_keys.extend((data_key, force_key, mean_key))
+        source = source_columns[force_key]
+        if source is None:
+            ignore_keys.update((data_key, force_key))
+            # keyword named like a statistic, e.g. LASER_MAX, is kept as is
+            if not any(fcs.has_param(stat_key) for fcs in fcs_objs):
+                ignore_keys.add(stat_key)
             continue
 
-        channel_mean = []
-        ch_queue = deque(maxlen=mean_range)
-        spx_data = (fcs.numeric_param(force_key) for fcs in fcs_objs)
-
-        # calculate all rolling mean values for parameter
-        for channel_value in spx_data:
-            ch_queue.append(channel_value)
-            channel_mean.append(mean(ch_queue))
+        values, int_source = source
+        result = stat_values(rolling_stat(values, stat, stat_range), int_source)
 
-        # sets mean param, value for each fcs object
-        for fcs, channel_value in zip(fcs_objs, channel_mean):
-            fcs.set_param(mean_key, round(channel_value, 4))
+        # sets stat param, value for each fcs object
+        for fcs, stat_value in zip(fcs_objs, result):
+            fcs.set_param(stat_key, stat_value)
 
-        # force parameter keys included if only kw_MEAN in user kw file
-        if force_key not in user_meta_keys:
-            if user_key == mean_key:
-                ix = user_meta_keys.index(mean_key)
+        # force parameter keys included if only kw_STAT in user kw file
+        if force_key not in selected_keys:
+            if user_key == stat_key:
+                ix = user_meta_keys.index(stat_key)
                 user_meta_keys.insert(ix, force_key)
             else:
                 user_meta_keys.append(force_key)
+            selected_keys.add(force_key)
 
-        # replaces user $PnA_MEAN key with $PxA_MEAN
-        if user_key != mean_key:
-            user_meta_keys.append(mean_key)
-            ignore_keys.append(user_key)
+        # replaces user $PnA_STAT key with $PxA_STAT
+        if user_key != stat_key:
+            user_meta_keys.append(stat_key)
+            selected_keys.add(stat_key)
+            ignore_keys.add(user_key)
 
     if ignore_keys:
         drop_keys = (k not in ignore_keys for k in user_meta_keys)
@@ -0,0 +1,227 @@
+"""
+Compact columnar metadata accumulator.
+
+Keyword values of every scanned fcs file are stored in one list per keyword
+(column) and the FCSFile instance is discarded. Repeated str values are shared
+between rows. Columns are created in order of first appearance, so the column
+order is the ordered keyword union of all files. Columns are padded with
+MISSING only when written past their end, adding a row costs O(row keywords)
+regardless of the number of columns.
+
+MetadataRow is a two slot view of one table row that provides the FCSFile
+metadata methods (param, has_param, set_param, ...) used by csv writers, time
+sorting and add_param_stats. Values set through a row are stored in the table.
+"""
+
+import os
+import re
+
+from xfcs.FCSFile.FCSFile import filter_numeric
+# ------------------------------------------------------------------------------
+MISSING = object()
+SPXN_KEY = re.compile(r'^\$P(\d+)N$', re.IGNORECASE)
+
+
+class MetadataTable(object):
+    """Instantiates a MetadataTable object.
+
+    Public Attributes:
+        columns: dict keyword -> list of values, MISSING if file lacks keyword,
+            lists may be shorter than n_rows
+        n_rows: number of files
+        epochs: resolved acquisition timestamps by row, may be shorter than
+            n_rows
+
+    Public Methods:
+        add_file: Append row with text section keywords of a loaded FCSFile.
+        add_row: Append row from keyword, value pairs.
+        rows: MetadataRow views in row order.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = {key: [] for key in columns}
+        self.n_rows = 0
+        self.epochs = []
+        self._str_values = {}
+        self._spxn_keys = ((), 0)
+
+
+    @property
+    def keys(self):
+        return list(self.columns)
+
+
+    def __shared(self, value):
+        if type(value) is str:
+            return self._str_values.setdefault(value, value)
+        return value
+
+
+    def __store(self, key, ix, value):
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = []
+
+        n_values = len(column)
+        if ix < n_values:
+            column[ix] = self.__shared(value)
+            return
+        if ix > n_values:
+            column.extend([MISSING] * (ix - n_values))
+        column.append(self.__shared(value))
+
+
+    def add_row(self, items, keep=None):
+        """Append one row.
+
+        Args:
+            items: iterable of (keyword, value), later duplicates replace values
+            keep: optional func(keyword) -> bool selecting stored keywords
+
+        Returns:
+            MetadataRow view of new row
+        """
+
+        ix = self.n_rows
+        self.n_rows += 1
+        for key, value in items:
+            if keep is None or keep(key):
+                self.__store(key, ix, value)
+
+        return MetadataRow(self, ix)
+
+
+    def add_file(self, fcs, keep=None, src_keys=()):
+        """Append text section keywords of a loaded FCSFile in text order,
+        followed by src_keys set with FCSFile.set_param.
+        """
+
+        items = [(key, fcs.text[key]) for key in fcs.param_keys]
+        items.extend((key, fcs.text[key]) for key in src_keys if key in fcs.text)
+        row = self.add_row(items, keep)
+        if getattr(fcs, 'epoch', None) is not None:
+            row.epoch = fcs.epoch
+        return row
+
+
+    def rows(self):
+        return [MetadataRow(self, ix) for ix in range(self.n_rows)]
+
+
+    def value(self, key, ix, default=MISSING):
+        column = self.columns.get(key)
+        if column is None or ix >= len(column) or column[ix] is MISSING:
+            return default
+        return column[ix]
+
+
+    def set_value(self, key, ix, value):
+        self.__store(key, ix, value)
+
+
+    def epoch(self, ix):
+        return self.epochs[ix] if ix < len(self.epochs) else None
+
+
+    def set_epoch(self, ix, epoch):
+        if ix >= len(self.epochs):
+            self.epochs.extend([None] * (ix + 1 - len(self.epochs)))
+        self.epochs[ix] = epoch
+
+
+    def channel_name_keys(self):
+        """$PnN keywords in column order, cached until columns are added."""
+
+        spxn_keys, n_columns = self._spxn_keys
+        if n_columns != len(self.columns):
+            spxn_keys = tuple(key for key in self.columns if SPXN_KEY.match(key))
+            self._spxn_keys = (spxn_keys, len(self.columns))
+        return spxn_keys
+
+
+# ------------------------------------------------------------------------------
+class MetadataRow(object):
+    """FCSFile metadata interface for one MetadataTable row."""
+
+    __slots__ = ('table', 'ix')
+
+    def __init__(self, table, ix):
+        self.table = table
+        self.ix = ix
+
+
+    @property
+    def name(self):
+        return self.table.value('SRC_FILE', self.ix, '')
+
+    @property
+    def parentdir(self):
+        return self.table.value('SRC_DIR', self.ix, '')
+
+    @property
+    def filepath(self):
+        return os.path.join(self.parentdir, self.name)
+
+    @property
+    def epoch(self):
+        return self.table.epoch(self.ix)
+
+    @epoch.setter
+    def epoch(self, epoch):
+        self.table.set_epoch(self.ix, epoch)
+
+    @property
+    def param_keys(self):
+        ix = self.ix
+        return tuple(key for key, column in self.table.columns.items()
+                     if ix < len(column) and column[ix] is not MISSING)
+
+    @property
+    def text(self):
+        return {key: self.table.columns[key][self.ix] for key in self.param_keys}
+
+
+    def has_param(self, key):
+        return self.table.value(key, self.ix) is not MISSING
+
+    def param(self, param):
+        return self.table.value(param, self.ix, 'N/A')
+
+    def numeric_param(self, param):
+        return self.table.value(param, self.ix, 0)
+
+    def param_is_numeric(self, param):
+        return isinstance(self.param(param), (float, int))
+
+
+    def set_param(self, param, value):
+        if isinstance(value, str) and not value.isalpha():
+            value = filter_numeric(value)
+        self.table.set_value(param, self.ix, value)
+
+
+    def get_attr_by_channel_name(self, channel_name, attr):
+        """Pre-format channel_name to remove spaces and force upper case.
+            e.g. FL 5 Log --> FL5LOG
+        """
+
+        for key in self.table.channel_name_keys():
+            value = self.table.value(key, self.ix)
+            if value is not MISSING and str(value).replace(' ', '').upper() == channel_name:
+                spx_id = key[:-1] + attr
+                return spx_id if self.has_param(spx_id) else ''
+        return ''
+
+
+    def meta_hash(self, meta_keys=None):
+        """Hash fingerprint of keyword values, see FCSFile.meta_hash."""
+
+        txt = []
+        for param in meta_keys or self.param_keys:
+            if param in ('SRC_DIR', 'SRC_FILE', 'CSV_CREATED'):
+                continue
+            txt.extend((param, str(self.param(param))))
+        return hash(''.join(txt))
+
+
+# ------------------------------------------------------------------------------
@@ -29,9 +29,13 @@ the square brackets.
 """
 
 import datetime
+from functools import lru_cache
 from operator import itemgetter
 from os.path import getctime
 # ------------------------------------------------------------------------------
+TIME_KEYS = ('$DATE', '$BTIM', '$ETIM')
+
+
 def safe_ctime(filepath):
     """Safe access to os.path.getctime.
 
@@ -63,85 +67,105 @@ def sort_by_ctime(paths):
     if not all(ctimes) or len(set(ctimes)) <= 1:
         return []
     else:
-        return sorted(paths, key=lambda fp: safe_ctime(fp))
+        return [fp for _, fp in sorted(zip(ctimes, paths), key=itemgetter(0))]
 
 
-def __all_have_key(fcs_objs, key):
-    """Utility func to confirm all fcs objects have a specified parameter key.
+@lru_cache(maxsize=None)
+def parse_date(date):
+    """Memoized $DATE parser, one strptime per distinct value.
 
-    Args:
-        fcs_objs: iterable of loaded FCSFile instances.
-        key: str parameter key.
+    Arg:
+        date: $DATE value e.g. 01-OCT-1994, 01 oct 1994
+
+    Returns:
+        datetime.date or None
+    """
+
+    try:
+        return datetime.datetime.strptime(str(date).replace('-', ' '), '%d %b %Y').date()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def parse_clock(hms):
+    """Memoized $BTIM / $ETIM parser, fractional seconds are dropped.
+
+    Arg:
+        hms: clock time e.g. 14:22:10.47
 
     Returns:
-        bool: True if all fcs objs have key.
+        datetime.time or None
     """
 
-    return all(fcs.has_param(key) for fcs in fcs_objs)
+    try:
+        return datetime.datetime.strptime(str(hms).split('.')[0], '%X').time()
+    except ValueError:
+        return None
 
 
-def __get_all(fcs_objs, key):
-    """Utility func to retrieve a specified parameter key for all fcs objs.
-        Returns values only if all fcs objs have specified key in text map.
+def keyword_timestamp(date='', etim='', btim=''):
+    """Epoch seconds from $DATE and $BTIM, or $ETIM if $BTIM is unavailable,
+        values of one fcs file.
 
     Args:
-        fcs_objs: iterable of loaded FCSFile instances.
-        key: str parameter key.
+        date: $DATE value e.g. 01-OCT-1994, 01 oct 1994
+        etim: $ETIM value e.g. 14:22:10.47
+        btim: $BTIM value e.g. 14:20:02
 
     Returns:
-        list: fcs param values
+        float epoch seconds or None if $DATE is missing or malformed. A clock
+        time without a date does not order files across days.
     """
 
-    if __all_have_key(fcs_objs, key):
-        return [fcs.param(key) for fcs in fcs_objs]
-    else:
-        return []
+    dmy = parse_date(date) if date else None
+    if dmy is None:
+        return None
+    hms = parse_clock(btim) if btim else None
+    if hms is None and etim:
+        hms = parse_clock(etim)
+
+    return datetime.datetime.combine(dmy, hms or datetime.time()).timestamp()
+
+
+def fcs_timestamp(fcs):
+    """Acquisition timestamp of one fcs file from $DATE, $BTIM, $ETIM with
+        fallback to file ctime. Resolved once and stored as fcs.epoch.
+
+    Arg:
+        fcs: loaded FCSFile instance or MetadataRow.
+
+    Returns:
+        float epoch seconds or 0 if unavailable.
+    """
+
+    if fcs.epoch is None:
+        date, btim, etim = (fcs.param(key) if fcs.has_param(key) else '' for key in TIME_KEYS)
+        epoch = keyword_timestamp(date, etim, btim)
+        if epoch is None:
+            epoch = safe_ctime(fcs.filepath)
+        fcs.epoch = epoch
+    return fcs.epoch
 
 
 def sort_by_time_params(fcs_objs):
-    """Uses optional, time related fcs keys ($DATE,$ETIM) to sort iterable.
-        If fcs text section does not include either keys, returns empty list.
+    """Sorts fcs objects by acquisition timestamp, see fcs_timestamp. Files
+        without usable time keywords are placed by ctime. Returns an empty list
+        if no file has a timestamp.
 
     Arg:
         fcs_objs: iterable of loaded FCSFile instances.
 
     Returns:
-        iterable of fcs objs sorted by timestamp or empty list.
+        list of fcs objs sorted by timestamp or empty list.
     """
 
-    meta_dates = __get_all(fcs_objs, '$DATE')
-    meta_time = __get_all(fcs_objs, '$ETIM')
-
-    if not any((meta_dates, meta_time)):
+    fcs_objs = list(fcs_objs)
+    epochs = [fcs_timestamp(fcs) for fcs in fcs_objs]
+    if not any(epochs):
         return []
 
-    converted_dates = []
-    converted_times = []
-    dt_strptime = datetime.datetime.strptime
-
-    if meta_dates:
-        prep_date = [date.replace('-', ' ') for date in meta_dates]
-        date_fmt = '%d %b %Y'
-        converted_dates = [dt_strptime(date, date_fmt) for date in prep_date]
-    if meta_time:
-        prep_time = [hms.split('.')[0] if '.' in hms else hms for hms in meta_time]
-        time_fmt = '%X'
-        converted_times = [dt_strptime(hms, time_fmt).time() for hms in prep_time]
-
-    epoc_secs = []
-    dt_combine = datetime.datetime.combine
-
-    if converted_dates and converted_times:
-        epoc_secs = [dt_combine(dmy, hms).timestamp()
-                     for (dmy, hms) in zip(converted_dates, converted_times)]
-    elif converted_dates:
-        epoc_secs = [dmy.timestamp() for dmy in converted_dates]
-    elif converted_times:
-        epoc_secs = [hms.timestamp() for hms in converted_times]
-
-    time_fcs = sorted(zip(epoc_secs, fcs_objs), key=itemgetter(0))
-    _, sorted_fcs = zip(*time_fcs)
-    return sorted_fcs
+    return [fcs for _, fcs in sorted(zip(epochs, fcs_objs), key=itemgetter(0))]
 
 
 # ------------------------------------------------------------------------------
@@ -0,0 +1,137 @@
+"""
+Polling directory watcher for new fcs files - no inotify dependency.
+
+Each poll stats the known directories and only lists (os.scandir) those whose
+mtime changed, since adding a file updates the mtime of its parent directory.
+Files are tracked by path with the (size, mtime) they were reported with, so
+files copied with their original mtime (cp -p, rsync -a) are found as well. New
+or modified fcs files are pending until their size and mtime are unchanged
+between two polls, then reported once as complete. Per poll cost is one stat
+per directory plus one stat per fcs file in changed directories.
+"""
+
+import os
+
+from xfcs.utils.locator import is_fcs_name
+# ------------------------------------------------------------------------------
+class DirectoryWatcher(object):
+    """Instantiates a DirectoryWatcher object.
+
+    Public Attributes:
+        known: dict of absolute fcs filepath -> (size, mtime_ns) when reported
+            or None for seeded paths. Each file is reported once unless
+            modified again.
+
+    Public Methods:
+        poll: Returns fcs filepaths completed since the previous poll.
+    """
+
+    def __init__(self, root=os.curdir, recursive=False, known_paths=()):
+        """Initialize DirectoryWatcher.
+
+        Args:
+            root: directory to watch
+            recursive: bool - include sub directories
+            known_paths: optional fcs filepaths already processed, e.g. source
+                files listed in master csv. Reported only if modified after the
+                first poll.
+        """
+
+        self.root = root
+        self.recursive = recursive
+        self.known = dict.fromkeys((os.path.abspath(path) for path in known_paths), None)
+        self._dir_mtimes = {root: None}
+        self._pending = {}
+
+
+    def __scan_dir(self, dirpath):
+        """List one directory, returns new fcs files and sub directories."""
+
+        files, sub_dirs = [], []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and not entry.name.startswith('.'):
+                            sub_dirs.append(entry.path)
+                    elif entry.is_file() and is_fcs_name(entry.name):
+                        filepath = os.path.abspath(entry.path)
+                        if filepath in self._pending:
+                            continue
+                        stat = entry.stat()
+                        if self.__is_new(filepath, stat.st_size, stat.st_mtime_ns):
+                            files.append((filepath, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            pass
+        return files, sub_dirs
+
+
+    def __is_new(self, filepath, size, mtime_ns):
+        """Unknown files and files changed since reported are new. Seeded
+        paths record their first seen state.
+        """
+
+        if filepath not in self.known:
+            return True
+        state = self.known[filepath]
+        if state is None:
+            self.known[filepath] = (size, mtime_ns)
+            return False
+        return state != (size, mtime_ns)
+
+
+    def __changed_dirs(self):
+        changed = []
+        for dirpath, last_mtime in list(self._dir_mtimes.items()):
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                del self._dir_mtimes[dirpath]
+                continue
+            if mtime != last_mtime:
+                self._dir_mtimes[dirpath] = mtime
+                changed.append(dirpath)
+        return changed
+
+
+    def poll(self):
+        """Scan changed directories and check pending files.
+
+        Returns:
+            list of completed fcs filepaths ordered by mtime, name
+        """
+
+        dirs = self.__changed_dirs()
+        new_files = []
+        while dirs:
+            dirpath = dirs.pop()
+            files, sub_dirs = self.__scan_dir(dirpath)
+            new_files.extend(files)
+            for sub_dir in sub_dirs:
+                if sub_dir not in self._dir_mtimes:
+                    self._dir_mtimes[sub_dir] = os.stat(sub_dir).st_mtime_ns
+                    dirs.append(sub_dir)
+
+        completed = []
+        for filepath, (size, mtime_ns) in list(self._pending.items()):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                del self._pending[filepath]
+                continue
+
+            if stat.st_size == size and stat.st_mtime_ns == mtime_ns and size:
+                del self._pending[filepath]
+                self.known[filepath] = (size, mtime_ns)
+                completed.append((mtime_ns, filepath))
+            else:
+                self._pending[filepath] = (stat.st_size, stat.st_mtime_ns)
+
+        for filepath, size, mtime_ns in new_files:
+            self._pending[filepath] = (size, mtime_ns)
+
+        completed.sort()
+        return [filepath for _, filepath in completed]
+
+
+# ------------------------------------------------------------------------------